@@ -0,0 +1,7 @@
+"""
+Module Name: benchmarks
+Description: Reproducible benchmarks of the pattern evaluation, fitness and genetic operator hot paths.
+Run `python -m benchmarks.run_benchmarks --help` from the repository root.
+
+Last Updated: 2024-09-01
+"""
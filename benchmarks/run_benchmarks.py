@@ -0,0 +1,600 @@
+"""
+Module Name: run_benchmarks.py
+Description: Times the pattern evaluation, fitness and genetic operator hot paths on synthetic
+market data, saves the results as JSON and compares them against a stored baseline.
+
+Usage :
+    python -m benchmarks.run_benchmarks                           # full suite (10k - 10M candles)
+    python -m benchmarks.run_benchmarks --sizes 10000 100000      # smaller market data
+    python -m benchmarks.run_benchmarks --only fitness generation # subset of the benchmarks
+    python -m benchmarks.run_benchmarks --save-baseline           # store results as the new baseline
+
+Last Updated: 2024-09-01
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import synthetic_ohlc, synthetic_patterns
+from src.modules import fitness_functions
+from src.modules.chunked_evaluation import ChunkedEvaluator
+from src.modules.condition_index import ConditionIndex
+from src.modules.genetic_algorithm import GeneticAlgorithm
+from src.modules.pattern_evaluation import (
+    evaluate_candlestick_pattern,
+    evaluate_candlestick_pattern_vectorized,
+    forward_log_returns,
+    horizon_log_returns,
+    masked_log_returns,
+    ohlc_to_array,
+    pattern_is_matched,
+)
+from src.modules.pattern_generator import CandlestickPatternGenerator
+from src.modules.racing import RacingEvaluator
+from src.utils.data_loader import ChunkedOHLC
+from src.utils.logger import logger
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCHMARK_DIR / "baseline.json"
+DEFAULT_RESULTS_DIR = BENCHMARK_DIR / "results"
+
+# Hyperparameter grids of the genetic operator and full generation benchmarks,
+# single-point crossover needs at least two conditions
+NUM_CONDS_GRID = [2, 3, 5]
+MAX_LAG_GRID = [1, 3, 5]
+POP_SIZE_GRID = [50, 200]
+
+
+class BenchmarkCase(NamedTuple):
+    """
+    Single benchmark measurement.
+
+    Attributes :
+    -------
+        - `name`: Name of the benchmarked function
+        - `params`: Parameters identifying the case (compared against the baseline)
+        - `candles`: Number of candles processed per run, None for benchmarks independent of market data
+        - `patterns`: Number of patterns (chromosomes) processed per run
+        - `prepare`: Callable returning the function to time, called before every timed run
+    """
+
+    name: str
+    params: dict
+    candles: int | None
+    patterns: int
+    prepare: Callable[[], Callable[[], object]]
+
+
+def measure(case: BenchmarkCase, repeat: int) -> dict:
+    """
+    Times a benchmark case and measures its peak memory.
+
+    Parameters :
+    -------
+        - `case` : Benchmark case
+        - `repeat` : Number of timed runs, the fastest run is reported
+
+    Returns :
+    -------
+        - `result` : JSON serializable result with duration, throughput and peak memory
+
+    Note :
+    -------
+        - Peak memory is measured by `tracemalloc` in a separate run, since tracing slows down
+          Python code. NumPy allocations are traced as well
+    """
+    durations = []
+    for _ in range(repeat):
+        run = case.prepare()
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+
+    run = case.prepare()
+    tracemalloc.start()
+    run()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    seconds = min(durations)
+    work = (case.candles or 1) * case.patterns
+    return {
+        "benchmark": case.name,
+        "params": case.params,
+        "candles": case.candles,
+        "patterns": case.patterns,
+        "seconds": seconds,
+        "throughput": work / seconds if seconds > 0 else float("inf"),
+        "throughput_unit": (
+            "candles*patterns/s" if case.candles is not None else "patterns/s"
+        ),
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def _reuse(func: Callable[[], object]) -> Callable[[], Callable[[], object]]:
+    "Prepare callable of benchmarks without per-run setup"
+    return lambda: func
+
+
+def evaluation_cases(
+    df: pd.DataFrame, args: argparse.Namespace
+) -> Iterator[BenchmarkCase]:
+    """
+    Yields the benchmark cases of the pattern evaluation and fitness functions for one market data size.
+
+    Parameters :
+    -------
+        - `df` : Synthetic market data
+        - `args` : Parsed command line arguments
+
+    Yields :
+    -------
+        - `BenchmarkCase` : Benchmark cases, pure Python implementations are limited to smaller market data
+    """
+    num_candles = len(df)
+    max_lag = args.max_lag
+    params = {"num_conds": args.num_conds, "max_lag": max_lag}
+    population = synthetic_patterns(args.population, args.num_conds, max_lag)
+    pattern = population[0].tolist()
+
+    ohlc = ohlc_to_array(df)
+    next_returns = forward_log_returns(ohlc)
+
+    if num_candles <= args.reference_max_candles:
+        # Single candle matching, timed over every candle of the market data
+        def match_every_candle():
+            for candle in range(max_lag, num_candles):
+                pattern_is_matched(
+                    pattern,
+                    df.iloc[candle],
+                    df.iloc[candle - max_lag : candle],
+                    max_lag,
+                )
+
+        yield BenchmarkCase(
+            "pattern_is_matched", params, num_candles, 1, _reuse(match_every_candle)
+        )
+        yield BenchmarkCase(
+            "evaluate_candlestick_pattern",
+            params,
+            num_candles,
+            1,
+            _reuse(lambda: evaluate_candlestick_pattern(df, pattern, max_lag)),
+        )
+
+    yield BenchmarkCase(
+        "evaluate_candlestick_pattern_vectorized",
+        params,
+        num_candles,
+        1,
+        _reuse(
+            lambda: evaluate_candlestick_pattern_vectorized(
+                ohlc, pattern, max_lag, next_returns=next_returns
+            )
+        ),
+    )
+    yield BenchmarkCase(
+        "ConditionIndex",
+        params,
+        num_candles,
+        1,
+        _reuse(lambda: ConditionIndex(ohlc, max_lag)),
+    )
+
+    condition_index = ConditionIndex(ohlc, max_lag)
+    yield BenchmarkCase(
+        "ConditionIndex.population_match_matrix",
+        params,
+        num_candles,
+        len(population),
+        _reuse(lambda: condition_index.population_match_matrix(population)),
+    )
+
+    match_matrix = condition_index.population_match_matrix(population)
+    if num_candles <= args.list_max_candles:
+        log_returns = masked_log_returns(match_matrix[0], next_returns).tolist()
+        for fitness_function in (
+            fitness_functions.total_return,
+            fitness_functions.profit_factor,
+            fitness_functions.martin_ratio,
+        ):
+            yield BenchmarkCase(
+                fitness_function.__name__,
+                params,
+                num_candles,
+                1,
+                _reuse(lambda func=fitness_function: func(log_returns)),
+            )
+
+    yield BenchmarkCase(
+        "fitness_statistics",
+        params,
+        num_candles,
+        len(population),
+        _reuse(lambda: fitness_functions.fitness_statistics(match_matrix, next_returns)),
+    )
+    segment_starts = np.linspace(0, num_candles, 6).astype(int)[:-1]
+    yield BenchmarkCase(
+        "segment_fitness_statistics",
+        {**params, "num_segments": len(segment_starts)},
+        num_candles,
+        len(population),
+        _reuse(
+            lambda: fitness_functions.segment_fitness_statistics(
+                match_matrix, next_returns, segment_starts
+            )
+        ),
+    )
+
+    # Out-of-core evaluation, memory is bounded by the chunk size instead of the number of candles
+    chunk_size = max(num_candles // 4, 1)
+    chunked_evaluator = ChunkedEvaluator(ChunkedOHLC(ohlc, chunk_size), max_lag)
+    yield BenchmarkCase(
+        "ChunkedEvaluator.fitness",
+        {**params, "chunk_size": chunk_size},
+        num_candles,
+        len(population),
+        _reuse(lambda: chunked_evaluator.fitness("martin_ratio", population)),
+    )
+
+    # Racing against the 90th percentile fitness, patterns below it are dropped after a partial evaluation
+    racing = RacingEvaluator(condition_index, next_returns, "martin_ratio", num_stages=4)
+    threshold = float(
+        np.quantile(
+            fitness_functions.population_fitness("martin_ratio", match_matrix, next_returns),
+            0.9,
+        )
+    )
+    yield BenchmarkCase(
+        "RacingEvaluator.evaluate",
+        {**params, "num_stages": len(racing.stage_ends)},
+        num_candles,
+        len(population),
+        _reuse(lambda: racing.evaluate(population, threshold)),
+    )
+
+    # Exit horizons of 1, 4, 12 and 24 candles from the same match masks
+    exit_horizons = [1, 4, 12, 24]
+    horizon_returns = horizon_log_returns(ohlc, exit_horizons)
+    yield BenchmarkCase(
+        "population_fitness",
+        {**params, "fitness_type": "martin_ratio", "exit_horizons": exit_horizons},
+        num_candles,
+        len(population),
+        _reuse(
+            lambda: fitness_functions.population_fitness(
+                "martin_ratio", match_matrix, horizon_returns
+            )
+        ),
+    )
+
+    statistics = fitness_functions.fitness_statistics(match_matrix, next_returns)
+    for fitness_type in ("total_return", "profit_factor", "martin_ratio"):
+        from_statistics = getattr(fitness_functions, f"{fitness_type}_from_statistics")
+        yield BenchmarkCase(
+            from_statistics.__name__,
+            params,
+            num_candles,
+            len(population),
+            _reuse(lambda func=from_statistics: func(statistics)),
+        )
+        yield BenchmarkCase(
+            "population_fitness",
+            {**params, "fitness_type": fitness_type},
+            num_candles,
+            len(population),
+            _reuse(
+                lambda fitness_type=fitness_type: fitness_functions.population_fitness(
+                    fitness_type, match_matrix, next_returns
+                )
+            ),
+        )
+
+
+def _genetic_algorithm(
+    df: pd.DataFrame, num_conds: int, max_lag: int, pop_size: int, num_gens: int
+) -> GeneticAlgorithm:
+    return GeneticAlgorithm(
+        df,
+        pop_size,
+        num_gens,
+        num_conds,
+        max_lag,
+        fitness_type="martin_ratio",
+        bullish_focus=True,
+        fitness_batch_size=pop_size,
+    )
+
+
+def operator_cases(df: pd.DataFrame) -> Iterator[BenchmarkCase]:
+    """
+    Yields the benchmark cases of pattern generation, crossover and mutation over the hyperparameter grids.
+
+    Parameters :
+    -------
+        - `df` : Synthetic market data used to set up the genetic algorithm
+
+    Yields :
+    -------
+        - `BenchmarkCase` : Benchmark cases, throughput is measured in patterns (chromosomes) per second
+    """
+    for num_conds, max_lag, pop_size in itertools.product(
+        NUM_CONDS_GRID, MAX_LAG_GRID, POP_SIZE_GRID
+    ):
+        params = {"num_conds": num_conds, "max_lag": max_lag, "pop_size": pop_size}
+        generator = CandlestickPatternGenerator(max_lag, num_conds)
+        yield BenchmarkCase(
+            "CandlestickPatternGenerator.get_patterns",
+            params,
+            None,
+            pop_size,
+            _reuse(lambda generator=generator, pop_size=pop_size: generator.get_patterns(pop_size)),
+        )
+
+        genetic_algorithm = _genetic_algorithm(df, num_conds, max_lag, pop_size, 1)
+        ga_instance = genetic_algorithm.create_instance()
+        parents = synthetic_patterns(pop_size, num_conds, max_lag)
+        yield BenchmarkCase(
+            "GeneticAlgorithm._crossover_func",
+            params,
+            None,
+            pop_size,
+            _reuse(
+                lambda genetic_algorithm=genetic_algorithm,
+                parents=parents,
+                ga_instance=ga_instance: genetic_algorithm._crossover_func(
+                    parents, parents.shape, ga_instance
+                )
+            ),
+        )
+        # Mutation works in place, every run mutates a fresh copy
+        yield BenchmarkCase(
+            "GeneticAlgorithm._mutation_func",
+            params,
+            None,
+            pop_size,
+            lambda genetic_algorithm=genetic_algorithm,
+            parents=parents,
+            ga_instance=ga_instance: (
+                lambda offsprings=parents.copy(): genetic_algorithm._mutation_func(
+                    offsprings, ga_instance
+                )
+            ),
+        )
+
+
+def generation_cases(df: pd.DataFrame) -> Iterator[BenchmarkCase]:
+    """
+    Yields benchmark cases of a full generation (initial population and one generation) over the hyperparameter grids.
+
+    Parameters :
+    -------
+        - `df` : Synthetic market data the genetic algorithm is trained on
+
+    Yields :
+    -------
+        - `BenchmarkCase` : Benchmark cases, the genetic algorithm is set up again before every run
+    """
+    for num_conds, max_lag, pop_size in itertools.product(
+        NUM_CONDS_GRID, MAX_LAG_GRID, POP_SIZE_GRID
+    ):
+
+        def prepare(num_conds=num_conds, max_lag=max_lag, pop_size=pop_size):
+            ga_instance = _genetic_algorithm(
+                df, num_conds, max_lag, pop_size, 1
+            ).create_instance()
+            return ga_instance.run
+
+        yield BenchmarkCase(
+            "GeneticAlgorithm.generation",
+            {"num_conds": num_conds, "max_lag": max_lag, "pop_size": pop_size},
+            len(df),
+            pop_size,
+            prepare,
+        )
+
+
+def compare_with_baseline(
+    results: list[dict], baseline: list[dict], tolerance: float
+) -> list[dict]:
+    """
+    Compares throughput of the results with the baseline results.
+
+    Parameters :
+    -------
+        - `results` : Results of the current run
+        - `baseline` : Results of the baseline run
+        - `tolerance` : Relative throughput loss tolerated before a case is reported as a regression
+
+    Returns :
+    -------
+        - `regressions` : Results slower than the baseline by more than `tolerance`
+
+    Note :
+    -------
+        - Each result gets a `baseline_ratio` (throughput / baseline throughput), None if the case is not in the baseline
+    """
+    baseline_throughput = {
+        _case_key(result): result["throughput"] for result in baseline
+    }
+    regressions = []
+    for result in results:
+        reference = baseline_throughput.get(_case_key(result))
+        result["baseline_ratio"] = (
+            result["throughput"] / reference if reference else None
+        )
+        if result["baseline_ratio"] is not None and result["baseline_ratio"] < 1 - tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def _case_key(result: dict) -> str:
+    return json.dumps(
+        [result["benchmark"], result["candles"], result["patterns"], result["params"]],
+        sort_keys=True,
+    )
+
+
+def _format_result(result: dict) -> str:
+    params = ", ".join(f"{key}={value}" for key, value in result["params"].items())
+    ratio = result.get("baseline_ratio")
+    return "{:<42} {:<55} {:>10} {:>11.4f} s {:>12.4g} {:>9.1f} MB {:>8}".format(
+        result["benchmark"],
+        params,
+        result["candles"] if result["candles"] is not None else "-",
+        result["seconds"],
+        result["throughput"],
+        result["peak_memory_bytes"] / 2**20,
+        f"{ratio:.2f}x" if ratio is not None else "-",
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the evaluation, fitness and genetic operator hot paths."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 1_000_000, 10_000_000],
+        help="Numbers of synthetic candles the evaluation and fitness functions are timed on",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        default=None,
+        help="Run only benchmarks whose name contains one of the given strings",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    parser.add_argument("--num-conds", type=int, default=3)
+    parser.add_argument("--max-lag", type=int, default=3)
+    parser.add_argument(
+        "--population",
+        type=int,
+        default=10,
+        help="Number of patterns evaluated by the population benchmarks",
+    )
+    parser.add_argument(
+        "--reference-max-candles",
+        type=int,
+        default=10_000,
+        help="Largest market data the pandas based reference evaluation is timed on",
+    )
+    parser.add_argument(
+        "--list-max-candles",
+        type=int,
+        default=1_000_000,
+        help="Largest market data the list based fitness functions are timed on",
+    )
+    parser.add_argument(
+        "--generation-candles",
+        type=int,
+        default=100_000,
+        help="Number of candles the full generation benchmarks are trained on",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the new baseline",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Relative throughput loss tolerated before a case is reported as a regression",
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with status 1 if any case regressed",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    # Generation logs would dominate the output of the benchmarks
+    logger.setLevel(logging.WARNING)
+
+    def selected(cases: Iterator[BenchmarkCase]) -> Iterator[BenchmarkCase]:
+        for case in cases:
+            if args.only is None or any(name in case.name for name in args.only):
+                yield case
+
+    def run_cases(cases: Iterator[BenchmarkCase]) -> None:
+        for case in selected(cases):
+            random.seed(args.seed)
+            np.random.seed(args.seed)
+            result = measure(case, args.repeat)
+            results.append(result)
+            print(_format_result(result), flush=True)
+
+    results = []
+    for num_candles in args.sizes:
+        run_cases(evaluation_cases(synthetic_ohlc(num_candles, args.seed), args))
+    small_df = synthetic_ohlc(1_000, args.seed)
+    run_cases(operator_cases(small_df))
+    run_cases(generation_cases(synthetic_ohlc(args.generation_candles, args.seed)))
+
+    regressions = []
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        print(f"\nCompared against {args.baseline}:")
+        for result in results:
+            if result["baseline_ratio"] is not None:
+                print(_format_result(result))
+        for result in regressions:
+            print(
+                f"REGRESSION {result['benchmark']} {result['params']} "
+                f"({result['candles']} candles): {result['baseline_ratio']:.2f}x of baseline throughput"
+            )
+
+    report = {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "arguments": {
+                key: str(value) if isinstance(value, Path) else value
+                for key, value in vars(args).items()
+            },
+        },
+        "results": results,
+    }
+    output = args.output or (
+        DEFAULT_RESULTS_DIR / f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults saved to {output}")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
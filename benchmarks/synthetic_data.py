@@ -0,0 +1,79 @@
+"""
+Module Name: synthetic_data.py
+Description: Generates reproducible synthetic market data (random walk OHLC candles) and
+candlestick patterns for benchmarks.
+
+Last Updated: 2024-09-01
+"""
+
+import random
+
+import numpy as np
+import pandas as pd
+
+from src.modules.pattern_generator import CandlestickPatternGenerator
+
+
+def synthetic_ohlc(num_candles: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates hourly OHLC candles following a geometric random walk.
+
+    Parameters :
+    -------
+        - `num_candles` : Number of candles (rows) to generate
+        - `seed` : Seed of the random number generator, equal seeds produce equal data
+
+    Returns :
+    -------
+        - `df` : DataFrame with columns "Date", "Open", "High", "Low", "Close"
+
+    Note :
+    -------
+        - Every "Open" is close to the previous "Close" and prices are rounded to cents,
+          so equal prices (ties in pattern conditions) occur as in real market data
+    """
+    rng = np.random.default_rng(seed)
+    close = 10_000 * np.exp(np.cumsum(rng.normal(0, 0.01, num_candles)))
+    open_price = np.append(close[0], close[:-1]) * np.exp(
+        rng.normal(0, 0.001, num_candles)
+    )
+    open_price = np.round(open_price, 2)
+    close = np.round(close, 2)
+    high = np.maximum(open_price, close) * np.exp(
+        np.abs(rng.normal(0, 0.005, num_candles))
+    )
+    low = np.minimum(open_price, close) * np.exp(
+        -np.abs(rng.normal(0, 0.005, num_candles))
+    )
+
+    return pd.DataFrame(
+        {
+            "Date": pd.date_range("2018-01-01", periods=num_candles, freq="h"),
+            "Open": open_price,
+            "High": np.round(high, 2),
+            "Low": np.round(low, 2),
+            "Close": close,
+        }
+    )
+
+
+def synthetic_patterns(
+    num_patterns: int, num_conds: int, max_lag: int, seed: int = 0
+) -> np.ndarray:
+    """
+    Generates reproducible encoded candlestick patterns.
+
+    Parameters :
+    -------
+        - `num_patterns` : Number of patterns to generate
+        - `num_conds` : Number of conditions of each pattern
+        - `max_lag` : Maximum number of candlesticks to look back
+        - `seed` : Seed of the random number generator
+
+    Returns :
+    -------
+        - `patterns` : Array of shape (`num_patterns`, 5 * `num_conds`)
+    """
+    random.seed(seed)
+    generator = CandlestickPatternGenerator(max_lag, num_conds)
+    return np.array(generator.get_patterns(num_patterns))
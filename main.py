@@ -3,6 +3,11 @@ import yaml
 from pathlib import Path
 
 from src.modules.genetic_algorithm import GeneticAlgorithm
+from src.modules.island_model import IslandModel
+from src.modules.validation import validation_folds
+from src.utils.data_loader import ChunkedOHLC, load_ohlc
+from src.utils.logger import logger
+from src.utils.resample_cache import ResampleCache
 
 
 def load_config(path: Path = Path("config/config.yml")) -> dict:
@@ -10,54 +15,144 @@ def load_config(path: Path = Path("config/config.yml")) -> dict:
         return yaml.safe_load(file)
 
 
-def prepare_data(filepath: str, freq: str) -> pd.DataFrame:
+def prepare_data(
+    filepath: str,
+    freq: str,
+    start: str | None = None,
+    end: str | None = None,
+    cache: ResampleCache | None = None,
+) -> pd.DataFrame:
     "Load and preprocess data"
-    data = pd.read_parquet(filepath)
-    processed_data = (
-        data.rename(
-            columns={
-                "date": "Date",
-                "open": "Open",
-                "high": "High",
-                "low": "Low",
-                "close": "Close",
-            }
-        )
-        .loc[:, ["Date", "Open", "High", "Low", "Close"]]
-        .assign(Date=lambda x: pd.to_datetime(x["Date"]))
-        .set_index("Date")
-        .resample(freq)
-        .agg(
-            {
-                "Open": "first",
-                "High": "max",
-                "Low": "min",
-                "Close": "last",
-            }
-        )
-        .reset_index()
-    )
-    return processed_data
+    if cache is not None:
+        return cache.load(filepath, freq, start, end).to_frame()
+    return load_ohlc(filepath, start=start, end=end, freq=freq).to_frame()
 
 
-def main():
-    config = load_config()
-    btc_2018_hourly = prepare_data(r"data\BTC\BTC_2018_min.parquet", "h")
-
+def genetic_algorithm_kwargs(config: dict) -> dict:
+    "Settings of the Genetic Algorithm, except market data and validation folds"
     hyperparams = config["hyperparameters"]
     ga_settings = config["genetic_algorithm_settings"]
-
-    ga_instance = GeneticAlgorithm(
-        df=btc_2018_hourly,
+    cache_settings = config["fitness_cache"]
+    parallel_settings = config["parallel_evaluation"]
+    racing_settings = config["racing"]
+    instrumentation_settings = config["instrumentation"]
+    logging_settings = config["logging"]
+    data_settings = config["data"]
+    return dict(
         pop_size=ga_settings["pop_size"],
         num_gens=ga_settings["num_gens"],
         num_conds=hyperparams["num_conds"],
         max_lag=hyperparams["max_lag"],
         fitness_type=ga_settings["fitness_type"],
         bullish_focus=ga_settings["focus_on_bullish_patterns"],
+        min_support=ga_settings["min_support"],
+        exit_horizons=ga_settings["exit_horizons"],
+        optimized_horizon=ga_settings["optimized_horizon"],
+        replace_duplicates=ga_settings["replace_duplicates"],
+        pattern_mutation_rate=ga_settings["pattern_mutation_rate"],
+        gene_mutation_rate=ga_settings["gene_mutation_rate"],
+        parent_selection=ga_settings["parent_selection"],
+        num_parents_mating=ga_settings["num_parents_mating"],
+        cache_size=cache_settings["max_size"],
+        cache_dir=cache_settings["directory"],
+        fitness_batch_size=ga_settings["fitness_batch_size"],
+        num_workers=parallel_settings["num_workers"],
+        chunk_size=parallel_settings["chunk_size"],
+        metrics_dir=instrumentation_settings["directory"],
+        track_memory=instrumentation_settings["track_memory"],
+        racing_stages=racing_settings["num_stages"],
+        price_dtype=data_settings["price_dtype"],
+        table_interval=logging_settings["table_interval"],
+        stats_dir=logging_settings["stats_directory"],
+    )
+
+
+def main():
+    config = load_config()
+    logger.setLevel(config["logging"]["level"])
+    data_settings = config["data"]
+    resample_cache = (
+        ResampleCache(data_settings["cache_dir"], data_settings["cache_max_bytes"])
+        if data_settings["cache_dir"] is not None
+        else None
     )
+    chunked_data = None
+    if data_settings["chunk_size"] is not None:
+        if data_settings["freq"] is not None:
+            raise ValueError(
+                "Market data read in chunks is not resampled, set data.freq to null"
+            )
+        chunked_data = ChunkedOHLC(
+            data_settings["path"],
+            data_settings["chunk_size"],
+            data_settings["start"],
+            data_settings["end"],
+        )
+        btc_2018_hourly = None
+        num_candles = chunked_data.num_candles
+    else:
+        btc_2018_hourly = prepare_data(
+            data_settings["path"],
+            data_settings["freq"],
+            data_settings["start"],
+            data_settings["end"],
+            resample_cache,
+        )
+        num_candles = len(btc_2018_hourly)
+
+    island_settings = config["island_model"]
+    validation_settings = config["validation"]
+    checkpoint_settings = config["checkpoint"]
 
-    pygad_instance = ga_instance.create_instance()
+    ga_kwargs = dict(
+        **genetic_algorithm_kwargs(config),
+        validation_folds=(
+            validation_folds(
+                validation_settings["method"],
+                num_candles,
+                validation_settings["num_folds"],
+                validation_settings["train_size"],
+            )
+            if validation_settings["method"] is not None
+            else None
+        ),
+        chunked_data=chunked_data,
+    )
+
+    if island_settings["num_islands"] > 1:
+        if checkpoint_settings["path"] is not None:
+            raise ValueError(
+                "Checkpoints are written by single population runs, "
+                "set checkpoint.path to null or island_model.num_islands to 1"
+            )
+        island_model = IslandModel(
+            df=btc_2018_hourly,
+            num_islands=island_settings["num_islands"],
+            migration_interval=island_settings["migration_interval"],
+            migration_size=island_settings["migration_size"],
+            topology=island_settings["topology"],
+            seed=island_settings["seed"],
+            **ga_kwargs,
+        )
+        island_model.run()
+        return
+
+    ga_instance = GeneticAlgorithm(
+        df=btc_2018_hourly,
+        checkpoint_path=checkpoint_settings["path"],
+        checkpoint_interval=checkpoint_settings["interval"],
+        **ga_kwargs,
+    )
+
+    resume = (
+        checkpoint_settings["resume"]
+        and checkpoint_settings["path"] is not None
+        and Path(checkpoint_settings["path"]).exists()
+    )
+    if resume:
+        pygad_instance = ga_instance.resume_instance()
+    else:
+        pygad_instance = ga_instance.create_instance()
     pygad_instance.run()
 
 
@@ -0,0 +1,68 @@
+import argparse
+import os
+from pathlib import Path
+
+from main import load_config
+from src.modules.screener import PatternScreener, dataset_paths, read_pattern_file
+from src.utils.logger import logger
+from src.utils.resample_cache import ResampleCache
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Screen saved candlestick patterns over a directory of datasets (one per symbol)."
+    )
+    parser.add_argument("--patterns", type=Path, required=True)
+    parser.add_argument("--datasets", type=Path, required=True)
+    parser.add_argument("--output", type=Path, default=Path("results/screen"))
+    parser.add_argument("--num-workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--config", type=Path, default=Path("config/config.yml"))
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    config = load_config(args.config)
+    logger.setLevel(config["logging"]["level"])
+    data_settings = config["data"]
+    ga_settings = config["genetic_algorithm_settings"]
+    resample_cache = (
+        ResampleCache(data_settings["cache_dir"], data_settings["cache_max_bytes"])
+        if data_settings["cache_dir"] is not None
+        else None
+    )
+
+    datasets = dataset_paths(args.datasets)
+    # One worker per symbol at most, idle workers would only receive the patterns
+    num_workers = args.num_workers or min(os.cpu_count() or 1, len(datasets))
+
+    # Patterns are matched with the max_lag and focus they were discovered with
+    screener = PatternScreener(
+        read_pattern_file(args.patterns),
+        max_lag=config["hyperparameters"]["max_lag"],
+        bullish_focus=ga_settings["focus_on_bullish_patterns"],
+        min_support=ga_settings["min_support"],
+        batch_size=args.batch_size,
+        price_dtype=data_settings["price_dtype"],
+    )
+    summary, _ = screener.run(
+        datasets,
+        freq=data_settings["freq"],
+        start=data_settings["start"],
+        end=data_settings["end"],
+        cache=resample_cache,
+        num_workers=num_workers,
+        output_dir=args.output / "matches",
+    )
+
+    output = args.output / "summary.parquet"
+    summary.to_parquet(output, index=False)
+    logger.info(
+        f"Summary of {len(summary)} patterns and symbols saved to {output}, "
+        f"matches of every symbol to {args.output / 'matches'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Module Name: chunked_evaluation.py
+Description: Out-of-core evaluation of candlestick patterns. Market data is streamed in
+fixed-size chunks overlapping by `max_lag` candles and the fitness sufficient statistics are
+accumulated over the chunks, so results are identical to a whole-series evaluation while memory
+is bounded by the chunk size.
+
+Last Updated: 2024-09-01
+"""
+
+import numpy as np
+
+from src.modules.fitness_functions import (
+    FitnessAccumulator,
+    FitnessStatistics,
+    fitness_from_statistics,
+)
+from src.modules.pattern_evaluation import forward_log_returns, population_match_matrix
+from src.utils.data_loader import ChunkedOHLC
+
+
+class ChunkedEvaluator:
+    """
+    Evaluates populations of candlestick patterns on market data read chunk by chunk.
+
+    Attributes :
+    -------
+        - `data`: Market data read in chunks
+        - `max_lag`: Maximum number of candlesticks to look back for each parameter in a pattern
+        - `bullish_focus`: Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+        - `num_candles`: Number of candles of the whole series
+        - `num_passes`: Number of passes over the market data so far
+
+    Methods :
+    -------
+        - `segment_statistics(population, segment_starts, groups)`: Statistics of every segment (or group of segments) of the candles
+        - `statistics(population)`: Statistics of the whole series, same as `fitness_statistics`
+        - `fitness(fitness_type, population, min_support)`: Fitness values, same as `population_fitness`
+
+    Example :
+    -------
+        - Example illustrates evaluation of a population on minute candles that do not fit in memory
+
+    .. code-block:: python
+        evaluator = ChunkedEvaluator(ChunkedOHLC("data/BTC", chunk_size=1_000_000), max_lag=3)
+        fitness_values = evaluator.fitness("martin_ratio", population)
+
+    Note :
+    -------
+        - Every pass reads the whole market data, so a population should be evaluated at once
+          instead of pattern by pattern
+        - Peak memory is roughly (population size + 200) * chunk size bytes, forward log returns are
+          calculated from the loaded chunk in every pass, so nothing grows with the number of candles
+    """
+
+    def __init__(self, data: ChunkedOHLC, max_lag: int, bullish_focus: bool = True):
+        self.data = data
+        self.max_lag = max_lag
+        self.bullish_focus = bullish_focus
+        self.num_candles = data.num_candles
+        self.num_passes = 0
+
+    def segment_statistics(
+        self,
+        population: np.ndarray,
+        segment_starts: np.ndarray | None = None,
+        groups: np.ndarray | None = None,
+    ) -> FitnessStatistics:
+        """
+        Calculates sufficient statistics of patterns separately for consecutive segments of the candles.
+
+        Parameters :
+        -------
+            - `population` : 2-D integer array, each row is an encoded pattern (chromosome)
+            - `segment_starts` : Increasing first candles of the segments, starting with 0 (None is a single segment)
+            - `groups` : Membership of the segments in groups (see `FitnessAccumulator.statistics`), None for every segment
+
+        Returns :
+        -------
+            - `FitnessStatistics` : Statistics of shape (number of patterns, number of segments or groups),
+                                    same as `segment_fitness_statistics` on the whole series
+        """
+        population = np.atleast_2d(population)
+        accumulator = FitnessAccumulator(len(population), self.num_candles, segment_starts)
+        for chunk in self.data.chunks(self.max_lag):
+            candles = slice(chunk.lookback, chunk.lookback + chunk.num_candles)
+            match_matrix = population_match_matrix(chunk.ohlc, population, self.max_lag)
+            # The chunk holds the candle following its last one, so its log returns are complete
+            next_returns = forward_log_returns(chunk.ohlc, self.bullish_focus)[candles]
+            accumulator.add(match_matrix[:, candles], next_returns, chunk.first_candle)
+            # Release the match masks before the next chunk is matched
+            del match_matrix, next_returns
+        self.num_passes += 1
+        return accumulator.statistics(groups)
+
+    def statistics(self, population: np.ndarray) -> FitnessStatistics:
+        """
+        Calculates sufficient statistics of patterns over the whole series, same as `fitness_statistics`.
+        """
+        statistics = self.segment_statistics(population)
+        return FitnessStatistics(
+            int(statistics.num_candles[0]), *(field[:, 0] for field in statistics[1:])
+        )
+
+    def fitness(
+        self, fitness_type: str, population: np.ndarray, min_support: float = 0.025
+    ) -> np.ndarray:
+        """
+        Calculates the fitness of every pattern in a population in one pass over the market data.
+
+        Parameters :
+        -------
+            - `fitness_type` : Name of the fitness function ("total_return", "profit_factor" or "martin_ratio")
+            - `population` : 2-D integer array, each row is an encoded pattern (chromosome)
+            - `min_support` : Minimal share of candles the pattern needs to be matched on
+
+        Returns :
+        -------
+            - `np.ndarray` : Fitness value of each pattern, same as `population_fitness` on the whole series
+        """
+        return fitness_from_statistics(
+            fitness_type, self.statistics(population), min_support
+        )
@@ -0,0 +1,301 @@
+"""
+Module Name: condition_index.py
+Description: Precomputed bitsets of every candlestick condition over a dataset, so that
+patterns are matched with bitwise operations instead of repeated price comparisons.
+
+Last Updated: 2024-09-01
+"""
+
+import numpy as np
+
+NUM_PARAMS = 4  # Open, Close, High, Low
+NUM_COMPARISONS = 2  # <, >
+
+
+class ConditionIndex:
+    """
+    Packed bit arrays of all distinct candlestick conditions over the candles of a dataset.
+
+    Attributes :
+    -------
+        - `max_lag`: Maximum number of candlesticks to look back for each parameter in a pattern
+        - `num_candles`: Number of candles (rows) of the indexed market data
+        - `condition_ids`: Array of shape (4, max_lag + 1, 2, 4, max_lag + 1) mapping an encoded
+                           condition (param1, lag1, comparison, param2, lag2) to its row in `bitsets`
+        - `bitsets`: Array of shape (number of distinct conditions, ceil(num_candles / 8)), bit `t`
+                     of a row is set if the condition holds on candle `t`
+
+    Methods :
+    -------
+        - `pattern_bits(encoded_pattern)`: Packed match bits of a pattern
+        - `match_mask(encoded_pattern)`: Boolean match mask of a pattern
+        - `match_count(encoded_pattern)`: Number of candles a pattern is matched on
+        - `population_condition_ids(population)`: Bitset rows of the conditions of a whole population
+        - `population_bits(population, start, stop)`: Packed match bits of a whole population
+        - `population_match_matrix(population, start, stop)`: Boolean match masks of a whole population
+        - `condition_match_matrix(start, stop)`: Boolean match masks of every distinct condition
+        - `unpack_bits(bits, start, stop)`: Match masks of a range of candles from packed match bits
+        - `estimate_nbytes(num_candles, max_lag)`: Memory needed for an index, before building it
+        - `from_arrays(bitsets, condition_ids, num_candles)`: Wraps already built index arrays
+
+    Example :
+    -------
+        - Example illustrates matching of a pattern with two conditions
+
+    .. code-block:: python
+        index = ConditionIndex(ohlc_to_array(df), max_lag=3)
+        match_mask = index.match_mask([1, 1, 1, 3, 0, 3, 0, 1, 3, 3])
+        print(index.match_count([1, 1, 1, 3, 0, 3, 0, 1, 3, 3]), f"{index.nbytes / 2**20:.2f} MB")
+
+    Note :
+    -------
+        - Reversed conditions (`C[1] > L[3]` and `L[3] < C[1]`) share the same bitset and
+          self-comparisons (`C[0] < C[0]`) are always true, so the index stores
+          K * (K - 1) + 1 bitsets for K = 4 * (max_lag + 1) parameter/lag operands
+        - The first `max_lag` candles are never matched (same as in `pattern_is_matched`)
+    """
+
+    def __init__(self, ohlc: np.ndarray, max_lag: int):
+        self.max_lag = max_lag
+        self.num_candles = ohlc.shape[1]
+
+        num_lags = max_lag + 1
+        num_operands = NUM_PARAMS * num_lags
+        self.condition_ids = np.empty(
+            (NUM_PARAMS, num_lags, NUM_COMPARISONS, NUM_PARAMS, num_lags), dtype=np.intp
+        )
+        operand_ids = self.condition_ids.reshape(num_operands, NUM_COMPARISONS, num_operands)
+
+        self.bitsets = np.empty(
+            (self._num_bitsets(max_lag), (self.num_candles + 7) // 8), dtype=np.uint8
+        )
+        match_mask = np.zeros(self.num_candles, dtype=bool)
+        window = match_mask[max_lag:]
+
+        # Row 0 holds the always matched self-comparison
+        window[:] = True
+        self.bitsets[0] = np.packbits(match_mask, bitorder="little")
+        operand_ids[np.arange(num_operands), :, np.arange(num_operands)] = 0
+
+        bitset_idx = 1
+        for operand1 in range(num_operands):
+            price1 = self._shifted_prices(ohlc, operand1)
+            for operand2 in range(operand1 + 1, num_operands):
+                price2 = self._shifted_prices(ohlc, operand2)
+                # Equal prices satisfy both comparisons, as in `pattern_is_matched`
+                for comparison, failed in enumerate((price1 > price2, price1 < price2)):
+                    np.logical_not(failed, out=window)
+                    self.bitsets[bitset_idx] = np.packbits(match_mask, bitorder="little")
+                    operand_ids[operand1, comparison, operand2] = bitset_idx
+                    # Reversed condition: L[3] < C[1] is the same as C[1] > L[3]
+                    operand_ids[operand2, 1 - comparison, operand1] = bitset_idx
+                    bitset_idx += 1
+
+    @classmethod
+    def from_arrays(
+        cls, bitsets: np.ndarray, condition_ids: np.ndarray, num_candles: int
+    ) -> "ConditionIndex":
+        """
+        Wraps already built index arrays (e.g. attached from shared memory) without copying them.
+
+        Parameters :
+        -------
+            - `bitsets` : `bitsets` attribute of a built index
+            - `condition_ids` : `condition_ids` attribute of a built index
+            - `num_candles` : Number of candles (rows) of the indexed market data
+
+        Returns :
+        -------
+            - `ConditionIndex` : Index using the given arrays
+        """
+        index = cls.__new__(cls)
+        index.max_lag = condition_ids.shape[1] - 1
+        index.num_candles = num_candles
+        index.bitsets = bitsets
+        index.condition_ids = condition_ids
+        return index
+
+    def _shifted_prices(self, ohlc: np.ndarray, operand: int) -> np.ndarray:
+        """
+        Returns the prices of an operand aligned to the candles from `max_lag` onwards.
+        """
+        param, lag = divmod(operand, self.max_lag + 1)
+        first_candle = self.max_lag - lag
+        return ohlc[param, first_candle : max(self.num_candles - lag, first_candle)]
+
+    @staticmethod
+    def _num_bitsets(max_lag: int) -> int:
+        num_operands = NUM_PARAMS * (max_lag + 1)
+        return num_operands * (num_operands - 1) + 1
+
+    @classmethod
+    def estimate_nbytes(cls, num_candles: int, max_lag: int) -> int:
+        """
+        Estimates the memory of an index before building it.
+
+        Parameters :
+        -------
+            - `num_candles` : Number of candles (rows) of the market data
+            - `max_lag` : Maximum number of candlesticks to look back
+
+        Returns :
+        -------
+            - `int` : Number of bytes used by the bitsets
+        """
+        return cls._num_bitsets(max_lag) * ((num_candles + 7) // 8)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes used by the index (bitsets and lookup table).
+        """
+        return self.bitsets.nbytes + self.condition_ids.nbytes
+
+    def pattern_condition_ids(self, encoded_pattern: list[int]) -> np.ndarray:
+        """
+        Returns the bitset rows of every condition of an encoded pattern.
+        """
+        conditions = np.reshape(encoded_pattern, (-1, 5)).astype(np.intp, copy=False)
+        return self.condition_ids[tuple(conditions.T)]
+
+    def pattern_bits(self, encoded_pattern: list[int]) -> np.ndarray:
+        """
+        Calculates the packed match bits of an encoded pattern.
+
+        Parameters :
+        -------
+            - `encoded_pattern` : List of integers representing the pattern to be matched
+
+        Returns :
+        -------
+            - `bits` : Packed (little bit order) array, bit `t` is set if the pattern is matched on candle `t`
+        """
+        return np.bitwise_and.reduce(
+            self.bitsets[self.pattern_condition_ids(encoded_pattern)], axis=0
+        )
+
+    def match_mask(self, encoded_pattern: list[int]) -> np.ndarray:
+        """
+        Calculates the match mask of an encoded pattern, same as `pattern_match_mask`.
+
+        Parameters :
+        -------
+            - `encoded_pattern` : List of integers representing the pattern to be matched
+
+        Returns :
+        -------
+            - `match_mask` : Boolean array of length `num_candles`, True where the pattern is matched
+        """
+        return np.unpackbits(
+            self.pattern_bits(encoded_pattern), count=self.num_candles, bitorder="little"
+        ).view(bool)
+
+    def match_count(self, encoded_pattern: list[int]) -> int:
+        """
+        Counts the candles an encoded pattern is matched on.
+
+        Parameters :
+        -------
+            - `encoded_pattern` : List of integers representing the pattern to be matched
+
+        Returns :
+        -------
+            - `int` : Number of matched candles
+        """
+        return int(np.bitwise_count(self.pattern_bits(encoded_pattern)).sum())
+
+    def population_condition_ids(self, population: np.ndarray) -> np.ndarray:
+        """
+        Returns the bitset rows of every condition of every pattern, shape (number of patterns, number of conditions).
+        """
+        population = np.asarray(population, dtype=np.intp)
+        conditions = population.reshape(population.shape[0], -1, 5)
+        return self.condition_ids[tuple(np.moveaxis(conditions, 2, 0))]
+
+    def population_match_matrix(
+        self, population: np.ndarray, start: int = 0, stop: int | None = None
+    ) -> np.ndarray:
+        """
+        Calculates the match masks of a whole population in one pass.
+
+        Parameters :
+        -------
+            - `population` : 2-D integer array, each row is an encoded pattern (chromosome)
+            - `start` : First candle of the match masks
+            - `stop` : End candle (exclusive) of the match masks, None matches up to the last candle
+
+        Returns :
+        -------
+            - `match_matrix` : Boolean array of shape (number of patterns, `stop` - `start`)
+
+        Note :
+        -------
+            - Memory of the result grows with population size times number of candles,
+              large populations should be passed in batches
+            - Only the bitset bytes of the candle range are combined, so matching a prefix of the
+              candles is proportionally cheaper
+        """
+        stop = self.num_candles if stop is None else stop
+        return self.unpack_bits(self.population_bits(population, start, stop), start, stop)
+
+    def population_bits(
+        self, population: np.ndarray, start: int = 0, stop: int | None = None
+    ) -> np.ndarray:
+        """
+        Calculates the packed match bits of a whole population.
+
+        Parameters :
+        -------
+            - `population` : 2-D integer array, each row is an encoded pattern (chromosome)
+            - `start` : First candle of the match bits
+            - `stop` : End candle (exclusive) of the match bits, None matches up to the last candle
+
+        Returns :
+        -------
+            - `bits` : Packed (little bit order) array of shape (number of patterns, bytes of the candle range),
+                       the first byte holds candle `start // 8 * 8`
+        """
+        stop = self.num_candles if stop is None else stop
+        byte_range = slice(start // 8, (stop + 7) // 8)
+
+        condition_ids = self.population_condition_ids(population)
+        bits = self.bitsets[condition_ids[:, 0], byte_range]
+        for condition in range(1, condition_ids.shape[1]):
+            bits &= self.bitsets[condition_ids[:, condition], byte_range]
+        return bits
+
+    def condition_match_matrix(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """
+        Unpacks the match masks of every distinct condition (row of `bitsets`) over a range of candles.
+
+        Parameters :
+        -------
+            - `start` : First candle of the match masks
+            - `stop` : End candle (exclusive) of the match masks, None matches up to the last candle
+
+        Returns :
+        -------
+            - `match_matrix` : Boolean array of shape (number of distinct conditions, `stop` - `start`)
+        """
+        stop = self.num_candles if stop is None else stop
+        return self.unpack_bits(self.bitsets[:, start // 8 : (stop + 7) // 8], start, stop)
+
+    @staticmethod
+    def unpack_bits(bits: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """
+        Unpacks packed match bits to match masks of the candles `start` to `stop` (exclusive).
+
+        Parameters :
+        -------
+            - `bits` : Packed (little bit order) 2-D array whose first byte holds candle `start // 8 * 8`
+            - `start` : First candle of the match masks
+            - `stop` : End candle (exclusive) of the match masks
+
+        Returns :
+        -------
+            - `match_matrix` : Boolean array of shape (number of rows, `stop` - `start`)
+        """
+        first_bit = start // 8 * 8
+        return np.unpackbits(
+            bits, axis=1, count=stop - first_bit, bitorder="little"
+        ).view(bool)[:, start - first_bit :]
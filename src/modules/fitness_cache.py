@@ -0,0 +1,179 @@
+"""
+Module Name: fitness_cache.py
+Description: Bounded LRU cache of fitness values keyed by the canonical form of candlestick
+patterns, optionally persisted to disk between runs on the same dataset.
+
+Last Updated: 2024-09-01
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from src.modules.pattern_encoder import canonicalize_patterns
+from src.utils.logger import logger
+
+
+class FitnessCache:
+    """
+    Least recently used cache of fitness values of candlestick patterns.
+
+    Attributes :
+    -------
+        - `max_lag`: Maximum number of candlesticks to look back, used to canonicalize patterns
+        - `max_size`: Maximum number of cached fitness values, least recently used are evicted first
+        - `path`: File the cache is loaded from and saved to, None for an in-memory cache
+        - `hits`: Number of fitness values found in the cache
+        - `misses`: Number of fitness values that had to be calculated
+
+    Methods :
+    -------
+        - `key(encoded_pattern)`: Canonical cache key of a pattern
+        - `keys(population)`: Canonical cache keys of a population
+        - `get(key)`: Cached fitness value or None
+        - `put(key, fitness)`: Stores a fitness value
+        - `save()`: Writes the cache to `path`
+        - `to_arrays()`: Keys and fitness values as arrays, e.g. for checkpoints
+        - `load_arrays(keys, values)`: Replaces the cached values with arrays of `to_arrays`
+        - `file_path(directory, ohlc, num_conds, max_lag, fitness_type, bullish_focus, min_support, variant)`: Cache file of a run setup
+
+    Example :
+    -------
+        - Example illustrates caching of two patterns that are written differently
+
+    .. code-block:: python
+        cache = FitnessCache(max_lag=3)
+        cache.put(cache.key([1, 1, 1, 3, 3]), 12.5)  # C[1] > L[3]
+        print(cache.get(cache.key([3, 3, 0, 1, 1])))  # L[3] < C[1]
+        ----------------------OUTPUT----------------------
+        12.5
+    """
+
+    def __init__(self, max_lag: int, max_size: int = 100_000, path: Path | None = None):
+        self.max_lag = max_lag
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, float] = OrderedDict()
+
+        if self.path is not None and self.path.exists():
+            with np.load(self.path, allow_pickle=False) as data:
+                self.load_arrays(data["keys"], data["values"])
+            logger.info(f"Loaded {len(self)} fitness values from {self.path}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, encoded_pattern: list[int]) -> bytes:
+        """
+        Returns the cache key of a pattern, equal for patterns with the same canonical form.
+        """
+        return canonicalize_patterns(encoded_pattern, self.max_lag)[0].tobytes()
+
+    def keys(self, population: np.ndarray) -> list[bytes]:
+        """
+        Returns the cache keys of every pattern in a population (2-D array).
+        """
+        return [row.tobytes() for row in canonicalize_patterns(population, self.max_lag)]
+
+    def get(self, key: bytes) -> float | None:
+        """
+        Returns the cached fitness value of `key` (None if missing) and updates the hit/miss counters.
+        """
+        fitness = self._entries.get(key)
+        if fitness is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return fitness
+
+    def put(self, key: bytes, fitness: float) -> None:
+        """
+        Stores the fitness value of `key`, evicting the least recently used values if the cache is full.
+        """
+        self._entries[key] = fitness
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        """
+        Writes the cached fitness values to `path` as arrays of `to_arrays` (.npz), if the cache is persistent.
+        """
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        keys, values = self.to_arrays()
+        temporary_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with temporary_path.open("wb") as file:
+            np.savez(file, keys=keys, values=values)
+        temporary_path.replace(self.path)
+        logger.info(f"Saved {len(self)} fitness values to {self.path}")
+
+    def to_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the cache keys (2-D uint8 array, one key per row) and fitness values in least recently used order.
+        """
+        key_length = len(next(iter(self._entries), b""))
+        keys = np.frombuffer(b"".join(self._entries), dtype=np.uint8)
+        values = np.fromiter(self._entries.values(), dtype=np.float64, count=len(self))
+        return keys.reshape(len(self), key_length), values
+
+    def load_arrays(self, keys: np.ndarray, values: np.ndarray) -> None:
+        """
+        Replaces the cached fitness values with the output of `to_arrays`, keeping the least recently used order.
+        """
+        self._entries = OrderedDict(
+            zip((key.tobytes() for key in keys), values.tolist())
+        )
+        self._evict()
+
+    @staticmethod
+    def file_path(
+        directory: str | Path,
+        ohlc: np.ndarray | str,
+        num_conds: int,
+        max_lag: int,
+        fitness_type: str,
+        bullish_focus: bool,
+        min_support: float = 0.025,
+        variant: str | None = None,
+    ) -> Path:
+        """
+        Returns the cache file of a run setup, fitness values are only reused for the same setup.
+
+        Parameters :
+        -------
+            - `directory` : Directory containing cache files
+            - `ohlc` : Market data as returned by `ohlc_to_array`, identified by the hash of its content.
+                       Market data read in chunks passes its content hash (see `ChunkedOHLC.fingerprint`)
+            - `num_conds` : Number of conditions of the patterns, every file holds keys of one length
+            - `max_lag` : Maximum number of candlesticks to look back
+            - `fitness_type` : Name of the fitness function
+            - `bullish_focus` : Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+            - `min_support` : Minimal share of candles a pattern needs to be matched on
+            - `variant` : Optional name of further settings changing fitness values (e.g. validation folds)
+
+        Returns :
+        -------
+            - `Path` : Path of the cache file
+        """
+        fingerprint = (
+            ohlc
+            if isinstance(ohlc, str)
+            else hashlib.sha256(np.ascontiguousarray(ohlc).tobytes()).hexdigest()
+        )
+        focus = "bullish" if bullish_focus else "bearish"
+        suffix = "" if variant is None else f"_{variant}"
+        return (
+            Path(directory)
+            / f"{fingerprint[:16]}_conds{num_conds}_lag{max_lag}_{fitness_type}_{focus}_support{min_support}{suffix}.npz"
+        )
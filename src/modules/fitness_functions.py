@@ -1,12 +1,20 @@
 """
 Module Name: fitness_functions.py
-Description: Need to update!
+Description: Fitness functions of candlestick patterns (total return, profit factor and
+Martin ratio). Reference implementations work on lists of log returns, vectorized versions calculate
+the same values for whole populations from summary statistics of the match masks.
 
 Last Updated: 2024-09-01
 """
 
 from math import log as ln, sqrt
 from statistics import mean
+from typing import NamedTuple
+
+import numpy as np
+
+# Number of match mask elements (patterns x candles) multiplied at once by `FitnessAccumulator`
+_PRODUCT_BLOCK_ELEMENTS = 2**22
 
 
 def total_return(log_returns: list[float]) -> float:
@@ -24,13 +32,14 @@ def total_return(log_returns: list[float]) -> float:
     return max(round(sum(log_returns), 2), 0)
 
 
-def profit_factor(log_returns: list[float]) -> float:
+def profit_factor(log_returns: list[float], min_support: float = 0.025) -> float:
     """
     Calculate the profit factor from a list of log returns.
 
     Parameters :
     -------
         - `log_returns` : List containing log returns for each candlestick
+        - `min_support` : Minimal share of candles the pattern needs to be matched on, otherwise 0 is returned
 
     Returns :
     -------
@@ -41,9 +50,9 @@ def profit_factor(log_returns: list[float]) -> float:
         - If the negative returns are zero, the profit factor is calculated as the sum of positive returns divided by 0.01
     """
 
-    # Pattern needs to be matched at least 2.5% of the time (avoiding noise)
+    # Pattern needs to be matched at least `min_support` of the time (avoiding noise)
     pattern_matches = sum(1 for r in log_returns if isinstance(r, float))
-    if pattern_matches < 0.025 * len(log_returns):
+    if pattern_matches < min_support * len(log_returns):
         return 0
 
     positive_returns = sum(r for r in log_returns if r > 0)
@@ -59,13 +68,14 @@ def profit_factor(log_returns: list[float]) -> float:
         return round(max(ln(profit_ratio), 0), 2)
 
 
-def martin_ratio(log_returns: list[float]) -> float:
+def martin_ratio(log_returns: list[float], min_support: float = 0.025) -> float:
     """
     Calculate the Martin ratio also known as Ulcer Performing Index (UPI) from a list of log returns.
 
     Parameters :
     -------
         - `log_returns` : List containing log returns for each candlestick
+        - `min_support` : Minimal share of candles the pattern needs to be matched on, otherwise 0 is returned
 
     Returns :
     -------
@@ -76,9 +86,9 @@ def martin_ratio(log_returns: list[float]) -> float:
         - If there is no drawdowns, the martin ratio is calculated as the total return divided by 0.01
     """
 
-    # Pattern needs to be matched at least 2.5% of the time (avoiding noise)
+    # Pattern needs to be matched at least `min_support` of the time (avoiding noise)
     pattern_matches = sum(1 for r in log_returns if isinstance(r, float))
-    if pattern_matches < 0.025 * len(log_returns):
+    if pattern_matches < min_support * len(log_returns):
         return 0
 
     total_return = max(round(sum(log_returns), 2), 0)
@@ -91,3 +101,469 @@ def martin_ratio(log_returns: list[float]) -> float:
         return round(total_return / 0.01, 2)
     else:
         return round(total_return / sqrt(mean(squared_drawdowns)), 2)
+
+
+class FitnessStatistics(NamedTuple):
+    """
+    Sufficient statistics of pattern log returns, every fitness function is calculated from them.
+
+    Attributes :
+    -------
+        - `num_candles`: Number of candles (rows) of the market data (or of each segment)
+        - `match_count`: Number of candles each pattern is matched on
+        - `positive_sum`: Sum of positive log returns of each pattern
+        - `negative_sum`: Sum of negative log returns of each pattern
+        - `negative_count`: Number of negative log returns (drawdowns) of each pattern
+        - `squared_negative_sum`: Sum of squared negative log returns of each pattern
+    """
+
+    num_candles: int | np.ndarray
+    match_count: np.ndarray
+    positive_sum: np.ndarray
+    negative_sum: np.ndarray
+    negative_count: np.ndarray
+    squared_negative_sum: np.ndarray
+
+
+def fitness_statistics(match_mask: np.ndarray, next_returns: np.ndarray) -> FitnessStatistics:
+    """
+    Calculate sufficient statistics of patterns from their match masks in one pass.
+
+    Parameters :
+    -------
+        - `match_mask` : Boolean array of length n, True where the pattern is matched. A 2-D array
+                         (population x candles) holds one pattern per row, a 1-D array is a population of one
+        - `next_returns` : Output of `forward_log_returns` for the same market data, or of
+                           `horizon_log_returns` to calculate the statistics of every exit horizon
+
+    Returns :
+    -------
+        - `FitnessStatistics` : Statistics with one value per pattern, of shape (number of horizons, number of patterns)
+                                for several exit horizons
+
+    Note :
+    -------
+        - If the pattern is matched on the last candle, the average of previous non-zero log returns
+          is used as its log return (same as `evaluate_candlestick_pattern`, see `FitnessAccumulator` for
+          the rounding tolerance)
+        - Candles without a forward log return (missing prices) do not contribute to the sums
+    """
+    statistics = segment_fitness_statistics(match_mask, next_returns, np.array([0]))
+    return FitnessStatistics(
+        int(statistics.num_candles[0]), *(field[..., 0] for field in statistics[1:])
+    )
+
+
+def segment_fitness_statistics(
+    match_mask: np.ndarray,
+    next_returns: np.ndarray,
+    segment_starts: np.ndarray,
+    groups: np.ndarray | None = None,
+) -> FitnessStatistics:
+    """
+    Calculate sufficient statistics of patterns separately for consecutive segments of the candles.
+
+    Parameters :
+    -------
+        - `match_mask` : Boolean array of length n, True where the pattern is matched. A 2-D array
+                         (population x candles) holds one pattern per row, a 1-D array is a population of one
+        - `next_returns` : Output of `forward_log_returns` (or `horizon_log_returns`) for the same market data
+        - `segment_starts` : Increasing first candles of the segments, starting with 0. The last segment ends at n
+        - `groups` : Membership of the segments in groups (see `FitnessAccumulator.statistics`), None for every segment
+
+    Returns :
+    -------
+        - `FitnessStatistics` : Statistics of shape (number of patterns, number of segments or groups), with a leading
+                                horizon axis for several exit horizons. `num_candles` holds the length of each segment
+
+    Note :
+    -------
+        - Statistics of the segments sum up to the statistics of the whole series, the log return of a
+          pattern matched on the last candle is the average over the whole series (see `fitness_statistics`)
+        - The whole series is a single chunk of `FitnessAccumulator`, so results are identical to a
+          chunked evaluation
+    """
+    match_matrix = np.atleast_2d(match_mask)
+    accumulator = FitnessAccumulator(
+        match_matrix.shape[0],
+        match_matrix.shape[1],
+        segment_starts,
+        len(next_returns) if next_returns.ndim == 2 else None,
+    )
+    accumulator.add(match_matrix, next_returns, first_candle=0)
+    return accumulator.statistics(groups)
+
+
+class FitnessAccumulator:
+    """
+    Accumulates sufficient statistics of patterns over consecutive chunks of the candles.
+
+    Attributes :
+    -------
+        - `num_candles`: Number of candles (rows) of the whole market data
+        - `segment_starts`: Increasing first candles of the segments, starting with 0
+        - `candles_added`: Number of candles added so far
+        - `num_horizons`: Number of exit horizons of the log returns, None for a single log return per candle
+
+    Methods :
+    -------
+        - `add(match_matrix, next_returns, first_candle)`: Adds the statistics of a chunk of candles
+        - `statistics(groups)`: Statistics of the whole series (or of groups of segments), once all candles are added
+        - `partial_statistics()`: Statistics of the candles added so far
+        - `keep(rows)`: Drops the statistics of all other patterns
+
+    Example :
+    -------
+        - Example illustrates accumulation of a population over chunks of 100,000 candles
+
+    .. code-block:: python
+        accumulator = FitnessAccumulator(len(population), num_candles)
+        for first in range(0, num_candles, 100_000):
+            chunk = slice(first, first + 100_000)
+            accumulator.add(match_matrix[:, chunk], next_returns[chunk], first)
+        statistics = accumulator.statistics()
+
+    Note :
+    -------
+        - Log returns are multiples of 0.01 and are summed as integer cents, the sums are exact
+          and do not depend on the chunk sizes or on the summation order
+        - The average log return of the last candle is rounded from the sums of cents with `np.round`.
+          At a rounding tie (e.g. an average of 0.015) it can differ by 0.01 from
+          `round(mean(non_zero_returns), 2)` of `evaluate_candlestick_pattern`, which rounds the float mean
+        - Chunks have to be added in chronological order without gaps
+        - Log returns of several exit horizons (see `horizon_log_returns`) are accumulated with the same
+          product over the match matrix, statistics then have a leading horizon axis
+    """
+
+    def __init__(
+        self,
+        num_patterns: int,
+        num_candles: int,
+        segment_starts: np.ndarray | None = None,
+        num_horizons: int | None = None,
+    ):
+        self.num_candles = num_candles
+        self.segment_starts = (
+            np.array([0]) if segment_starts is None else np.asarray(segment_starts)
+        )
+        self.candles_added = 0
+        # None accumulates a single log return per candle (statistics without horizon axis)
+        self.num_horizons = num_horizons
+        # Columns: positive cents, negative cents, drawdowns, squared negative cents, gains, matches
+        self._sums = np.zeros(
+            (num_patterns, len(self.segment_starts), num_horizons or 1, 6)
+        )
+        self._last_match = np.zeros(num_patterns, dtype=bool)
+
+    def add(
+        self, match_matrix: np.ndarray, next_returns: np.ndarray, first_candle: int
+    ) -> None:
+        """
+        Adds the statistics of a chunk of consecutive candles.
+
+        Parameters :
+        -------
+            - `match_matrix` : 2-D boolean array (population x chunk candles), True where the pattern is matched
+            - `next_returns` : Forward log returns of the chunk candles (see `forward_log_returns`),
+                               the value of the last candle of the series is ignored. Of shape
+                               (`num_horizons`, chunk candles) for several exit horizons
+            - `first_candle` : Index of the first chunk candle in the whole series
+        """
+        if first_candle != self.candles_added:
+            raise ValueError(
+                f"Chunk starts at candle {first_candle}, expected candle {self.candles_added}"
+            )
+        chunk_end = first_candle + match_matrix.shape[1]
+        self.candles_added = chunk_end
+
+        # The last candle has no subsequent candle and is handled in `statistics`
+        if chunk_end == self.num_candles:
+            self._last_match = match_matrix[:, -1].copy()
+        num_returns = min(chunk_end, self.num_candles - 1) - first_candle
+        if num_returns <= 0:
+            return
+
+        cents = np.rint(np.nan_to_num(next_returns[..., :num_returns], nan=0.0) * 100)
+        block_size = max(_PRODUCT_BLOCK_ELEMENTS // max(match_matrix.shape[0], 1), 1024)
+        returns_end = first_candle + num_returns
+        segment = np.searchsorted(self.segment_starts, first_candle, side="right") - 1
+        while segment < len(self.segment_starts):
+            first = max(self.segment_starts[segment], first_candle)
+            if first >= returns_end:
+                break
+            last = (
+                min(self.segment_starts[segment + 1], returns_end)
+                if segment + 1 < len(self.segment_starts)
+                else returns_end
+            )
+            # Products are taken in blocks, so the floating point copies stay small
+            for block_first in range(first, last, block_size):
+                local = slice(
+                    block_first - first_candle,
+                    min(block_first + block_size, last) - first_candle,
+                )
+                self._sums[:, segment] += (
+                    match_matrix[:, local] @ self._statistic_columns(cents[..., local])
+                ).reshape(len(match_matrix), -1, 6)
+            segment += 1
+
+    def keep(self, rows: np.ndarray) -> None:
+        """
+        Keeps the statistics of the selected patterns only, e.g. patterns still racing (see `RacingEvaluator`).
+
+        Parameters :
+        -------
+            - `rows` : Boolean mask or indices of the kept patterns
+        """
+        self._sums = self._sums[rows]
+        self._last_match = self._last_match[rows]
+
+    def partial_statistics(self) -> FitnessStatistics:
+        """
+        Returns the statistics of the candles added so far, without the last candle rule.
+
+        Returns :
+        -------
+            - `FitnessStatistics` : Statistics of shape (number of patterns, number of segments),
+                                    `num_candles` holds the number of candles added to each segment
+        """
+        segment_ends = np.append(self.segment_starts[1:], self.num_candles)
+        added = np.clip(
+            np.minimum(segment_ends, self.candles_added) - self.segment_starts, 0, None
+        )
+        return self._statistics(added, self._sums)
+
+    def _statistics(self, num_candles: np.ndarray, sums: np.ndarray) -> FitnessStatistics:
+        """
+        Converts sums of cents into statistics, with the horizon axis first for several exit horizons.
+        """
+
+        def field(column: int) -> np.ndarray:
+            values = sums[..., column]
+            return values[..., 0] if self.num_horizons is None else np.moveaxis(values, 2, 0)
+
+        return FitnessStatistics(
+            num_candles=num_candles,
+            match_count=field(5).astype(np.int64),
+            positive_sum=field(0) / 100,
+            negative_sum=field(1) / 100,
+            negative_count=field(2),
+            squared_negative_sum=field(3) / 10_000,
+        )
+
+    @staticmethod
+    def _statistic_columns(cents: np.ndarray) -> np.ndarray:
+        """
+        One column per statistic (and exit horizon), all of them are summed over matched candles with a single product.
+        """
+        cents = np.atleast_2d(cents).T
+        negative_cents = np.minimum(cents, 0)
+        # Columns of the same horizon are adjacent
+        columns = np.empty((*cents.shape, 6))
+        np.maximum(cents, 0, out=columns[..., 0])
+        columns[..., 1] = negative_cents
+        columns[..., 2] = negative_cents < 0
+        np.square(negative_cents, out=columns[..., 3])
+        columns[..., 4] = cents > 0
+        columns[..., 5] = 1.0
+        return columns.reshape(len(cents), -1)
+
+    def statistics(self, groups: np.ndarray | None = None) -> FitnessStatistics:
+        """
+        Returns the statistics of the whole series.
+
+        Parameters :
+        -------
+            - `groups` : Membership (0 or 1) of the segments in groups, of shape (number of segments, number of groups)
+                         or (number of horizons, number of segments, number of groups) for a membership per exit
+                         horizon. None returns the statistics of every segment
+
+        Returns :
+        -------
+            - `FitnessStatistics` : Statistics of shape (number of patterns, number of segments or groups),
+                                    `num_candles` holds the length of each segment or group, of shape
+                                    (number of horizons, 1, number of groups) for a membership per exit horizon
+
+        Note :
+        -------
+            - The log return of a pattern matched on the last candle is the average over the whole series,
+              with `groups` it is the average over each group holding the last segment
+        """
+        if self.candles_added != self.num_candles:
+            raise ValueError(
+                f"{self.candles_added} of {self.num_candles} candles were added"
+            )
+        segment_lengths = np.diff(np.append(self.segment_starts, self.num_candles))
+        if groups is None:
+            sums = self._sums.copy()
+            self._add_last_candle(
+                sums[:, -1:], self._sums.sum(axis=1, keepdims=True), np.ones((1, 1))
+            )
+            return self._statistics(segment_lengths, sums)
+
+        groups = np.asarray(groups, dtype=np.float64)
+        horizon_groups = np.broadcast_to(groups, (self._sums.shape[2], *groups.shape[-2:]))
+        sums = np.einsum("pshc,hsg->pghc", self._sums, horizon_groups)
+        self._add_last_candle(sums, sums.copy(), horizon_groups[:, -1].T)
+        group_lengths = segment_lengths @ groups
+        if groups.ndim == 3:
+            # Broadcasts with the horizon and pattern axes of the other fields
+            group_lengths = group_lengths[:, np.newaxis]
+        return self._statistics(group_lengths, sums)
+
+    def _add_last_candle(
+        self, sums: np.ndarray, totals: np.ndarray, last_groups: np.ndarray
+    ) -> None:
+        """
+        Adds the log return of patterns matched on the last candle to `sums` of shape (patterns, groups, horizons, 6),
+        the rounded average of the non-zero log returns of `totals` in the groups holding the last candle
+        (`last_groups` of shape (groups, horizons)).
+        """
+        positive_cents, negative_cents, negative_count, _, positive_count, _ = np.moveaxis(
+            totals, -1, 0
+        )
+        nonzero_count = positive_count + negative_count
+        last_match = self._last_match[:, np.newaxis, np.newaxis] & (last_groups > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            last_return = np.where(
+                last_match & (nonzero_count > 0),
+                np.round((positive_cents + negative_cents) / 100 / nonzero_count, 2),
+                0.0,
+            )
+        last_cents = np.rint(last_return * 100)
+        last_drawdown = last_cents < 0
+        sums[..., 0] += np.maximum(last_cents, 0)
+        sums[..., 1] += np.minimum(last_cents, 0)
+        sums[..., 2] += last_drawdown
+        sums[..., 3] += np.where(last_drawdown, last_cents**2, 0)
+        sums[..., 5] += last_match
+
+
+def fitness_from_statistics(
+    fitness_type: str, statistics: FitnessStatistics, min_support: float = 0.025
+) -> np.ndarray:
+    """
+    Calculate the fitness of patterns from their sufficient statistics with the chosen fitness function.
+
+    Parameters :
+    -------
+        - `fitness_type` : Name of the fitness function ("total_return", "profit_factor" or "martin_ratio")
+        - `statistics` : Output of `fitness_statistics` (or statistics of segments and folds)
+        - `min_support` : Minimal share of candles the pattern needs to be matched on
+
+    Returns :
+    -------
+        - `np.ndarray` : Fitness value of each pattern (same shape as the statistics)
+    """
+    if fitness_type == "total_return":
+        return total_return_from_statistics(statistics)
+    elif fitness_type == "profit_factor":
+        return profit_factor_from_statistics(statistics, min_support)
+    elif fitness_type == "martin_ratio":
+        return martin_ratio_from_statistics(statistics, min_support)
+    else:
+        raise ValueError("Invalid fitness function type")
+
+
+def total_return_from_statistics(statistics: FitnessStatistics) -> np.ndarray:
+    """
+    Calculate the total return of patterns from their sufficient statistics, same as `total_return`.
+
+    Parameters :
+    -------
+        - `statistics` : Output of `fitness_statistics`
+
+    Returns :
+    -------
+        - `np.ndarray` : Non-negative total return of each pattern
+    """
+    return np.maximum(np.round(statistics.positive_sum + statistics.negative_sum, 2), 0)
+
+
+def profit_factor_from_statistics(
+    statistics: FitnessStatistics, min_support: float = 0.025
+) -> np.ndarray:
+    """
+    Calculate the profit factor of patterns from their sufficient statistics, same as `profit_factor`.
+
+    Parameters :
+    -------
+        - `statistics` : Output of `fitness_statistics`
+        - `min_support` : Minimal share of candles the pattern needs to be matched on, otherwise 0 is returned
+
+    Returns :
+    -------
+        - `np.ndarray` : Non-negative profit factor of each pattern
+    """
+    positive_returns = statistics.positive_sum
+    negative_returns = np.abs(statistics.negative_sum)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        profit_ratio = np.where(
+            negative_returns == 0,
+            positive_returns / 0.01,  # Avoiding division by zero > float("inf")
+            positive_returns / negative_returns,
+        )
+        fitness = np.round(np.maximum(np.log(profit_ratio), 0), 2)
+
+    # Pattern needs to be matched at least `min_support` of the time (avoiding noise)
+    noise = statistics.match_count < min_support * statistics.num_candles
+    return np.where(noise | (positive_returns == 0), 0.0, fitness)
+
+
+def martin_ratio_from_statistics(
+    statistics: FitnessStatistics, min_support: float = 0.025
+) -> np.ndarray:
+    """
+    Calculate the Martin ratio of patterns from their sufficient statistics, same as `martin_ratio`.
+
+    Parameters :
+    -------
+        - `statistics` : Output of `fitness_statistics`
+        - `min_support` : Minimal share of candles the pattern needs to be matched on, otherwise 0 is returned
+
+    Returns :
+    -------
+        - `np.ndarray` : Non-negative martin ratio of each pattern
+    """
+    total_returns = total_return_from_statistics(statistics)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fitness = np.round(
+            np.where(
+                statistics.negative_count == 0,
+                total_returns / 0.01,  # Avoiding division by zero > float("inf")
+                total_returns
+                / np.sqrt(statistics.squared_negative_sum / statistics.negative_count),
+            ),
+            2,
+        )
+
+    # Pattern needs to be matched at least `min_support` of the time (avoiding noise)
+    noise = statistics.match_count < min_support * statistics.num_candles
+    return np.where(noise | (total_returns == 0), 0.0, fitness)
+
+
+def population_fitness(
+    fitness_type: str,
+    match_matrix: np.ndarray,
+    next_returns: np.ndarray,
+    min_support: float = 0.025,
+) -> np.ndarray:
+    """
+    Calculate the fitness of every pattern in a population with the chosen fitness function.
+
+    Parameters :
+    -------
+        - `fitness_type` : Name of the fitness function ("total_return", "profit_factor" or "martin_ratio")
+        - `match_matrix` : 2-D boolean array (population x candles), True where the pattern is matched.
+                           A 1-D array is a population of one
+        - `next_returns` : Output of `forward_log_returns` for the same market data
+        - `min_support` : Minimal share of candles the pattern needs to be matched on
+
+    Returns :
+    -------
+        - `np.ndarray` : Fitness value of each pattern
+    """
+    statistics = fitness_statistics(match_matrix, next_returns)
+    return fitness_from_statistics(fitness_type, statistics, min_support)
@@ -1,34 +1,147 @@
 """
 Module Name: genetic_algorithm.py
-Description: Need to update!
+Description: Genetic algorithm (pygad) searching candlestick patterns with the best fitness on
+historical market data. Fitness values are cached by canonical pattern, evaluated in batches through the
+condition index (optionally in chunks, in parallel processes, per validation fold or raced against the
+parents), offspring are kept valid by pattern-aware crossover, mutation and repair, and runs can be
+checkpointed and resumed.
 
 Last Updated: 2024-09-01
 """
 
+import hashlib
+import logging
 import random
+from pathlib import Path
 
 import numpy as np
 import pandas as pd
 import pygad
 
-from src.modules.fitness_functions import martin_ratio, profit_factor, total_return
-from src.modules.pattern_evaluation import evaluate_candlestick_pattern
+from src.modules.chunked_evaluation import ChunkedEvaluator
+from src.modules.condition_index import ConditionIndex
+from src.modules.fitness_cache import FitnessCache
+from src.modules.fitness_functions import population_fitness
+from src.modules.market_data import MarketData
+from src.modules.parallel_evaluation import ParallelFitnessEvaluator
 from src.modules.pattern_generator import CandlestickPatternGenerator
-from src.utils.logger import logger
+from src.modules.racing import RacingEvaluator
+from src.modules.validation import Fold, FoldEvaluator
+from src.utils.checkpoint import Checkpoint, CheckpointWriter, load_checkpoint
+from src.utils.data_loader import ChunkedOHLC
+from src.utils.instrumentation import Instrumentation
+from src.utils.logger import JsonLinesLogger, logger
+
+
+class RestorableGA(pygad.GA):
+    """
+    GA class of the pygad library that can start from the fitness values of a restored population.
+
+    Attributes :
+    -------
+        - `restored_population`: Population of a checkpoint, None if nothing was restored
+        - `restored_fitness`: Fitness values of `restored_population`
+
+    Methods :
+    -------
+        - `restore(population, fitness)`: Sets the population and its known fitness values
+        - `cal_pop_fitness()`: Fitness values of the population, restored values while the population is unchanged
+    """
+
+    restored_population = None
+    restored_fitness = None
+
+    def restore(self, population: np.ndarray, fitness: np.ndarray) -> None:
+        """
+        Sets the population and its fitness values, which are not evaluated again.
+        """
+        self.population = population.copy()
+        self.restored_population = population.copy()
+        self.restored_fitness = fitness.copy()
+
+    def cal_pop_fitness(self) -> np.ndarray:
+        if self.restored_population is not None:
+            if np.array_equal(self.population, self.restored_population):
+                return self.restored_fitness.copy()
+            # Later generations are evaluated as usual
+            self.restored_population = self.restored_fitness = None
+        return super().cal_pop_fitness()
 
 
 class GeneticAlgorithm:
-    # TODO : Add docstrings
     def __init__(
         self,
-        df: pd.DataFrame,
-        pop_size,
+        df: pd.DataFrame | None,
+        pop_size: int,
         num_gens: int,
         num_conds: int,
         max_lag: int,
         fitness_type: str,
         bullish_focus: bool,
+        min_support: float = 0.025,
+        cache_size: int = 100_000,
+        cache_dir: str | None = None,
+        fitness_batch_size: int | None = None,
+        num_workers: int = 1,
+        chunk_size: int = 16,
+        validation_folds: list[Fold] | None = None,
+        metrics_dir: str | None = None,
+        track_memory: bool = False,
+        replace_duplicates: bool = False,
+        chunked_data: ChunkedOHLC | None = None,
+        racing_stages: int = 0,
+        checkpoint_path: str | None = None,
+        checkpoint_interval: int = 10,
+        condition_index: ConditionIndex | None = None,
+        table_interval: int | None = 1,
+        stats_dir: str | None = None,
+        price_dtype: str = "float64",
+        market_data: MarketData | None = None,
+        exit_horizons: list[int] | None = None,
+        optimized_horizon: int | str | None = None,
+        parent_selection: str = "rws",
+        num_parents_mating: int | None = None,
+        pattern_mutation_rate: float = 0.02,
+        gene_mutation_rate: float = 0.05,
     ):
+        """
+        Sets up a Genetic Algorithm searching candlestick patterns, the pygad instance is built by `create_instance`.
+
+        Parameters :
+        -------
+            - `df` : Market data with Open, High, Low and Close columns, None if `chunked_data` is passed
+            - `pop_size` : Number of chromosomes (candlestick patterns) in the population
+            - `num_gens` : Number of generations
+            - `num_conds` : Number of conditions of a pattern
+            - `max_lag` : Maximum number of candlesticks to look back
+            - `fitness_type` : Name of the fitness function ("total_return", "profit_factor" or "martin_ratio")
+            - `bullish_focus` : Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+            - `min_support` : Minimal share of candles a pattern needs to be matched on
+            - `cache_size` : Maximum number of cached fitness values
+            - `cache_dir` : Directory the fitness cache is persisted to between runs, None keeps it in memory
+            - `fitness_batch_size` : Number of chromosomes evaluated per fitness call (None or 1 evaluates them one by one)
+            - `num_workers` : Number of worker processes evaluating fitness (1 evaluates in the main process)
+            - `chunk_size` : Number of chromosomes sent to a worker at once
+            - `validation_folds` : Folds of walk-forward or k-fold validation, fitness is the average in-sample fitness
+            - `metrics_dir` : Directory of per-generation stage metrics, None disables the instrumentation
+            - `track_memory` : Trace peak memory of every stage with tracemalloc
+            - `replace_duplicates` : Replace offspring equivalent to other chromosomes with new patterns
+            - `chunked_data` : Market data read in chunks, evaluated out of core instead of `df`
+            - `racing_stages` : Number of successive-halving racing stages (0 or 1 evaluates every chromosome on all candles)
+            - `checkpoint_path` : Checkpoint file of the run, None disables checkpoints
+            - `checkpoint_interval` : Number of generations between checkpoints
+            - `condition_index` : Condition index of the market data, built in `create_instance` if None
+            - `table_interval` : Number of generations between logged report tables, None logs none
+            - `stats_dir` : Directory of per-generation statistics as JSON lines, None disables them
+            - `price_dtype` : Floating point type of the prices held in memory ("float64" or "float32")
+            - `market_data` : Prepared prices and forward log returns of `df`, e.g. shared by a parameter sweep
+            - `exit_horizons` : Numbers of candles a position is held, all evaluated at once ([1] by default)
+            - `optimized_horizon` : Exit horizon whose fitness is optimized or "best", the first one if None
+            - `parent_selection` : Parent selection, "rws" (roulette wheel) or "truncation" (the fittest chromosomes)
+            - `num_parents_mating` : Number of parents, the population size if None
+            - `pattern_mutation_rate` : Probability of an offspring being replaced by a new pattern
+            - `gene_mutation_rate` : Probability of a gene getting a new allele
+        """
         self.num_generations = num_gens
         self.population_size = pop_size
         self.num_conds = num_conds
@@ -36,6 +149,110 @@ class GeneticAlgorithm:
         self.training_data = df
         self.fitness_function_type = fitness_type
         self.bullish_focus = bullish_focus
+        self.min_support = min_support
+        # Market data read in chunks (`df` is None) is streamed once per population instead of held in memory
+        self.chunked_data = chunked_data
+        # Patterns are evaluated for every exit horizon at once, fitness is the one of `optimized_horizon`
+        # (the first horizon by default) or the best one ("best"), the others are logged
+        self.exit_horizons = tuple(exit_horizons or (1,))
+        self.optimized_horizon = (
+            self.exit_horizons[0] if optimized_horizon is None else optimized_horizon
+        )
+        if len(set(self.exit_horizons)) != len(self.exit_horizons) or min(self.exit_horizons) < 1:
+            raise ValueError(f"Invalid exit horizons {list(self.exit_horizons)}")
+        if self.optimized_horizon != "best" and self.optimized_horizon not in self.exit_horizons:
+            raise ValueError(
+                f"Optimized horizon {self.optimized_horizon} is not one of the exit horizons "
+                f"{list(self.exit_horizons)} or 'best'"
+            )
+        self._horizon_fitness = {}  # cache key -> fitness of every exit horizon
+        # Prices and forward log returns of `df` are prepared once, unless passed (e.g. shared by a parameter sweep)
+        self.price_dtype = price_dtype
+        if chunked_data is None:
+            self.chunked_evaluator = None
+            self.market_data = (
+                market_data.with_focus(bullish_focus)
+                if market_data is not None
+                else MarketData.from_frame(df, bullish_focus, price_dtype, self.exit_horizons)
+            )
+            if self.market_data.exit_horizons != self.exit_horizons:
+                raise ValueError("Market data was prepared for different exit horizons")
+            self.ohlc = self.market_data.ohlc
+            self.next_returns = self.market_data.next_returns
+            self.num_candles = self.market_data.num_candles
+        else:
+            if self.exit_horizons != (1,):
+                raise ValueError(
+                    "Market data read in chunks is evaluated with the next candle only, "
+                    "set exit_horizons to [1]"
+                )
+            self.chunked_evaluator = ChunkedEvaluator(chunked_data, max_lag, bullish_focus)
+            self.market_data = None
+            self.ohlc = None
+            self.next_returns = None
+            self.num_candles = self.chunked_evaluator.num_candles
+        # Condition index of `df`, built in `create_instance` unless passed (e.g. shared by a parameter sweep)
+        self.condition_index = condition_index
+        if condition_index is not None and (
+            condition_index.max_lag != max_lag
+            or condition_index.num_candles != self.num_candles
+        ):
+            raise ValueError("Condition index does not match max_lag and the market data")
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self.fitness_cache = None
+        self._cache_counters = (0, 0)  # (hits, misses) reported up to the last generation
+        self.fitness_batch_size = fitness_batch_size
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        self.parallel_evaluator = None
+        # With validation folds, fitness is the average in-sample fitness over the folds
+        self.fold_evaluator = (
+            FoldEvaluator(validation_folds, self.num_candles, self.exit_horizons)
+            if validation_folds
+            else None
+        )
+        self._out_of_sample = {}  # cache key -> average out-of-sample fitness
+        self.metrics_dir = metrics_dir
+        self.track_memory = track_memory
+        self.run_name = "genetic_algorithm"  # Name of the metrics files (and cache files of parallel runs)
+        self.metrics_labels = {}
+        self.instrumentation = Instrumentation()
+        self.pattern_generator = CandlestickPatternGenerator(max_lag, num_conds)
+        self.replace_duplicates = replace_duplicates
+        self.pattern_mutation_rate = pattern_mutation_rate
+        self.gene_mutation_rate = gene_mutation_rate
+        # Parents are drawn by roulette wheel ("rws") from the whole population or are the `num_parents_mating`
+        # fittest chromosomes ("truncation"), `num_parents_mating` defaults to the population size
+        if parent_selection not in ("rws", "truncation"):
+            raise ValueError(f"Invalid parent selection {parent_selection}")
+        self.parent_selection = parent_selection
+        self.num_parents_mating = num_parents_mating
+        # With 2 or more racing stages and truncation selection, chromosomes that cannot be parents are dropped early
+        self.racing_stages = racing_stages
+        self.racing_evaluator = None
+        self._racing_counters = (0, 0, 0, 0)  # (full, partial, candles, exhaustive candles) up to the last generation
+        # Checkpoints are written every `checkpoint_interval` generations and after the last one
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_writer = None
+        self._data_fingerprint = None
+        # Report tables are logged every `table_interval` generations (None logs none), statistics of every
+        # generation are written as JSON lines to `stats_dir`
+        self.table_interval = table_interval
+        self.stats_dir = stats_dir
+        self.stats_logger = None
+        # Genetic operator counts of the current generation
+        self.operator_counts = dict.fromkeys(
+            (
+                "mutated_genes",
+                "genes",
+                "replaced_patterns",
+                "repaired_conditions",
+                "replaced_duplicates",
+            ),
+            0,
+        )
 
     def create_instance(self):
         """
@@ -45,23 +262,163 @@ class GeneticAlgorithm:
         -------
             - `ga_instance` : Instance of the GA class from the pygad library
         """
-        generator = CandlestickPatternGenerator(self.max_lag, self.num_conds)
-        initial_population = generator.get_patterns(self.population_size)
+        # Conditions are evaluated once per dataset and shared by every generation
+        if self.chunked_evaluator is None and self.condition_index is None:
+            self.condition_index = ConditionIndex(self.ohlc, self.max_lag)
+        cache_path = (
+            FitnessCache.file_path(
+                self.cache_dir,
+                self.data_fingerprint(),
+                self.num_conds,
+                self.max_lag,
+                self.fitness_function_type,
+                self.bullish_focus,
+                self.min_support,
+                "_".join(
+                    variant
+                    for variant in (
+                        (
+                            self.fold_evaluator.fingerprint
+                            if self.fold_evaluator is not None
+                            else None
+                        ),
+                        self._horizon_variant(),
+                        # Runs in parallel processes (islands, sweep configurations) save their own file
+                        None if self.run_name == "genetic_algorithm" else self.run_name,
+                    )
+                    if variant is not None
+                )
+                or None,
+            )
+            if self.cache_dir is not None
+            else None
+        )
+        self.fitness_cache = FitnessCache(self.max_lag, self.cache_size, cache_path)
+
+        if self.checkpoint_path is not None:
+            self.checkpoint_writer = CheckpointWriter(self.checkpoint_path)
 
-        ga_instance = pygad.GA(
+        if self.stats_dir is not None:
+            self.stats_logger = JsonLinesLogger(
+                Path(self.stats_dir) / f"{self.run_name}_generations.jsonl"
+            )
+
+        initial_population = self.pattern_generator.get_population(self.population_size)
+
+        # Batch mode evaluates up to `fitness_batch_size` chromosomes per fitness call
+        batch_mode = self.fitness_batch_size not in (None, 1)
+        multiple_horizons = len(self.exit_horizons) > 1
+        truncation = self.parent_selection == "truncation" and (
+            self.num_parents_mating or len(initial_population)
+        ) < len(initial_population)
+        if self.racing_stages >= 2 and (
+            self.chunked_evaluator is not None or self.fold_evaluator is not None
+        ):
+            logger.warning(
+                "Racing bounds the fitness on the whole series held in memory, "
+                "it is disabled with validation folds and market data read in chunks"
+            )
+        elif self.racing_stages >= 2 and multiple_horizons:
+            logger.warning(
+                "Racing bounds the fitness of a single exit horizon, "
+                "it is disabled with several exit horizons"
+            )
+        elif self.racing_stages >= 2 and not truncation:
+            logger.warning(
+                "Racing drops chromosomes that cannot be parents, it needs truncation "
+                "selection with fewer parents than the population and is disabled"
+            )
+        if self.chunked_evaluator is not None:
+            if self.num_workers > 1:
+                logger.warning(
+                    "Market data read in chunks is evaluated in the main process, "
+                    "parallel fitness evaluation is disabled"
+                )
+            # Every evaluation reads the whole market data, so the whole population is evaluated at once
+            batch_mode = True
+            self.fitness_batch_size = len(initial_population)
+        elif (
+            self.racing_stages >= 2
+            and self.fold_evaluator is None
+            and not multiple_horizons
+            and truncation
+        ):
+            if self.num_workers > 1:
+                logger.warning(
+                    "Racing is evaluated in the main process, "
+                    "parallel fitness evaluation is disabled"
+                )
+            self.racing_evaluator = RacingEvaluator(
+                self.condition_index,
+                self.next_returns,
+                self.fitness_function_type,
+                self.min_support,
+                self.racing_stages,
+            )
+            # Chromosomes are raced against the parents, so the whole population is evaluated at once
+            batch_mode = True
+            self.fitness_batch_size = len(initial_population)
+        elif self.num_workers > 1 and self.fold_evaluator is not None:
+            logger.warning(
+                "Validation folds are evaluated in the main process, "
+                "parallel fitness evaluation is disabled"
+            )
+        elif self.num_workers > 1:
+            self.parallel_evaluator = ParallelFitnessEvaluator(
+                self.condition_index,
+                self.next_returns,
+                self.fitness_function_type,
+                self.min_support,
+                self.num_workers,
+                self.chunk_size,
+            )
+            # Workers receive whole batches, split into chunks of `chunk_size`
+            if not batch_mode:
+                batch_mode = True
+                self.fitness_batch_size = len(initial_population)
+
+        # Stages are only wrapped if metrics are recorded, otherwise the callbacks are passed unchanged
+        self.instrumentation = Instrumentation(
+            self.metrics_dir, self.run_name, self.track_memory, self.metrics_labels
+        )
+        instrumentation = self.instrumentation
+        selection_func = (
+            self._truncation_selection
+            if self.parent_selection == "truncation"
+            else self._selection_func
+        )
+
+        ga_instance = RestorableGA(
             num_generations=self.num_generations,
-            num_parents_mating=len(initial_population),
-            fitness_func=self._fitness_func,
+            num_parents_mating=self.num_parents_mating or len(initial_population),
+            fitness_func=instrumentation.timed(
+                "fitness",
+                self._fitness_batch_func if batch_mode else self._fitness_func,
+            ),
+            fitness_batch_size=(
+                min(self.fitness_batch_size, len(initial_population))
+                if batch_mode
+                else None
+            ),
             initial_population=initial_population,
-            parent_selection_type="rws",  # Roulette Wheel Selection
+            parent_selection_type=(  # Roulette Wheel or Truncation Selection
+                instrumentation.timed("selection", selection_func)
+                if instrumentation.enabled or self.parent_selection == "truncation"
+                else "rws"
+            ),
             keep_elitism=1,  # Keep the best solution from the previous generation
-            crossover_type=self._crossover_func,  # Single-point crossover function
-            mutation_type=self._mutation_func,  # TODO : Implement mutation function
+            crossover_type=instrumentation.timed(
+                "crossover", self._crossover_func
+            ),  # Single-point crossover function
+            mutation_type=instrumentation.timed(
+                "mutation", self._mutation_func
+            ),  # Pattern replacement and gene mutation with repair
             on_start=self._on_start,
-            on_generation=self._on_generation,
+            on_generation=instrumentation.on_generation(self._on_generation),
             on_stop=self._on_stop,
             suppress_warnings=True,  # set to False while debugging
-            save_solutions=False,  # TODO : Looks into how this effect performance
+            # Fitness values are reused through `fitness_cache`, saved solutions would be searched linearly
+            save_solutions=False,
             gene_type=int,
             gene_space=[
                 gene
@@ -78,6 +435,119 @@ class GeneticAlgorithm:
 
         return ga_instance
 
+    def resume_instance(self) -> pygad.GA:
+        """
+        Create an instance of the Genetic Algorithm continuing the run saved at `checkpoint_path`.
+
+        Returns :
+        -------
+            - `ga_instance` : Instance of the GA class from the pygad library, `run()` continues with the
+                              generation after the checkpoint up to `num_gens` generations in total
+
+        Note :
+        -------
+            - Population, fitness values, generation counter, random number generator states and fitness
+              cache are restored, so the resumed run is identical to a run without interruption
+            - The checkpoint must be written with the same settings (see `checkpoint_setup`), except for
+              the number of generations which may be raised to extend a finished run
+        """
+        checkpoint = load_checkpoint(self.checkpoint_path)
+        setup = self.checkpoint_setup()
+        changed = sorted(
+            name
+            for name in setup.keys() | checkpoint.setup.keys()
+            if setup.get(name) != checkpoint.setup.get(name)
+        )
+        if changed:
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} was written with different settings: "
+                + ", ".join(changed)
+            )
+
+        ga_instance = self.create_instance()
+        ga_instance.num_generations = max(
+            self.num_generations - checkpoint.generations_completed, 0
+        )
+        ga_instance.generations_completed = checkpoint.generations_completed
+        ga_instance.best_solutions_fitness = checkpoint.best_solutions_fitness.tolist()
+        self.fitness_cache.load_arrays(checkpoint.cache_keys, checkpoint.cache_values)
+        self.fitness_cache.hits, self.fitness_cache.misses = checkpoint.cache_counters
+        self._cache_counters = checkpoint.cache_counters
+
+        # The population was evaluated before the checkpoint, `run` starts from its fitness values
+        ga_instance.restore(checkpoint.population, checkpoint.fitness)
+        checkpoint.restore_random_states()
+
+        elite, elite_fitness = checkpoint.elite
+        logger.info(
+            f"Resuming from {self.checkpoint_path} after generation {checkpoint.generations_completed} "
+            f"(best solution {elite.tolist()} with fitness {elite_fitness:.5f})"
+        )
+        return ga_instance
+
+    def _horizon_variant(self) -> str | None:
+        """
+        Returns the name of the exit horizon settings used in cache file names, None for the next candle only.
+        """
+        if self.exit_horizons == (1,):
+            return None
+        return f"exit{'-'.join(map(str, self.exit_horizons))}-{self.optimized_horizon}"
+
+    def data_fingerprint(self) -> str:
+        """
+        Returns the content hash of the market data, computed once.
+        """
+        if self._data_fingerprint is None:
+            self._data_fingerprint = (
+                hashlib.sha256(np.ascontiguousarray(self.ohlc).tobytes()).hexdigest()
+                if self.chunked_data is None
+                else self.chunked_data.fingerprint()
+            )
+        return self._data_fingerprint
+
+    def checkpoint_setup(self) -> dict:
+        """
+        Returns the settings a checkpoint depends on, a run is only resumed with the same settings.
+        """
+        return {
+            "data": self.data_fingerprint()[:16],
+            "pop_size": self.population_size,
+            "num_conds": self.num_conds,
+            "max_lag": self.max_lag,
+            "fitness_type": self.fitness_function_type,
+            "bullish_focus": self.bullish_focus,
+            "min_support": self.min_support,
+            "validation_folds": (
+                self.fold_evaluator.fingerprint if self.fold_evaluator is not None else None
+            ),
+            "replace_duplicates": self.replace_duplicates,
+            "pattern_mutation_rate": self.pattern_mutation_rate,
+            "gene_mutation_rate": self.gene_mutation_rate,
+            "racing_stages": self.racing_stages,
+            "parent_selection": self.parent_selection,
+            "num_parents_mating": self.num_parents_mating,
+            "exit_horizons": list(self.exit_horizons),
+            "optimized_horizon": self.optimized_horizon,
+        }
+
+    def _checkpoint(self, ga_instance: pygad.GA) -> Checkpoint:
+        """
+        Returns a checkpoint of the run after the latest generation, its arrays are copies.
+        """
+        cache_keys, cache_values = self.fitness_cache.to_arrays()
+        return Checkpoint(
+            setup=self.checkpoint_setup(),
+            generations_completed=ga_instance.generations_completed,
+            population=ga_instance.population.copy(),
+            fitness=np.array(ga_instance.last_generation_fitness, dtype=np.float64),
+            best_solutions_fitness=np.array(ga_instance.best_solutions_fitness, dtype=np.float64),
+            python_random_state=random.getstate(),
+            numpy_random_state=np.random.get_state(),
+            cache_keys=cache_keys,
+            cache_values=cache_values,
+            cache_counters=(self.fitness_cache.hits, self.fitness_cache.misses),
+        )
+
     def _fitness_func(
         self,
         ga_instance: pygad.GA,
@@ -96,23 +566,359 @@ class GeneticAlgorithm:
         Returns :
         -------
             - `fitness_value` : Fitness value of `solution` (candlestick pattern)
+
+        Note :
+        -------
+            - Fitness values are cached by the canonical form of the pattern, so repeated and
+              equivalent chromosomes (reordered or reversed conditions) are evaluated only once
+        """
+        cache_key = self.fitness_cache.key(solution)
+        fitness_value = self.fitness_cache.get(cache_key)
+        if fitness_value is None:
+            fitness_value = self._evaluate_fitness(solution, cache_key)
+            self.fitness_cache.put(cache_key, fitness_value)
+        return fitness_value
+
+    def _evaluate_fitness(self, solution: np.ndarray, cache_key: bytes) -> float:
+        """
+        Evaluates the fitness of a chromosome (candlestick pattern) on the training data.
+
+        Parameters :
+        -------
+            - `solution` : Chromosome (candlestick pattern)
+            - `cache_key` : Cache key of `solution`
+
+        Returns :
+        -------
+            - `fitness_value` : Fitness value of `solution` (candlestick pattern)
+        """
+        if self.chunked_evaluator is not None:
+            return float(self._evaluate_fitness_batch(solution[np.newaxis], [cache_key])[0])
+        match_mask = self.condition_index.match_mask(solution)
+        return float(self._fitness_from_matches(match_mask[np.newaxis], [cache_key])[0])
+
+    def _fitness_from_matches(
+        self, match_matrix: np.ndarray, cache_keys: list[bytes]
+    ) -> np.ndarray:
+        """
+        Calculates the fitness of chromosomes from their match masks.
+
+        Parameters :
+        -------
+            - `match_matrix` : 2-D boolean array (chromosomes x candles), True where the pattern is matched
+            - `cache_keys` : Cache keys of the chromosomes
+
+        Returns :
+        -------
+            - `fitness_values` : Fitness values of the chromosomes
+
+        Note :
+        -------
+            - With validation folds, the fitness is the average in-sample fitness over the folds and the
+              average out-of-sample fitness is kept for logging, both come from the same match masks
+            - With several exit horizons, all of them are evaluated from the same match masks (see `_optimized_fitness`)
         """
-        
-        log_returns = evaluate_candlestick_pattern(
-            self.training_data, solution, self.max_lag, self.bullish_focus
+        if self.fold_evaluator is None:
+            return self._optimized_fitness(
+                population_fitness(
+                    self.fitness_function_type,
+                    match_matrix,
+                    self.next_returns,
+                    self.min_support,
+                ),
+                cache_keys,
+            )
+
+        in_sample, out_of_sample = self.fold_evaluator.fold_fitness(
+            self.fitness_function_type,
+            match_matrix,
+            self.next_returns,
+            self.min_support,
         )
-        if self.fitness_function_type == "total_return":
-            return total_return(log_returns)
-        elif self.fitness_function_type == "profit_factor":
-            return profit_factor(log_returns)
-        elif self.fitness_function_type == "martin_ratio":
-            return martin_ratio(log_returns)
-        else:
-            raise ValueError("Invalid fitness function type")
+        return self._fold_average(in_sample, out_of_sample, cache_keys)
+
+    def _fitness_from_chunks(
+        self, solutions: np.ndarray, cache_keys: list[bytes]
+    ) -> np.ndarray:
+        """
+        Calculates the fitness of chromosomes in one pass over market data read in chunks.
+
+        Parameters :
+        -------
+            - `solutions` : 2-D array of chromosomes (candlestick patterns)
+            - `cache_keys` : Cache keys of the chromosomes
+
+        Returns :
+        -------
+            - `fitness_values` : Fitness values of the chromosomes, same as `_fitness_from_matches` on the whole series
+        """
+        if self.fold_evaluator is None:
+            return self.chunked_evaluator.fitness(
+                self.fitness_function_type, solutions, self.min_support
+            )
+
+        in_sample, out_of_sample = self.fold_evaluator.group_fold_fitness(
+            self.fitness_function_type,
+            self.chunked_evaluator.segment_statistics(
+                solutions, self.fold_evaluator.segment_starts, self.fold_evaluator.groups
+            ),
+            self.min_support,
+        )
+        return self._fold_average(in_sample, out_of_sample, cache_keys)
+
+    def _fold_average(
+        self, in_sample: np.ndarray, out_of_sample: np.ndarray, cache_keys: list[bytes]
+    ) -> np.ndarray:
+        """
+        Keeps the average out-of-sample fitness of chromosomes for logging and returns their average in-sample fitness.
+        With several exit horizons, the out-of-sample fitness is the one of the horizon optimized in-sample.
+        """
+        in_sample = in_sample.mean(axis=-1)
+        out_of_sample = out_of_sample.mean(axis=-1)
+        if out_of_sample.ndim == 2:
+            out_of_sample = np.take_along_axis(
+                out_of_sample, self._optimized_horizon_rows(in_sample)[np.newaxis], axis=0
+            )[0]
+        self._out_of_sample.update(zip(cache_keys, out_of_sample.tolist()))
+        return self._optimized_fitness(in_sample, cache_keys)
+
+    def _optimized_horizon_rows(self, horizon_fitness: np.ndarray) -> np.ndarray:
+        """
+        Returns the row of the optimized exit horizon of every chromosome in fitness values of shape (horizons, chromosomes).
+        """
+        if self.optimized_horizon == "best":
+            return np.argmax(horizon_fitness, axis=0)
+        return np.full(
+            horizon_fitness.shape[1], self.exit_horizons.index(self.optimized_horizon)
+        )
+
+    def _optimized_fitness(
+        self, fitness_values: np.ndarray, cache_keys: list[bytes]
+    ) -> np.ndarray:
+        """
+        Keeps the fitness of every exit horizon of chromosomes for logging and returns the fitness of the optimized horizon.
+
+        Parameters :
+        -------
+            - `fitness_values` : Fitness values, of shape (number of horizons, number of chromosomes) for several exit horizons
+            - `cache_keys` : Cache keys of the chromosomes
+
+        Returns :
+        -------
+            - `fitness_values` : Fitness value of every chromosome at `optimized_horizon` (the best horizon for "best")
+        """
+        if fitness_values.ndim == 1:
+            return fitness_values
+        self._horizon_fitness.update(zip(cache_keys, fitness_values.T.tolist()))
+        return np.take_along_axis(
+            fitness_values, self._optimized_horizon_rows(fitness_values)[np.newaxis], axis=0
+        )[0]
+
+    def _fitness_batch_func(
+        self,
+        ga_instance: pygad.GA,
+        solutions: np.ndarray,
+        solutions_indices: list[int],
+    ) -> np.ndarray:
+        """
+        Batch fitness function for the Genetic Algorithm, used if `fitness_batch_size` is set
+
+        Parameters :
+        -------
+            - `ga_instance` : Instance of the GA class from the pygad library
+            - `solutions` : 2-D array of chromosomes (candlestick patterns)
+            - `solutions_indices` : Indices of the chromosomes in the population
+
+        Returns :
+        -------
+            - `fitness_values` : Fitness values of `solutions`, same as calling `_fitness_func` for each chromosome
+
+        Note :
+        -------
+            - With racing, chromosomes that cannot be among the parents get fitness 0 and are not cached
+        """
+        cache_keys = self.fitness_cache.keys(solutions)
+        cached_values = [self.fitness_cache.get(key) for key in cache_keys]
+        missing = [idx for idx, fitness in enumerate(cached_values) if fitness is None]
+
+        fitness_values = np.array(
+            [0.0 if fitness is None else fitness for fitness in cached_values]
+        )
+        if missing:
+            # Identical and equivalent chromosomes of the batch are evaluated once
+            unique_missing = list({cache_keys[idx]: idx for idx in missing}.values())
+            if self.racing_evaluator is not None:
+                unique_values, exact = self.racing_evaluator.evaluate(
+                    solutions[unique_missing],
+                    self._racing_threshold(ga_instance, cached_values),
+                    ga_instance.num_parents_mating,
+                )
+            else:
+                unique_values = self._evaluate_fitness_batch(
+                    solutions[unique_missing], [cache_keys[idx] for idx in unique_missing]
+                )
+                exact = np.ones(len(unique_missing), dtype=bool)
+            evaluated = {}
+            for idx, fitness, is_exact in zip(unique_missing, unique_values, exact):
+                evaluated[cache_keys[idx]] = fitness
+                # Dropped chromosomes are raced again if they survive to a later generation
+                if is_exact:
+                    self.fitness_cache.put(cache_keys[idx], fitness)
+            fitness_values[missing] = [evaluated[cache_keys[idx]] for idx in missing]
+
+        return fitness_values
+
+    @staticmethod
+    def _racing_threshold(
+        ga_instance: pygad.GA, cached_values: list[float | None]
+    ) -> float:
+        """
+        Returns the fitness chromosomes are raced against: the lowest fitness of the parents of truncation
+        selection among the chromosomes with a known fitness, the cached chromosomes of the batch and
+        the elite of the previous generation (kept by `keep_elitism`, so never part of the batch).
+
+        Note :
+        -------
+            - Known values are part of the population, so the threshold is at most the fitness of the
+              worst parent and dropped chromosomes (below the threshold) would not have been parents
+        """
+        known_values = [fitness for fitness in cached_values if fitness is not None]
+        if ga_instance.last_generation_fitness is not None and ga_instance.keep_elitism > 0:
+            known_values.append(max(ga_instance.last_generation_fitness))
+        if len(known_values) < ga_instance.num_parents_mating:
+            return 0.0
+        return sorted(known_values, reverse=True)[ga_instance.num_parents_mating - 1]
+
+    def _evaluate_fitness_batch(
+        self, solutions: np.ndarray, cache_keys: list[bytes]
+    ) -> np.ndarray:
+        """
+        Evaluates the fitness of multiple chromosomes in one vectorized pass over the training data.
+
+        Parameters :
+        -------
+            - `solutions` : 2-D array of chromosomes (candlestick patterns)
+            - `cache_keys` : Cache keys of `solutions`
+
+        Returns :
+        -------
+            - `fitness_values` : Fitness values of `solutions`
+        """
+        if self.parallel_evaluator is not None:
+            return self._optimized_fitness(
+                self.parallel_evaluator.evaluate(solutions), cache_keys
+            )
+        if self.chunked_evaluator is not None:
+            return self._fitness_from_chunks(solutions, cache_keys)
+
+        match_matrix = self.condition_index.population_match_matrix(solutions)
+        return self._fitness_from_matches(match_matrix, cache_keys)
+
+    def _population_out_of_sample(self, population: np.ndarray) -> np.ndarray:
+        """
+        Returns the average out-of-sample fitness of every chromosome of the population.
+
+        Parameters :
+        -------
+            - `population` : 2-D array of chromosomes (candlestick patterns)
+
+        Returns :
+        -------
+            - `out_of_sample` : Average out-of-sample fitness over the validation folds
+
+        Note :
+        -------
+            - Values are recorded while evaluating fitness, only chromosomes with a fitness value
+              restored from the cache (or from another island) are evaluated again
+        """
+        cache_keys = self.fitness_cache.keys(population)
+        missing = [idx for idx, key in enumerate(cache_keys) if key not in self._out_of_sample]
+        if missing:
+            self._evaluate_fitness_batch(
+                population[missing], [cache_keys[idx] for idx in missing]
+            )
+        # Keep values of the current population only
+        self._out_of_sample = {key: self._out_of_sample[key] for key in cache_keys}
+        return np.array([self._out_of_sample[key] for key in cache_keys])
+
+    def _population_horizon_fitness(self, population: np.ndarray) -> np.ndarray:
+        """
+        Returns the fitness of every exit horizon of every chromosome of the population.
+
+        Parameters :
+        -------
+            - `population` : 2-D array of chromosomes (candlestick patterns)
+
+        Returns :
+        -------
+            - `horizon_fitness` : Array of shape (number of chromosomes, number of horizons)
+
+        Note :
+        -------
+            - Values are recorded while evaluating fitness, only chromosomes with a fitness value
+              restored from the cache (or from another island) are evaluated again
+        """
+        cache_keys = self.fitness_cache.keys(population)
+        missing = [idx for idx, key in enumerate(cache_keys) if key not in self._horizon_fitness]
+        if missing:
+            self._evaluate_fitness_batch(
+                population[missing], [cache_keys[idx] for idx in missing]
+            )
+        # Keep values of the current population only
+        self._horizon_fitness = {key: self._horizon_fitness[key] for key in cache_keys}
+        return np.array([self._horizon_fitness[key] for key in cache_keys])
+
+    @staticmethod
+    def _selection_func(
+        fitness: np.ndarray, num_parents: int, ga_instance: pygad.GA
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Roulette wheel selection, same as `parent_selection_type="rws"`, passed as function so it can be instrumented.
+
+        Parameters :
+        -------
+            - `fitness` : Fitness values of the population
+            - `num_parents` : Number of parents to select
+            - `ga_instance` : Instance of the GA class from the pygad library
+
+        Returns :
+        -------
+            - `parents` : Selected parent chromosomes
+            - `parents_indices` : Indices of the selected parents in the population
+        """
+        return ga_instance.roulette_wheel_selection(fitness, num_parents)
+
+    @staticmethod
+    def _truncation_selection(
+        fitness: np.ndarray, num_parents: int, ga_instance: pygad.GA
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Truncation selection, the `num_parents` fittest chromosomes are the parents.
+
+        Parameters :
+        -------
+            - `fitness` : Fitness values of the population
+            - `num_parents` : Number of parents to select
+            - `ga_instance` : Instance of the GA class from the pygad library
+
+        Returns :
+        -------
+            - `parents` : Selected parent chromosomes, in population order
+            - `parents_indices` : Indices of the selected parents in the population
+
+        Note :
+        -------
+            - Parents only depend on which chromosomes are the fittest (ties go to the first one), not on
+              their fitness values, so racing can drop the other chromosomes without changing the run
+        """
+        parents_indices = np.sort(
+            np.argsort(-np.asarray(fitness), kind="stable")[:num_parents]
+        )
+        return ga_instance.population[parents_indices].copy(), parents_indices
 
     def _crossover_func(
         self,
-        parents: list[np.ndarray],
+        parents: np.ndarray,
         offspring_size: tuple[int, int],
         ga_instance: pygad.GA,
     ) -> np.ndarray:
@@ -121,7 +927,7 @@ class GeneticAlgorithm:
 
         Parameters :
         -------
-            - `parents` : List of parent chromosomes (matting pool)
+            - `parents` : Array of parent chromosomes (matting pool)
             - `offspring_size` : Tuple representing the number of offspring to be generated and the number of genes in each offspring (number of chromosomes in population, size of each chromosome)
             - `ga_instance` : Instance of the GA class
 
@@ -131,34 +937,24 @@ class GeneticAlgorithm:
 
         Note:
         -------
-            - This function implements a single-point crossover
+            - This function implements a single-point crossover between conditions for all offspring at once
+            - Conditions repeating a price pair of the offspring (duplicates and contradictions) are drawn again
         """
-        possible_splits = [s for s in range(5, offspring_size[1], 5)]
-        offsprings_population = []
-        while len(offsprings_population) != offspring_size[0]:
-            crossover_point = random.choice(possible_splits)
-            parent1_idx = random.choice(range(len(parents)))
-            parent2_idx = random.choice(range(len(parents)))
-
-            parent1 = parents[parent1_idx]
-            parent2 = parents[parent2_idx]
-
-            offspring1 = list(parent1[:crossover_point]) + list(
-                parent2[crossover_point:]
-            )
-            offspring2 = list(parent2[:crossover_point]) + list(
-                parent1[crossover_point:]
-            )
+        num_offsprings, num_genes = offspring_size
+        num_pairs = (num_offsprings + 1) // 2
+        parent1 = parents[np.random.randint(0, len(parents), num_pairs)]
+        parent2 = parents[np.random.randint(0, len(parents), num_pairs)]
 
-            # If only one offspring is needed to fill population
-            if len(offsprings_population) == offspring_size[0] - 1:
-                chosen_offspring = random.choice([offspring1, offspring2])
-                offsprings_population.append(chosen_offspring)
-            else:
-                offsprings_population.append(offspring1)
-                offsprings_population.append(offspring2)
+        # Each offspring takes the conditions before the crossover point from one parent, the rest from the other
+        crossover_points = np.random.randint(1, max(self.num_conds, 2), size=(num_pairs, 1))
+        from_first_parent = np.arange(num_genes) // 5 < crossover_points
+        offspring1 = np.where(from_first_parent, parent1, parent2)
+        offspring2 = np.where(from_first_parent, parent2, parent1)
+        offsprings_population = np.stack((offspring1, offspring2), axis=1).reshape(
+            -1, num_genes
+        )[:num_offsprings]
 
-        return np.array(offsprings_population)
+        return self._repair_population(offsprings_population)
 
     def _mutation_func(
         self, offsprings: np.ndarray, ga_instance: pygad.GA
@@ -174,27 +970,88 @@ class GeneticAlgorithm:
         Returns :
         -------
             - `offsprings` : Array of mutated offspring chromosomes (candlestick patterns)
+
+        Note :
+        -------
+            - Each pattern is replaced by a new pattern with `pattern_mutation_rate` probability (2% by default)
+              and each gene gets a new allele with `gene_mutation_rate` probability (5% by default),
+              comparison genes (< >) are not mutated
+            - Mutated conditions breaking the rules of the pattern generator are drawn again, so only
+              possible patterns are evaluated
         """
+        num_offsprings, num_genes = offsprings.shape
 
-        for idx in range(offsprings.shape[0]):
-            # 2% chance to mutate whole pattern
-            if random.random() < 0.02:
-                new_pattern = CandlestickPatternGenerator(
-                    self.max_lag, self.num_conds
-                ).get_patterns(1)[0]
-                offsprings[idx] = new_pattern
-            # replace gene with 5% probability
-            for gene_idx in range(offsprings.shape[1]):
-                # TODO: make sure that only possible patters gets generated from mutation
-                if random.random() < 0.05:
-                    # genes < > are not allowed to mutate
-                    # TODO: look into this
-                    if (gene_idx - 2) % 5 != 0:
-                        new_gene = random.choice(ga_instance.gene_space[gene_idx])
-                        offsprings[idx, gene_idx] = new_gene
-            # TODO: add mutation counter tuple[int, int] to keep track of mutation rate
+        # chance to mutate whole pattern
+        replaced = np.random.random(num_offsprings) < self.pattern_mutation_rate
+        offsprings[replaced] = self.pattern_generator.get_population(int(replaced.sum()))
+
+        # replace gene with `gene_mutation_rate` probability, genes < > are not allowed to mutate
+        gene_positions = np.arange(num_genes) % 5
+        mutated = (np.random.random(offsprings.shape) < self.gene_mutation_rate) & (
+            gene_positions != 2
+        )
+        num_alleles = np.where(np.isin(gene_positions, (1, 4)), self.max_lag + 1, 4)
+        new_genes = np.random.randint(0, np.broadcast_to(num_alleles, offsprings.shape))
+        offsprings[mutated] = new_genes[mutated]
+
+        self.operator_counts["mutated_genes"] += int(mutated.sum())
+        self.operator_counts["genes"] += offsprings.size
+        self.operator_counts["replaced_patterns"] += int(replaced.sum())
+        offsprings[:] = self._repair_population(offsprings)
+
+        if self.replace_duplicates:
+            self._replace_duplicates(offsprings, ga_instance)
         return offsprings
 
+    def _replace_duplicates(self, offsprings: np.ndarray, ga_instance: pygad.GA) -> None:
+        """
+        Replaces offspring equivalent to an elite chromosome or to another offspring with new patterns.
+
+        Parameters :
+        -------
+            - `offsprings` : Array of offspring chromosomes (candlestick patterns), updated in place
+            - `ga_instance` : Instance of the GA class from the pygad library
+
+        Note :
+        -------
+            - Chromosomes are equivalent if they have the same canonical form (see `FitnessCache.key`),
+              the first copy is kept. New patterns are drawn until the offspring are unique (at most 10 rounds)
+        """
+        # Elite chromosomes are kept in the next population next to the offspring
+        elite = np.argsort(ga_instance.last_generation_fitness, kind="stable")[::-1][
+            : ga_instance.keep_elitism
+        ]
+        elite_keys = self.fitness_cache.keys(ga_instance.population[elite])
+        for _ in range(10):
+            seen = set(elite_keys)
+            duplicates = []
+            for idx, key in enumerate(self.fitness_cache.keys(offsprings)):
+                if key in seen:
+                    duplicates.append(idx)
+                seen.add(key)
+            if not duplicates:
+                return
+            offsprings[duplicates] = self.pattern_generator.get_population(len(duplicates))
+            self.operator_counts["replaced_duplicates"] += len(duplicates)
+
+    def _repair_population(self, population: np.ndarray) -> np.ndarray:
+        """
+        Draws new conditions in place of conditions breaking the rules of the pattern generator.
+
+        Parameters :
+        -------
+            - `population` : Array of chromosomes (candlestick patterns)
+
+        Returns :
+        -------
+            - `population` : Array of valid chromosomes, valid conditions are kept unchanged
+        """
+        condition_indices, num_repaired = self.pattern_generator.repair_conditions(
+            self.pattern_generator.to_condition_indices(population)
+        )
+        self.operator_counts["repaired_conditions"] += num_repaired
+        return self.pattern_generator.from_condition_indices(condition_indices)
+
     def _on_generation(self, ga_instance: pygad.GA) -> None:
         """
         Logs a concise summary of the Genetic Algorithm's performance for the latest generation
@@ -203,6 +1060,11 @@ class GeneticAlgorithm:
         -------
             - ga_instance : Instance of the GA class from the pygad library
 
+        Note :
+        -------
+            - Statistics of every generation are written as a JSON line if `stats_dir` is set, the report
+              tables are only rendered when they are logged (see `_render_report`)
+
         Example :
         -------
             - Example of log message of first generation with hyperparameters (num_conds=3, max_lag=3):
@@ -220,98 +1082,219 @@ class GeneticAlgorithm:
                         |Median Point     |  31.70412|   +-----+-----------------------------------------------+----------+
                         +-----------------+----------+
         """
-        fitness_values = ga_instance.last_generation_fitness
+        generation = ga_instance.generations_completed
+        stats = self._generation_stats(ga_instance)
+        if self.stats_logger is not None:
+            self.stats_logger.write(stats)
+        if self._render_report(generation):
+            logger.info(self._generation_report(ga_instance, stats))
 
-        sorted_indices = np.argsort(fitness_values)[::-1]
-        top_solutions = [ga_instance.population[i] for i in sorted_indices[:3]]
-        top_fitness_values = [fitness_values[i] for i in sorted_indices[:3]]
+        # Random number generators are not used until the next generation starts, so the checkpoint
+        # continues exactly from here
+        if self.checkpoint_writer is not None and (
+            generation % self.checkpoint_interval == 0
+            or generation >= self.num_generations
+        ):
+            self.checkpoint_writer.submit(self._checkpoint(ga_instance))
 
-        log_message = (
-            f"Generation {ga_instance.generations_completed} Evaluation Completed :\n"
+    def _render_report(self, generation: int) -> bool:
+        """
+        Returns whether the report tables of a generation are logged: every generation at DEBUG level,
+        every `table_interval` generations and after the last one at INFO level.
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            return True
+        return bool(
+            logger.isEnabledFor(logging.INFO)
+            and self.table_interval
+            and (generation % self.table_interval == 0 or generation >= self.num_generations)
         )
 
-        ################# metrics_table #################
-        metrics_table = ""
-        metrics_table += "+" + "-" * 17 + "+" + "-" * 10 + "+\n"
-        metrics_table += "|{:17}|{:10}|\n".format("FITNESS METRIC", "VALUE")
-        metrics_table += "|" + "-" * 17 + "|" + "-" * 10 + "|\n"
+    def _generation_stats(self, ga_instance: pygad.GA) -> dict:
+        """
+        Returns the statistics of the latest generation as a JSON serializable record.
+
+        Parameters :
+        -------
+            - ga_instance : Instance of the GA class from the pygad library
+
+        Returns :
+        -------
+            - `dict` : Fitness statistics, best solution, fitness cache, genetic operator and racing counts
+                       of the generation, population diversity, out-of-sample fitness and fitness of every exit horizon
+
+        Note :
+        -------
+            - Counters of the fitness cache, genetic operators and racing are restarted, so this is called once per generation
+            - Population diversity, out-of-sample and horizon fitness are only calculated if the record is written or the report is logged
+        """
+        generation = ga_instance.generations_completed
+        fitness_values = np.asarray(ga_instance.last_generation_fitness)
+        best = int(np.argsort(fitness_values)[-1])
+        hits, misses = self.fitness_cache.hits, self.fitness_cache.misses
+        stats = {
+            "generation": generation,
+            "best_fitness": float(fitness_values[best]),
+            "mean_fitness": float(np.mean(fitness_values)),
+            "std_fitness": float(np.std(fitness_values)),
+            "median_fitness": float(np.median(fitness_values)),
+            "best_solution": ga_instance.population[best].tolist(),
+            "cache_hits": hits - self._cache_counters[0],
+            "cache_misses": misses - self._cache_counters[1],
+            "cache_entries": len(self.fitness_cache),
+            **self.operator_counts,
+        }
+        self._cache_counters = (hits, misses)
+        self.operator_counts = dict.fromkeys(self.operator_counts, 0)
+
+        if self.racing_evaluator is not None:
+            stats.update(self._racing_counts(generation=True))
+
+        if self.stats_logger is not None or self._render_report(generation):
+            stats["unique_chromosomes"] = len(set(self.fitness_cache.keys(ga_instance.population)))
+            if self.fold_evaluator is not None:
+                out_of_sample = self._population_out_of_sample(ga_instance.population)
+                stats["out_of_sample_best"] = float(out_of_sample[best])
+                stats["out_of_sample_mean"] = float(np.mean(out_of_sample))
+            if len(self.exit_horizons) > 1:
+                horizon_fitness = self._population_horizon_fitness(ga_instance.population)
+                stats["horizon_fitness"] = dict(
+                    zip(map(str, self.exit_horizons), horizon_fitness[best].tolist())
+                )
+                # Number of chromosomes performing best at every horizon
+                stats["best_horizon_counts"] = dict(
+                    zip(
+                        map(str, self.exit_horizons),
+                        np.bincount(
+                            np.argmax(horizon_fitness, axis=1), minlength=len(self.exit_horizons)
+                        ).tolist(),
+                    )
+                )
+        return stats
 
+    def _generation_report(self, ga_instance: pygad.GA, stats: dict) -> str:
+        """
+        Renders the fitness metrics and top ranked solutions tables of the latest generation (see `_on_generation`).
+        """
+        fitness_values = ga_instance.last_generation_fitness
+        sorted_indices = np.argsort(fitness_values)[::-1]
+        top_solutions = [ga_instance.population[i].tolist() for i in sorted_indices[:3]]
+        top_fitness_values = [fitness_values[i] for i in sorted_indices[:3]]
+
+        ################# metrics_table #################
+        metrics_border = "+" + "-" * 17 + "+" + "-" * 10 + "+"
+        metrics_separator = "|" + "-" * 17 + "|" + "-" * 10 + "|"
+        metrics_lines = [
+            metrics_border,
+            "|{:17}|{:10}|".format("FITNESS METRIC", "VALUE"),
+            metrics_separator,
+        ]
         metrics = [
-            ("Best Score", max(fitness_values)),
-            ("Average Level", np.mean(fitness_values)),
-            ("Fitness Variance", np.std(fitness_values)),
-            ("Median Point", np.median(fitness_values)),
+            ("Best Score", stats["best_fitness"]),
+            ("Average Level", stats["mean_fitness"]),
+            ("Fitness Variance", stats["std_fitness"]),
+            ("Median Point", stats["median_fitness"]),
         ]
-
         for i, (metric, value) in enumerate(metrics):
-            metrics_table += "|{:17}|{:>10.5f}|\n".format(metric, value)
-            if i < len(metrics) - 1:
-                metrics_table += "|" + "-" * 17 + "|" + "-" * 10 + "|\n"
-            else:
-                metrics_table += "+" + "-" * 17 + "+" + "-" * 10 + "+\n"
-
+            metrics_lines.append("|{:17}|{:>10.5f}|".format(metric, value))
+            metrics_lines.append(metrics_separator if i < len(metrics) - 1 else metrics_border)
         ################# metrics_table #################
 
         ################# solutions_table #################
+        second_col_length = max(len(str(top_solutions[0])), len("CANDLESTICK PATTERN")) + 2
+        solutions_border = "+" + "-" * 5 + "+" + "-" * second_col_length + "+" + "-" * 10 + "+"
+        solutions_separator = "|" + "-" * 5 + "|" + "-" * second_col_length + "|" + "-" * 10 + "|"
+        solutions_lines = [
+            "Top Ranked Solutions:",
+            solutions_border,
+            "|{:5}|{:<{}}|{:10}|".format("RANK", "CANDLESTICK PATTERN", second_col_length, "FITNESS"),
+            solutions_separator,
+        ]
+        for idx, (sol, fit) in enumerate(zip(top_solutions, top_fitness_values), 1):
+            solutions_lines.append(f"|{idx:^5}| {sol} |{fit:>10.5f}|")
+            solutions_lines.append(
+                solutions_separator if idx < len(top_solutions) else solutions_border
+            )
+        ################# solutions_table #################
 
-        solutions_table = "Top Ranked Solutions:\n"
-        second_col_length = (
-            max(len(str(top_solutions[0].tolist())), len("CANDLESTICK PATTERN")) + 2
+        max_length_first_table = max(len(line) for line in metrics_lines)
+        report = [f"Generation {stats['generation']} Evaluation Completed :"]
+        report.extend(
+            metrics_line.ljust(max_length_first_table) + " " * 3 + solutions_line
+            for metrics_line, solutions_line in zip(metrics_lines, solutions_lines)
         )
-        solutions_table += (
-            "+" + "-" * 5 + "+" + "-" * second_col_length + "+" + "-" * 10 + "+\n"
+
+        report.append(
+            f"Fitness Cache : {stats['cache_hits']} hits, {stats['cache_misses']} misses "
+            f"({self.fitness_cache.hits} hits, {self.fitness_cache.misses} misses in total, "
+            f"{stats['cache_entries']} entries)"
         )
-        solutions_table += "|{:5}|{:<{}}|{:10}|\n".format(
-            "RANK",
-            "CANDLESTICK PATTERN",
-            second_col_length,
-            "FITNESS",
+        report.append(
+            f"Mutations : {stats['mutated_genes']} of {stats['genes']} genes "
+            f"({stats['mutated_genes'] / max(stats['genes'], 1):.2%}), "
+            f"{stats['replaced_patterns']} patterns replaced, "
+            f"{stats['repaired_conditions']} conditions repaired"
         )
-        solutions_table += (
-            "|" + "-" * 5 + "|" + "-" * second_col_length + "|" + "-" * 10 + "|\n"
+        report.append(
+            f"Population Diversity : {stats['unique_chromosomes']} unique of {len(ga_instance.population)} "
+            f"chromosomes ({stats['unique_chromosomes'] / len(ga_instance.population):.2%}), "
+            f"{stats['replaced_duplicates']} duplicates replaced"
         )
-
-        for idx, (sol, fit) in enumerate(zip(top_solutions, top_fitness_values), 1):
-            solutions_table += f"|{idx:^5}| {sol.tolist()} |{fit:>10.5f}|\n"
-            if idx < len(top_solutions):
-                solutions_table += (
-                    "|"
-                    + "-" * 5
-                    + "|"
-                    + "-" * second_col_length
-                    + "|"
-                    + "-" * 10
-                    + "|\n"
+        if self.racing_evaluator is not None:
+            report.append(f"Racing : {self._racing_summary(stats)}")
+        if len(self.exit_horizons) > 1:
+            report.append(
+                f"Exit Horizons (optimizing {self.optimized_horizon}) : best solution "
+                + ", ".join(
+                    f"{horizon} candles {fitness:.5f}"
+                    for horizon, fitness in stats["horizon_fitness"].items()
                 )
-            else:
-                solutions_table += (
-                    "+"
-                    + "-" * 5
-                    + "+"
-                    + "-" * second_col_length
-                    + "+"
-                    + "-" * 10
-                    + "+\n"
+                + " | best horizon of "
+                + ", ".join(
+                    f"{count} chromosomes at {horizon}"
+                    for horizon, count in stats["best_horizon_counts"].items()
                 )
-
-        ################# solutions_table #################
-
-        max_length_first_table = max(len(line) for line in metrics_table.split("\n"))
-        combined_log = log_message
-        metrics_lines = metrics_table.split("\n")
-        solutions_lines = solutions_table.split("\n")
-        for metrics_line, solutions_line in zip(metrics_lines, solutions_lines):
-            combined_log += (
-                metrics_line.ljust(max_length_first_table)
-                + " " * 3
-                + solutions_line
-                + "\n"
             )
+        if self.fold_evaluator is not None:
+            report.append(
+                f"Out-of-Sample Fitness : {stats['out_of_sample_best']:.5f} best solution, "
+                f"{stats['out_of_sample_mean']:.5f} average over {len(self.fold_evaluator.folds)} folds"
+            )
+        return "\n".join(report) + "\n"
 
-        logger.info(combined_log)
+    def _racing_counts(self, generation: bool) -> dict:
+        """
+        Returns the full and partial evaluation counts of the racing evaluator, of the latest generation or in total.
+        """
+        racing = self.racing_evaluator
+        counters = (
+            racing.num_full,
+            racing.num_partial,
+            racing.candles_evaluated,
+            racing.candles_exhaustive,
+        )
+        if generation:
+            full, partial, candles, exhaustive = np.subtract(counters, self._racing_counters)
+            self._racing_counters = counters
+        else:
+            full, partial, candles, exhaustive = counters
+        return {
+            "racing_full": int(full),
+            "racing_partial": int(partial),
+            "racing_candles_share": float(candles / max(exhaustive, 1)),
+        }
+
+    @staticmethod
+    def _racing_summary(counts: dict) -> str:
+        """
+        Formats the racing counts of `_racing_counts`.
+        """
+        return (
+            f"{counts['racing_full']} full, {counts['racing_partial']} partial evaluations "
+            f"({counts['racing_candles_share']:.2%} of candles evaluated)"
+        )
 
     def _on_start(self, ga_instance: pygad.GA) -> None:
-        # TODO : Add more details (initial fitness, best solution, mutations_rates, etc.)
         """
         Logs detailed initialization data of the Genetic Algorithm.
         """
@@ -325,10 +1308,49 @@ class GeneticAlgorithm:
         parameters = [
             ("Population Size", len(ga_instance.population)),
             ("Matting Pool Size", ga_instance.num_parents_mating),
+            ("Parent Selection", self.parent_selection),
             ("Number of Conditions", self.num_conds),
             ("Max Lag", self.max_lag),
             ("Fitness Function", self.fitness_function_type),
             ("Bullish Focus", str(self.bullish_focus)),
+            ("Minimal Support", self.min_support),
+            ("Number of Candles", self.num_candles),
+            ("Price Type", self.ohlc.dtype.name if self.ohlc is not None else "-"),
+            ("Exit Horizons", ", ".join(map(str, self.exit_horizons))),
+            ("Optimized Horizon", self.optimized_horizon),
+            (
+                "Condition Index Size",
+                (
+                    f"{self.condition_index.nbytes / 2**20:.2f} MB"
+                    if self.condition_index is not None
+                    else "-"
+                ),
+            ),
+            (
+                "Evaluation Chunk Size",
+                self.chunked_data.chunk_size if self.chunked_data is not None else "-",
+            ),
+            ("Fitness Workers", self.num_workers),
+            (
+                "Validation Folds",
+                len(self.fold_evaluator.folds) if self.fold_evaluator is not None else 0,
+            ),
+            ("Stage Metrics", "on" if self.instrumentation.enabled else "off"),
+            ("Report Interval", self.table_interval or "-"),
+            ("Generation Statistics", "on" if self.stats_dir is not None else "off"),
+            ("Pattern Mutation Rate", self.pattern_mutation_rate),
+            ("Gene Mutation Rate", self.gene_mutation_rate),
+            ("Replace Duplicates", str(self.replace_duplicates)),
+            (
+                "Checkpoint Interval",
+                self.checkpoint_interval if self.checkpoint_path is not None else "-",
+            ),
+            (
+                "Racing Stages",
+                len(self.racing_evaluator.stage_ends)
+                if self.racing_evaluator is not None
+                else "-",
+            ),
         ]
 
         for param, value in parameters:
@@ -344,5 +1366,45 @@ class GeneticAlgorithm:
         logger.info(message)
 
     def _on_stop(self, ga_instance: pygad.GA, last_population_fitness: float) -> None:
-        # TODO : Implement on_stop function, add final data to log, summary
+        """
+        Saves the fitness cache, shuts down the evaluators and writers and logs their totals.
+        """
+        self.fitness_cache.save()
+        if self.parallel_evaluator is not None:
+            # Measured on the last population, compared with single-process batch evaluation
+            speedup = self.parallel_evaluator.measure_speedup(ga_instance.population)
+            self.parallel_evaluator.close()
+            logger.info(
+                f"Parallel evaluation of {self.parallel_evaluator.num_evaluated} chromosomes "
+                f"on {self.num_workers} workers took {self.parallel_evaluator.wall_time:.2f} s "
+                f"({self.parallel_evaluator.worker_time:.2f} s of worker time, "
+                f"{self.parallel_evaluator.worker_utilisation():.2f} busy workers on average, "
+                f"measured speedup {speedup:.2f}x on the last population)"
+            )
+            self.parallel_evaluator = None
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.close()
+            logger.info(
+                f"Wrote {self.checkpoint_writer.num_written} checkpoints to {self.checkpoint_path} "
+                f"in {self.checkpoint_writer.write_time:.2f} s "
+                f"({self.checkpoint_writer.num_superseded} superseded by newer ones)"
+            )
+            self.checkpoint_writer = None
+        if self.stats_logger is not None:
+            self.stats_logger.close()
+            logger.info(
+                f"Wrote statistics of {self.stats_logger.num_records} generations to {self.stats_logger.path}"
+            )
+            self.stats_logger = None
+        if self.racing_evaluator is not None:
+            logger.info(
+                f"Racing in total : {self._racing_summary(self._racing_counts(generation=False))}"
+            )
+        if self.instrumentation.enabled:
+            self.instrumentation.close()
+            logger.info(
+                f"Stage metrics of {self.instrumentation.generations_completed} generations "
+                f"(saved to {self.instrumentation.jsonl_path} and {self.instrumentation.prometheus_path}):\n"
+                + self.instrumentation.summary_table()
+            )
         logger.info("Genetic Algorithm is completed.")
@@ -0,0 +1,337 @@
+"""
+Module Name: island_model.py
+Description: Island model of the Genetic Algorithm. Independent sub-populations evolve in
+separate processes and periodically exchange their best chromosomes over a ring or fully
+connected topology.
+
+Last Updated: 2024-09-01
+"""
+
+import multiprocessing as mp
+import queue
+import random
+import time
+import traceback
+
+import numpy as np
+import pandas as pd
+import pygad
+
+from src.modules.genetic_algorithm import GeneticAlgorithm
+from src.utils.logger import logger
+
+TOPOLOGIES = ("ring", "fully_connected")
+
+
+def island_neighbours(num_islands: int, topology: str) -> list[list[int]]:
+    """
+    Returns the islands each island sends its emigrants to.
+
+    Parameters :
+    -------
+        - `num_islands` : Number of islands
+        - `topology` : "ring" (island i sends to island i + 1) or "fully_connected" (every island sends to all others)
+
+    Returns :
+    -------
+        - `neighbours` : List where the i-th sublist contains the destination islands of island i
+    """
+    if topology == "ring":
+        return [[(idx + 1) % num_islands] for idx in range(num_islands)]
+    elif topology == "fully_connected":
+        return [
+            [other for other in range(num_islands) if other != idx]
+            for idx in range(num_islands)
+        ]
+    else:
+        raise ValueError(f"Invalid topology, expected one of {TOPOLOGIES}")
+
+
+class IslandGeneticAlgorithm(GeneticAlgorithm):
+    """
+    Genetic Algorithm of a single island, migrating its best chromosomes every `migration_interval` generations.
+
+    Attributes :
+    -------
+        - `island_idx`: Index of the island
+        - `migration_interval`: Number of generations between migrations
+        - `migration_size`: Number of best chromosomes sent to every neighbour
+        - `num_immigrants`: Number of chromosomes received from other islands so far
+
+    Note :
+    -------
+        - Migration is synchronous, an island waits (up to `migration_timeout` seconds, then it fails) for
+          the emigrants of all islands sending to it. Immigrants replace the worst chromosomes
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        island_idx: int,
+        inbox: mp.Queue,
+        outboxes: list[mp.Queue],
+        num_senders: int,
+        events: mp.Queue,
+        migration_interval: int,
+        migration_size: int,
+        migration_timeout: float = 600.0,
+        **ga_kwargs,
+    ):
+        super().__init__(df, **ga_kwargs)
+        self.island_idx = island_idx
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.migration_timeout = migration_timeout
+        self.num_immigrants = 0
+        self._inbox = inbox
+        self._outboxes = outboxes
+        self._num_senders = num_senders
+        self._events = events
+        self.run_name = f"island_{island_idx}"
+        self.metrics_labels = {"island": str(island_idx)}
+
+    def _on_generation(self, ga_instance: pygad.GA) -> None:
+        """
+        Migrates chromosomes every `migration_interval` generations, then logs the generation as a single
+        population does (see `GeneticAlgorithm._on_generation`) followed by a one-line summary of the island.
+        """
+        generation = ga_instance.generations_completed
+        if self.migration_interval and generation % self.migration_interval == 0:
+            with self.instrumentation.stage("migration"):
+                self._migrate(ga_instance)
+
+        super()._on_generation(ga_instance)
+
+        fitness_values = ga_instance.last_generation_fitness
+        best_fitness = float(np.max(fitness_values))
+        logger.info(
+            f"Island {self.island_idx} | Generation {generation} | "
+            f"Best Score {best_fitness:.5f} | Average Level {np.mean(fitness_values):.5f} | "
+            f"Immigrants {self.num_immigrants}"
+        )
+        self._events.put(("progress", self.island_idx, generation, best_fitness))
+
+    def _migrate(self, ga_instance: pygad.GA) -> None:
+        """
+        Sends the best chromosomes to the neighbouring islands and replaces the worst ones with immigrants.
+        """
+        fitness_values = ga_instance.last_generation_fitness
+        ranking = np.argsort(fitness_values)[::-1]
+        best = ranking[: self.migration_size]
+        emigrants = (ga_instance.population[best].copy(), fitness_values[best].copy())
+        for outbox in self._outboxes:
+            outbox.put(emigrants)
+
+        immigrants, immigrant_fitness = [], []
+        for _ in range(self._num_senders):
+            try:
+                solutions, solutions_fitness = self._inbox.get(timeout=self.migration_timeout)
+            except queue.Empty:
+                raise RuntimeError(
+                    f"Island {self.island_idx} received no immigrants in "
+                    f"{self.migration_timeout} s, a neighbouring island stopped"
+                ) from None
+            immigrants.append(solutions)
+            immigrant_fitness.append(solutions_fitness)
+        if not immigrants:
+            return
+
+        immigrants = np.concatenate(immigrants)
+        immigrant_fitness = np.concatenate(immigrant_fitness)
+        # Keep at least the best chromosome of the island
+        num_replaced = min(len(immigrants), len(ranking) - 1)
+        worst = ranking[len(ranking) - num_replaced :]
+        ga_instance.population[worst] = immigrants[:num_replaced]
+        fitness_values[worst] = immigrant_fitness[:num_replaced]
+        self.num_immigrants += num_replaced
+
+
+def _run_island(
+    island_idx: int,
+    seed: int | None,
+    island_kwargs: dict,
+    events: mp.Queue,
+) -> None:
+    """
+    Runs the Genetic Algorithm of one island in a worker process and reports its result, or its error.
+    """
+    # Independent random streams per island
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    try:
+        island = IslandGeneticAlgorithm(island_idx=island_idx, events=events, **island_kwargs)
+        ga_instance = island.create_instance()
+        ga_instance.run()
+    except Exception:
+        events.put(("error", island_idx, traceback.format_exc()))
+        raise
+
+    solution, fitness, _ = ga_instance.best_solution(ga_instance.last_generation_fitness)
+    # Cache hits are not evaluations, only the fitness values that had to be calculated
+    evaluations = island.fitness_cache.misses
+    events.put(
+        ("result", island_idx, solution, float(fitness), evaluations, island.num_immigrants)
+    )
+
+
+class IslandModel:
+    """
+    Runs several Genetic Algorithm islands in parallel processes with periodic migration.
+
+    Attributes :
+    -------
+        - `num_islands`: Number of islands (sub-populations), each runs in its own process
+        - `migration_interval`: Number of generations between migrations
+        - `migration_size`: Number of best chromosomes sent by an island to each of its neighbours
+        - `topology`: "ring" or "fully_connected"
+        - `seed`: Base random seed, island i uses `seed + i`. None seeds every island from the OS
+        - `num_immigrants`: Number of chromosomes every island received, set by `run()`
+
+    Methods :
+    -------
+        - `run()`: Runs all islands and returns the best chromosome over all islands
+
+    Example :
+    -------
+        - Example illustrates four islands of 50 chromosomes exchanging their two best chromosomes every 10 generations
+
+    .. code-block:: python
+        island_model = IslandModel(
+            df=btc_2018_hourly,
+            num_islands=4,
+            migration_interval=10,
+            migration_size=2,
+            topology="ring",
+            pop_size=50,
+            num_gens=100,
+            num_conds=3,
+            max_lag=3,
+            fitness_type="martin_ratio",
+            bullish_focus=True,
+        )
+        best_solution, best_fitness = island_model.run()
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        num_islands: int,
+        migration_interval: int,
+        migration_size: int,
+        topology: str = "ring",
+        seed: int | None = None,
+        **ga_kwargs,
+    ):
+        self.df = df
+        self.num_islands = num_islands
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.topology = topology
+        self.seed = seed
+        self.ga_kwargs = ga_kwargs
+        self._neighbours = island_neighbours(num_islands, topology)
+        self.num_immigrants = {}
+
+    def run(self) -> tuple[np.ndarray, float]:
+        """
+        Runs all islands until they complete their generations.
+
+        Returns :
+        -------
+            - `best_solution` : Best chromosome (candlestick pattern) over all islands
+            - `best_fitness` : Fitness value of `best_solution`
+
+        Raises :
+        -------
+            - `RuntimeError` : If an island fails, the other islands are stopped instead of waiting for its emigrants
+        """
+        start = time.perf_counter()
+        inboxes = [mp.Queue() for _ in range(self.num_islands)]
+        events = mp.Queue()
+        num_senders = [
+            sum(idx in neighbours for neighbours in self._neighbours)
+            for idx in range(self.num_islands)
+        ]
+
+        processes = []
+        for idx in range(self.num_islands):
+            island_kwargs = dict(
+                df=self.df,
+                inbox=inboxes[idx],
+                outboxes=[inboxes[neighbour] for neighbour in self._neighbours[idx]],
+                num_senders=num_senders[idx],
+                migration_interval=self.migration_interval,
+                migration_size=self.migration_size,
+                **self.ga_kwargs,
+            )
+            seed = None if self.seed is None else self.seed + idx
+            process = mp.Process(
+                target=_run_island, args=(idx, seed, island_kwargs, events)
+            )
+            process.start()
+            processes.append(process)
+
+        results = {}
+        global_best = -np.inf
+        while len(results) < self.num_islands:
+            try:
+                event = events.get(timeout=1.0)
+            except queue.Empty:
+                for idx, process in enumerate(processes):
+                    if process.exitcode not in (None, 0):
+                        self._stop(processes)
+                        raise RuntimeError(
+                            f"Island {idx} stopped with exit code {process.exitcode}"
+                        )
+                if not any(process.is_alive() for process in processes):
+                    raise RuntimeError("Island processes stopped without reporting results")
+                continue
+
+            if event[0] == "error":
+                _, idx, error = event
+                self._stop(processes)
+                raise RuntimeError(f"Island {idx} failed, the run is stopped :\n{error}")
+            elif event[0] == "progress":
+                _, idx, generation, best_fitness = event
+                if best_fitness > global_best:
+                    global_best = best_fitness
+                    logger.info(
+                        f"Global best fitness {global_best:.5f} "
+                        f"(island {idx}, generation {generation})"
+                    )
+            else:
+                _, idx, solution, fitness, evaluations, num_immigrants = event
+                results[idx] = (solution, fitness, evaluations)
+                self.num_immigrants[idx] = num_immigrants
+
+        for process in processes:
+            process.join()
+
+        elapsed = time.perf_counter() - start
+        total_evaluations = sum(evaluations for _, _, evaluations in results.values())
+        for idx, (solution, fitness, evaluations) in sorted(results.items()):
+            logger.info(
+                f"Island {idx} best fitness {fitness:.5f} : {solution.tolist()} "
+                f"({evaluations} evaluations, {self.num_immigrants[idx]} immigrants)"
+            )
+        best_idx = max(results, key=lambda idx: results[idx][1])
+        best_solution, best_fitness, _ = results[best_idx]
+        logger.info(
+            f"Island model completed : global best fitness {best_fitness:.5f} "
+            f"(island {best_idx}), {total_evaluations} evaluations in {elapsed:.2f} s "
+            f"({total_evaluations / elapsed:.1f} evaluations per second)"
+        )
+        return best_solution, best_fitness
+
+    @staticmethod
+    def _stop(processes: list[mp.Process]) -> None:
+        """
+        Terminates the island processes still running, e.g. islands waiting for the emigrants of a failed island.
+        """
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
@@ -0,0 +1,204 @@
+"""
+Module Name: live_matcher.py
+Description: Incremental matching of candlestick patterns on live candle feeds. The last
+`max_lag + 1` candles of every symbol are kept in a ring buffer, each new candle is matched
+against all loaded patterns without pandas and without allocating memory.
+
+Last Updated: 2024-09-01
+"""
+
+import numpy as np
+
+from src.modules.pattern_encoder import encode_patterns
+
+
+class LivePatternMatcher:
+    """
+    Reports which candlestick patterns fired on every new candle of one or more symbols.
+
+    Attributes :
+    -------
+        - `max_lag`: Maximum number of candlesticks to look back for each parameter in a pattern
+        - `num_patterns`: Number of loaded patterns
+        - `num_symbols`: Number of symbols (candle feeds) with their own ring buffer
+        - `num_conditions`: Number of distinct conditions of all loaded patterns
+
+    Methods :
+    -------
+        - `update(symbol, open_price, high_price, low_price, close_price)`: Adds a candle and returns fired patterns
+        - `from_decoded(decoded_patterns, num_symbols)`: Creates a matcher from string-encoded patterns
+        - `reset(symbol)`: Clears the ring buffer of a symbol
+
+    Example :
+    -------
+        - Example illustrates matching of two patterns on a feed of a single symbol
+
+    .. code-block:: python
+        matcher = LivePatternMatcher([[1, 1, 1, 3, 0, 3, 0, 1, 3, 3], [2, 1, 1, 1, 2, 3, 1, 1, 3, 2]])
+        for candle in feed:
+            fired = matcher.update(0, candle.open, candle.high, candle.low, candle.close)
+            print(np.flatnonzero(fired))  # Indices of patterns matched on the latest candle
+
+    Note :
+    -------
+        - Results are the same as matching the pattern on the latest candle with `pattern_is_matched`,
+          no pattern fires before `max_lag + 1` candles of a symbol were received
+        - Each distinct condition (reversed conditions included) is compared once per candle,
+          self-comparisons are always true and are not compared at all
+        - The array returned by `update` is reused, copy it to keep the result of an older candle
+    """
+
+    def __init__(
+        self,
+        encoded_patterns: list[list[int]] | np.ndarray,
+        max_lag: int | None = None,
+        num_symbols: int = 1,
+    ):
+        if len(encoded_patterns) == 0:
+            raise ValueError("No patterns to match")
+        num_conds = max(len(pattern) for pattern in encoded_patterns) // 5
+        conditions = np.zeros((len(encoded_patterns), num_conds, 5), dtype=np.intp)
+        for idx, pattern in enumerate(encoded_patterns):
+            conditions[idx, : len(pattern) // 5] = np.reshape(pattern, (-1, 5))
+
+        # Lags beyond `max_lag` would wrap around the ring buffer and compare the wrong candles
+        pattern_max_lag = int(conditions[..., [1, 4]].max())
+        if max_lag is not None and pattern_max_lag > max_lag:
+            raise ValueError(
+                f"Patterns look back {pattern_max_lag} candles, more than max_lag={max_lag}"
+            )
+        self.max_lag = pattern_max_lag if max_lag is None else max_lag
+        self.num_patterns = len(encoded_patterns)
+        self.num_symbols = num_symbols
+        num_lags = self.max_lag + 1
+
+        # Write every condition with the smaller operand first, so reversed conditions are shared
+        operand1 = conditions[..., 0] * num_lags + conditions[..., 1]
+        operand2 = conditions[..., 3] * num_lags + conditions[..., 4]
+        swap = operand1 > operand2
+        first_operand = np.where(swap, operand2, operand1)
+        second_operand = np.where(swap, operand1, operand2)
+        comparison = np.where(swap, 1 - conditions[..., 2], conditions[..., 2])
+
+        # Missing conditions of shorter patterns are self-comparisons (always true)
+        for idx, pattern in enumerate(encoded_patterns):
+            first_operand[idx, len(pattern) // 5 :] = 0
+            second_operand[idx, len(pattern) // 5 :] = 0
+
+        codes = (first_operand * 2 + comparison) * (4 * num_lags) + second_operand
+        compared = first_operand != second_operand
+        distinct_codes, condition_ids = np.unique(codes[compared], return_inverse=True)
+        self.num_conditions = len(distinct_codes)
+
+        # Last slot of the condition truth vector is the always true self-comparison.
+        # Ids are stored per condition position (num_conds x num_patterns) for contiguous rows
+        pattern_condition_ids = np.full(codes.shape, self.num_conditions, dtype=np.intp)
+        pattern_condition_ids[compared] = condition_ids
+        self._pattern_condition_ids = np.ascontiguousarray(pattern_condition_ids.T)
+
+        distinct_first, distinct_rest = np.divmod(distinct_codes, 2 * 4 * num_lags)
+        distinct_comparison, distinct_second = np.divmod(distinct_rest, 4 * num_lags)
+        self._less_comparison = distinct_comparison == 0
+        self._greater_comparison = distinct_comparison == 1
+
+        # Flat ring buffer positions of both operands of every condition for each head position.
+        # Buffer rows are candles, columns are parameters in the pattern encoding order
+        heads = np.arange(num_lags)[:, None]
+        self._operand1_positions = self._ring_positions(heads, distinct_first, num_lags)
+        self._operand2_positions = self._ring_positions(heads, distinct_second, num_lags)
+
+        self._buffers = np.zeros((num_symbols, num_lags, 4))
+        self._heads = np.full(num_symbols, -1, dtype=np.intp)
+        self._num_candles = np.zeros(num_symbols, dtype=np.int64)
+
+        # Preallocated work arrays, reused on every update
+        self._prices1 = np.empty(self.num_conditions)
+        self._prices2 = np.empty(self.num_conditions)
+        self._greater = np.empty(self.num_conditions, dtype=bool)
+        self._less = np.empty(self.num_conditions, dtype=bool)
+        self._condition_truth = np.ones(self.num_conditions + 1, dtype=bool)
+        self._pattern_truth = np.empty(self._pattern_condition_ids.shape, dtype=bool)
+        self._fired = np.zeros(self.num_patterns, dtype=bool)
+
+    @staticmethod
+    def _ring_positions(heads: np.ndarray, operands: np.ndarray, num_lags: int) -> np.ndarray:
+        """
+        Returns flat buffer positions of `operands` for every head position of the ring buffer.
+        """
+        params, lags = np.divmod(operands, num_lags)
+        return ((heads - lags) % num_lags) * 4 + params
+
+    @classmethod
+    def from_decoded(
+        cls,
+        decoded_patterns: list[str],
+        max_lag: int | None = None,
+        num_symbols: int = 1,
+    ) -> "LivePatternMatcher":
+        """
+        Creates a matcher from string-encoded patterns (e.g. 'H[0] < C[2] & O[0] > C[0]').
+        """
+        return cls(encode_patterns(decoded_patterns), max_lag, num_symbols)
+
+    def reset(self, symbol: int) -> None:
+        """
+        Clears the ring buffer of `symbol`, e.g. after a gap in its candle feed.
+        """
+        self._heads[symbol] = -1
+        self._num_candles[symbol] = 0
+
+    def update(
+        self,
+        symbol: int,
+        open_price: float,
+        high_price: float,
+        low_price: float,
+        close_price: float,
+    ) -> np.ndarray:
+        """
+        Adds the latest candle of a symbol and matches every pattern on it.
+
+        Parameters :
+        -------
+            - `symbol` : Index of the symbol (candle feed), from 0 to `num_symbols` - 1
+            - `open_price` : "Open" price of the candle
+            - `high_price` : "High" price of the candle
+            - `low_price` : "Low" price of the candle
+            - `close_price` : "Close" price of the candle
+
+        Returns :
+        -------
+            - `fired` : Boolean array of length `num_patterns`, True for patterns matched on the candle
+        """
+        num_lags = self.max_lag + 1
+        head = (self._heads[symbol] + 1) % num_lags
+        self._heads[symbol] = head
+        self._num_candles[symbol] += 1
+
+        buffer = self._buffers[symbol]
+        buffer[head, 0] = open_price
+        buffer[head, 1] = close_price
+        buffer[head, 2] = high_price
+        buffer[head, 3] = low_price
+
+        if self._num_candles[symbol] < num_lags:
+            self._fired[:] = False
+            return self._fired
+
+        flat_buffer = buffer.reshape(-1)
+        np.take(flat_buffer, self._operand1_positions[head], out=self._prices1)
+        np.take(flat_buffer, self._operand2_positions[head], out=self._prices2)
+
+        # Equal prices satisfy both comparisons, as in `pattern_is_matched`
+        np.greater(self._prices1, self._prices2, out=self._greater)
+        np.less(self._prices1, self._prices2, out=self._less)
+        np.logical_and(self._greater, self._less_comparison, out=self._greater)
+        np.logical_and(self._less, self._greater_comparison, out=self._less)
+        np.logical_or(self._greater, self._less, out=self._greater)
+        np.logical_not(self._greater, out=self._condition_truth[:-1])
+
+        np.take(self._condition_truth, self._pattern_condition_ids, out=self._pattern_truth)
+        self._fired[:] = self._pattern_truth[0]
+        for condition_truth in self._pattern_truth[1:]:
+            np.logical_and(self._fired, condition_truth, out=self._fired)
+        return self._fired
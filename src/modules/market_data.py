@@ -0,0 +1,145 @@
+"""
+Module Name: market_data.py
+Description: Market data prepared once for the evaluation of candlestick patterns. Prices are held in
+a contiguous OHLC array (optionally float32) and the rounded log returns of the exit horizons are
+calculated once, so no evaluation path calculates logarithms again.
+
+Last Updated: 2024-09-01
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.modules.pattern_evaluation import horizon_log_returns, ohlc_to_array
+
+# Floating point types of the prices
+PRICE_DTYPES = {"float64": np.float64, "float32": np.float32}
+
+
+class MarketData:
+    """
+    Prices and forward log returns of market data, shared by every evaluation of a run.
+
+    Attributes :
+    -------
+        - `ohlc`: C-contiguous array of shape (4, n) in the layout of `ohlc_to_array` (0: Open, 1: Close, 2: High, 3: Low)
+        - `next_returns`: Output of `forward_log_returns` (float64), negated for bearish focus. For several exit
+                          horizons the output of `horizon_log_returns` of shape (number of horizons, n)
+        - `bullish_focus`: Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+        - `exit_horizons`: Numbers of candles a position is held, in the order of the rows of `next_returns`
+        - `num_candles`: Number of candles (rows) of the market data
+        - `nbytes`: Memory of the prices and log returns in bytes
+
+    Methods :
+    -------
+        - `from_frame(df, bullish_focus, price_dtype, exit_horizons)`: Prepares the market data of a DataFrame
+        - `with_focus(bullish_focus)`: Same prices with the log returns of the other focus
+        - `open`, `close`, `high`, `low`: Price rows of `ohlc`
+
+    Example :
+    -------
+        - Example illustrates market data with float32 prices evaluated by a condition index
+
+    .. code-block:: python
+        market_data = MarketData.from_frame(btc_hourly, bullish_focus=True, price_dtype="float32")
+        condition_index = ConditionIndex(market_data.ohlc, max_lag=3)
+        fitness_values = population_fitness(
+            "martin_ratio",
+            condition_index.population_match_matrix(population),
+            market_data.next_returns,
+        )
+
+    Note :
+    -------
+        - Log returns are calculated from the float64 prices before they are converted, so they are
+          identical for both price types
+        - float32 halves the memory and bandwidth of the prices, but prices closer than its precision
+          (about 7 significant digits, e.g. 0.01 above 131072) compare as equal, which may change matches
+    """
+
+    def __init__(
+        self,
+        ohlc: np.ndarray,
+        next_returns: np.ndarray,
+        bullish_focus: bool = True,
+        exit_horizons: tuple[int, ...] = (1,),
+    ):
+        expected_shape = (
+            (ohlc.shape[1],) if len(exit_horizons) == 1 else (len(exit_horizons), ohlc.shape[1])
+        )
+        if next_returns.shape != expected_shape:
+            raise ValueError(
+                "Forward log returns do not match the number of candles and exit horizons"
+            )
+        self.ohlc = np.ascontiguousarray(ohlc)
+        self.next_returns = next_returns
+        self.bullish_focus = bullish_focus
+        self.exit_horizons = tuple(exit_horizons)
+        self.num_candles = ohlc.shape[1]
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        bullish_focus: bool = True,
+        price_dtype: str = "float64",
+        exit_horizons: tuple[int, ...] = (1,),
+    ) -> "MarketData":
+        """
+        Prepares the market data of a DataFrame.
+
+        Parameters :
+        -------
+            - `df` : DataFrame containing time-series market data (price action).
+                     Columns "Open", "Close", "High", "Low" need to be present
+            - `bullish_focus` : Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+            - `price_dtype` : Floating point type of the prices ("float64" or "float32")
+            - `exit_horizons` : Numbers of candles a position is held, log returns are calculated for every horizon
+
+        Returns :
+        -------
+            - `MarketData` : Prices converted to `price_dtype` and the forward log returns of `df`
+        """
+        if price_dtype not in PRICE_DTYPES:
+            raise ValueError(
+                f"Invalid price type {price_dtype}, expected one of {list(PRICE_DTYPES)}"
+            )
+        ohlc = ohlc_to_array(df)
+        next_returns = horizon_log_returns(ohlc, exit_horizons, bullish_focus)
+        return cls(
+            ohlc.astype(PRICE_DTYPES[price_dtype], copy=False),
+            next_returns[0] if len(exit_horizons) == 1 else next_returns,
+            bullish_focus,
+            exit_horizons,
+        )
+
+    def with_focus(self, bullish_focus: bool) -> "MarketData":
+        """
+        Returns market data with the same prices (not copied) and the log returns of `bullish_focus`.
+        """
+        if bullish_focus == self.bullish_focus:
+            return self
+        # Same values as `forward_log_returns`, which negates the returns before appending the last 0
+        next_returns = -self.next_returns
+        next_returns[..., -1:] = 0.0
+        return MarketData(self.ohlc, next_returns, bullish_focus, self.exit_horizons)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ohlc.nbytes + self.next_returns.nbytes
+
+    @property
+    def open(self) -> np.ndarray:
+        return self.ohlc[0]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.ohlc[1]
+
+    @property
+    def high(self) -> np.ndarray:
+        return self.ohlc[2]
+
+    @property
+    def low(self) -> np.ndarray:
+        return self.ohlc[3]
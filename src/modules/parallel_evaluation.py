@@ -0,0 +1,244 @@
+"""
+Module Name: parallel_evaluation.py
+Description: Evaluates fitness of chromosomes on a pool of worker processes. The condition
+index and forward log returns of the training data are placed once in shared memory, workers
+attach to them without copying.
+
+Last Updated: 2024-09-01
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.modules.condition_index import ConditionIndex
+from src.modules.fitness_functions import population_fitness
+
+# State of a worker process, set once by `_attach_worker`
+_worker_state: dict = {}
+
+
+def _attach_worker(
+    shared_arrays: dict[str, tuple[str, tuple[int, ...], str]],
+    num_candles: int,
+    fitness_type: str,
+    min_support: float,
+) -> None:
+    """
+    Initializes a worker process by attaching to the shared memory blocks of the parent process.
+    """
+    blocks = []
+    arrays = {}
+    for name, (block_name, shape, dtype) in shared_arrays.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    _worker_state["blocks"] = blocks
+    _worker_state["condition_index"] = ConditionIndex.from_arrays(
+        arrays["bitsets"], arrays["condition_ids"], num_candles
+    )
+    _worker_state["next_returns"] = arrays["next_returns"]
+    _worker_state["fitness_type"] = fitness_type
+    _worker_state["min_support"] = min_support
+
+
+def _evaluate_chunk(solutions: np.ndarray) -> tuple[np.ndarray, float]:
+    """
+    Evaluates the fitness of a chunk of chromosomes in a worker process.
+
+    Returns :
+    -------
+        - `fitness_values` : Fitness values of `solutions`
+        - `float` : Time spent on the evaluation in seconds
+    """
+    start = time.perf_counter()
+    match_matrix = _worker_state["condition_index"].population_match_matrix(solutions)
+    fitness_values = population_fitness(
+        _worker_state["fitness_type"],
+        match_matrix,
+        _worker_state["next_returns"],
+        _worker_state["min_support"],
+    )
+    return fitness_values, time.perf_counter() - start
+
+
+class ParallelFitnessEvaluator:
+    """
+    Spreads fitness evaluation of chromosomes over a pool of worker processes.
+
+    Attributes :
+    -------
+        - `num_workers`: Number of worker processes
+        - `chunk_size`: Number of chromosomes sent to a worker at once
+        - `num_evaluated`: Number of chromosomes evaluated so far
+        - `wall_time`: Time spent waiting for the workers in seconds
+        - `worker_time`: Sum of evaluation times measured in the workers in seconds
+
+    Methods :
+    -------
+        - `evaluate(solutions)`: Fitness values of a 2-D array of chromosomes
+        - `worker_utilisation()`: Average number of busy workers, worker evaluation time over wall time
+        - `measure_speedup(solutions)`: Single-process evaluation time of chromosomes over their wall time on the workers
+        - `close()`: Shuts down the workers and releases the shared memory
+
+    Example :
+    -------
+        - Example illustrates evaluation of a population on four workers
+
+    .. code-block:: python
+        with ParallelFitnessEvaluator(
+            condition_index,
+            next_returns,
+            "martin_ratio",
+            min_support=0.025,
+            num_workers=4,
+            chunk_size=16,
+        ) as evaluator:
+            fitness_values = evaluator.evaluate(np.array(population))
+            print(f"{evaluator.worker_utilisation():.2f} busy workers")
+            print(f"{evaluator.measure_speedup(np.array(population)):.2f}x faster than one process")
+
+    Note :
+    -------
+        - Fitness values are identical to single-process batch evaluation
+    """
+
+    def __init__(
+        self,
+        condition_index: ConditionIndex,
+        next_returns: np.ndarray,
+        fitness_type: str,
+        min_support: float,
+        num_workers: int,
+        chunk_size: int,
+    ):
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        self.condition_index = condition_index
+        self.next_returns = next_returns
+        self.fitness_type = fitness_type
+        self.min_support = min_support
+        self.num_evaluated = 0
+        self.wall_time = 0.0
+        self.worker_time = 0.0
+        # Leading horizon axis of the fitness values for several exit horizons
+        self._fitness_shape = next_returns.shape[:-1]
+
+        self._blocks = []
+        shared_arrays = {}
+        for name, array in (
+            ("bitsets", condition_index.bitsets),
+            ("condition_ids", condition_index.condition_ids),
+            ("next_returns", next_returns),
+        ):
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            shared_arrays[name] = (block.name, array.shape, array.dtype.str)
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_attach_worker,
+            initargs=(
+                shared_arrays,
+                condition_index.num_candles,
+                fitness_type,
+                min_support,
+            ),
+        )
+
+    def __enter__(self) -> "ParallelFitnessEvaluator":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def evaluate(self, solutions: np.ndarray) -> np.ndarray:
+        """
+        Evaluates the fitness of chromosomes on the worker processes.
+
+        Parameters :
+        -------
+            - `solutions` : 2-D array of chromosomes (candlestick patterns)
+
+        Returns :
+        -------
+            - `fitness_values` : Fitness values of `solutions`, of shape (number of horizons, number of chromosomes)
+                                 if `next_returns` holds several exit horizons
+        """
+        start = time.perf_counter()
+        results = self._map(solutions)
+        self.wall_time += time.perf_counter() - start
+        self.worker_time += sum(elapsed for _, elapsed in results)
+        self.num_evaluated += len(solutions)
+
+        if not results:
+            return np.empty(self._fitness_shape + (0,))
+        # Fitness values of several exit horizons have the horizon axis first
+        return np.concatenate([fitness_values for fitness_values, _ in results], axis=-1)
+
+    def _map(self, solutions: np.ndarray) -> list[tuple[np.ndarray, float]]:
+        """
+        Evaluates chunks of `chunk_size` chromosomes on the workers, returns the output of `_evaluate_chunk` per chunk.
+        """
+        chunks = [
+            solutions[i : i + self.chunk_size]
+            for i in range(0, len(solutions), self.chunk_size)
+        ]
+        return list(self._pool.map(_evaluate_chunk, chunks))
+
+    def worker_utilisation(self) -> float:
+        """
+        Returns the ratio of evaluation time spent in the workers to the wall time, 0 if nothing was evaluated.
+        This is the average number of busy workers, not a speedup over single-process evaluation, since
+        the workers do not pay the serialisation and scheduling overhead measured in the wall time.
+        """
+        return self.worker_time / self.wall_time if self.wall_time else 0.0
+
+    def measure_speedup(self, solutions: np.ndarray, repeat: int = 3) -> float:
+        """
+        Measures the speedup of the workers over single-process batch evaluation of the same chromosomes.
+
+        Parameters :
+        -------
+            - `solutions` : 2-D array of chromosomes (candlestick patterns)
+            - `repeat` : Number of timed evaluations of each kind, the fastest ones are compared
+
+        Returns :
+        -------
+            - `float` : Serial time (evaluation in the main process) over wall time on the workers, including
+                        their serialisation and scheduling overhead. Below 1 the workers are slower
+
+        Note :
+        -------
+            - Chromosomes are evaluated `repeat` times both ways, the evaluations are not counted
+              in `num_evaluated`, `wall_time` and `worker_time`
+        """
+        serial_times, wall_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            population_fitness(
+                self.fitness_type,
+                self.condition_index.population_match_matrix(solutions),
+                self.next_returns,
+                self.min_support,
+            )
+            serial_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            self._map(solutions)
+            wall_times.append(time.perf_counter() - start)
+        return min(serial_times) / min(wall_times)
+
+    def close(self) -> None:
+        """
+        Shuts down the worker processes and releases the shared memory blocks.
+        """
+        self._pool.shutdown()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
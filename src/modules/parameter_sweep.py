@@ -0,0 +1,352 @@
+"""
+Module Name: parameter_sweep.py
+Description: Parameter sweep of the Genetic Algorithm over a grid of settings and several datasets.
+Every dataset is loaded once, its prices and forward log returns are prepared once and its condition
+index is built once per `max_lag`, all are placed in shared memory and reused by every configuration
+running on the worker pool.
+
+Last Updated: 2024-09-01
+"""
+
+import itertools
+import logging
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from src.modules.condition_index import ConditionIndex
+from src.modules.genetic_algorithm import GeneticAlgorithm
+from src.modules.market_data import MarketData
+from src.modules.validation import validation_folds
+from src.utils.logger import logger
+
+# Settings of the grid, named as in `config.yml`
+GRID_SETTINGS = ("num_conds", "max_lag", "fitness_type", "focus_on_bullish_patterns")
+
+# Shared memory blocks attached by a worker process, by block name
+_worker_blocks: dict = {}
+
+
+class SweepConfig(NamedTuple):
+    """
+    One configuration of a parameter sweep.
+
+    Attributes :
+    -------
+        - `dataset`: Name of the dataset
+        - `num_conds`: Number of conditions of the patterns
+        - `max_lag`: Maximum number of candlesticks to look back
+        - `fitness_type`: Name of the fitness function
+        - `bullish_focus`: Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+    """
+
+    dataset: str
+    num_conds: int
+    max_lag: int
+    fitness_type: str
+    bullish_focus: bool
+
+
+class SharedArray(NamedTuple):
+    """
+    Array placed in a shared memory block, passed to worker processes instead of the data.
+    """
+
+    block_name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+def sweep_configs(datasets: list[str], grid: dict[str, list]) -> list[SweepConfig]:
+    """
+    Returns every combination of datasets and grid values.
+
+    Parameters :
+    -------
+        - `datasets` : Names of the datasets
+        - `grid` : Values of every setting of `GRID_SETTINGS`, a single value is used for all configurations
+
+    Returns :
+    -------
+        - `configs` : Configurations ordered by dataset and `max_lag`, so configurations sharing a
+                      condition index run one after another
+    """
+    unknown = set(grid) - set(GRID_SETTINGS)
+    if unknown:
+        raise ValueError(f"Invalid grid settings {sorted(unknown)}, expected {GRID_SETTINGS}")
+    values = [
+        grid[setting] if isinstance(grid[setting], list) else [grid[setting]]
+        for setting in GRID_SETTINGS
+    ]
+    configs = [
+        SweepConfig(dataset, num_conds, max_lag, fitness_type, bullish_focus)
+        for dataset in datasets
+        for num_conds, max_lag, fitness_type, bullish_focus in itertools.product(*values)
+    ]
+    return sorted(configs, key=lambda config: (datasets.index(config.dataset), config.max_lag))
+
+
+def _attach(shared: SharedArray) -> np.ndarray:
+    """
+    Returns the array of a shared memory block, attached once per worker process.
+    """
+    if shared.block_name not in _worker_blocks:
+        block = shared_memory.SharedMemory(name=shared.block_name)
+        _worker_blocks[shared.block_name] = (
+            block,
+            np.ndarray(shared.shape, dtype=shared.dtype, buffer=block.buf),
+        )
+    return _worker_blocks[shared.block_name][1]
+
+
+def _init_worker(log_level: int) -> None:
+    """
+    Initializes a worker process, the logs of every generation are left out of the sweep.
+    """
+    logger.setLevel(log_level)
+
+
+def _run_config(
+    config: SweepConfig,
+    ohlc: SharedArray,
+    next_returns: SharedArray,
+    bitsets: SharedArray,
+    condition_ids: SharedArray,
+    ga_kwargs: dict,
+    validation_settings: dict | None,
+    seed: int | None,
+) -> dict:
+    """
+    Runs the Genetic Algorithm of one configuration in a worker process.
+
+    Returns :
+    -------
+        - `dict` : Row of the results table
+    """
+    start = time.perf_counter()
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    market_data = MarketData(
+        _attach(ohlc),
+        _attach(next_returns),
+        bullish_focus=True,
+        exit_horizons=tuple(ga_kwargs.get("exit_horizons") or (1,)),
+    )
+    genetic_algorithm = GeneticAlgorithm(
+        df=None,
+        validation_folds=(
+            validation_folds(
+                validation_settings["method"],
+                market_data.num_candles,
+                validation_settings["num_folds"],
+                validation_settings["train_size"],
+            )
+            if validation_settings is not None and validation_settings["method"] is not None
+            else None
+        ),
+        num_conds=config.num_conds,
+        max_lag=config.max_lag,
+        fitness_type=config.fitness_type,
+        bullish_focus=config.bullish_focus,
+        condition_index=ConditionIndex.from_arrays(
+            _attach(bitsets), _attach(condition_ids), market_data.num_candles
+        ),
+        market_data=market_data,
+        **ga_kwargs,
+    )
+    genetic_algorithm.run_name = (
+        f"sweep_{config.dataset}_{config.num_conds}_{config.max_lag}_"
+        f"{config.fitness_type}_{'bullish' if config.bullish_focus else 'bearish'}"
+    )
+    ga_instance = genetic_algorithm.create_instance()
+    ga_instance.run()
+
+    solution, fitness, _ = ga_instance.best_solution(ga_instance.last_generation_fitness)
+    cache = genetic_algorithm.fitness_cache
+    return {
+        **config._asdict(),
+        "best_fitness": float(fitness),
+        "best_solution": str(np.asarray(solution).tolist()),
+        # Cache hits are not evaluations, only the fitness values that had to be calculated
+        "evaluations": cache.misses,
+        "wall_time": time.perf_counter() - start,
+    }
+
+
+class ParameterSweep:
+    """
+    Runs the Genetic Algorithm for every combination of a settings grid and several datasets on a worker pool.
+
+    Attributes :
+    -------
+        - `datasets`: Market data of every dataset by name
+        - `grid`: Values of the swept settings (`num_conds`, `max_lag`, `fitness_type`, `focus_on_bullish_patterns`)
+        - `ga_kwargs`: Further arguments of `GeneticAlgorithm`, shared by all configurations
+        - `validation_settings`: Validation settings as in `config.yml` (method, num_folds, train_size),
+                                 folds are created for the candles of every dataset. None optimizes on all candles
+        - `num_workers`: Number of worker processes running configurations
+        - `seed`: Base random seed, configuration i uses `seed + i`. None seeds every configuration from the OS
+        - `configs`: Configurations of the sweep (see `sweep_configs`)
+
+    Methods :
+    -------
+        - `run()`: Runs all configurations and returns the results table
+
+    Example :
+    -------
+        - Example illustrates a sweep of 8 configurations on two datasets and four workers
+
+    .. code-block:: python
+        sweep = ParameterSweep(
+            datasets={"btc_hourly": btc_hourly, "eth_hourly": eth_hourly},
+            grid={
+                "num_conds": [2, 3],
+                "max_lag": 3,
+                "fitness_type": ["martin_ratio", "profit_factor"],
+                "focus_on_bullish_patterns": True,
+            },
+            ga_kwargs=dict(pop_size=50, num_gens=20),
+            num_workers=4,
+        )
+        results = sweep.run()
+        results.to_csv("results/sweep.csv", index=False)
+
+    Note :
+    -------
+        - Condition indexes are built in the main process, one per dataset and `max_lag`, memory of
+          the shared blocks is the sum of `ConditionIndex.estimate_nbytes` over them
+        - Configurations run with a single fitness worker each (`num_workers` of `ga_kwargs` is ignored)
+    """
+
+    def __init__(
+        self,
+        datasets: dict[str, pd.DataFrame],
+        grid: dict[str, list],
+        ga_kwargs: dict | None = None,
+        validation_settings: dict | None = None,
+        num_workers: int = 1,
+        seed: int | None = None,
+    ):
+        self.datasets = datasets
+        self.grid = grid
+        self.ga_kwargs = {**(ga_kwargs or {}), "num_workers": 1}
+        self.validation_settings = validation_settings
+        self.num_workers = num_workers
+        self.seed = seed
+        self.configs = sweep_configs(list(datasets), grid)
+        self._blocks = []
+
+    def _share(self, array: np.ndarray) -> SharedArray:
+        """
+        Copies an array into a new shared memory block.
+        """
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        self._blocks.append(block)
+        return SharedArray(block.name, array.shape, array.dtype.str)
+
+    def _share_datasets(self) -> dict[tuple[str, int], tuple[SharedArray, ...]]:
+        """
+        Places the market data and condition indexes in shared memory.
+
+        Returns :
+        -------
+            - `dict` : Shared OHLC array, forward log returns (bullish focus), bitsets and condition ids
+                       by dataset name and `max_lag`
+        """
+        shared = {}
+        for name, df in self.datasets.items():
+            market_data = MarketData.from_frame(
+                df,
+                bullish_focus=True,
+                price_dtype=self.ga_kwargs.get("price_dtype", "float64"),
+                exit_horizons=tuple(self.ga_kwargs.get("exit_horizons") or (1,)),
+            )
+            shared_market_data = (
+                self._share(market_data.ohlc),
+                self._share(market_data.next_returns),
+            )
+            ohlc = market_data.ohlc
+            for max_lag in sorted({config.max_lag for config in self.configs}):
+                start = time.perf_counter()
+                condition_index = ConditionIndex(ohlc, max_lag)
+                shared[name, max_lag] = (
+                    *shared_market_data,
+                    self._share(condition_index.bitsets),
+                    self._share(condition_index.condition_ids),
+                )
+                num_configs = sum(
+                    config.dataset == name and config.max_lag == max_lag
+                    for config in self.configs
+                )
+                logger.info(
+                    f"Condition index of {name} (max_lag={max_lag}, {ohlc.shape[1]} candles, "
+                    f"{condition_index.nbytes / 2**20:.2f} MB) built in "
+                    f"{time.perf_counter() - start:.2f} s, shared by {num_configs} configurations"
+                )
+                del condition_index
+        return shared
+
+    def run(self) -> pd.DataFrame:
+        """
+        Runs all configurations on the worker pool.
+
+        Returns :
+        -------
+            - `results` : One row per configuration (in the order of `configs`) with the grid settings,
+                          best fitness and solution, number of evaluations and wall time in seconds
+        """
+        start = time.perf_counter()
+        try:
+            shared = self._share_datasets()
+            rows = {}
+            with ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                initializer=_init_worker,
+                initargs=(logging.WARNING,),
+            ) as pool:
+                futures = {
+                    pool.submit(
+                        _run_config,
+                        config,
+                        *shared[config.dataset, config.max_lag],
+                        self.ga_kwargs,
+                        self.validation_settings,
+                        None if self.seed is None else self.seed + idx,
+                    ): idx
+                    for idx, config in enumerate(self.configs)
+                }
+                for future in as_completed(futures):
+                    row = future.result()
+                    rows[futures[future]] = row
+                    logger.info(
+                        f"Configuration {len(rows)}/{len(self.configs)} : "
+                        + ", ".join(f"{setting}={row[setting]}" for setting in SweepConfig._fields)
+                        + f" | best fitness {row['best_fitness']:.5f} in {row['wall_time']:.2f} s"
+                    )
+        finally:
+            self.close()
+
+        elapsed = time.perf_counter() - start
+        config_time = sum(row["wall_time"] for row in rows.values())
+        logger.info(
+            f"Parameter sweep of {len(rows)} configurations completed in {elapsed:.2f} s "
+            f"({config_time:.2f} s of configuration time on {self.num_workers} workers)"
+        )
+        return pd.DataFrame([rows[idx] for idx in sorted(rows)])
+
+    def close(self) -> None:
+        """
+        Releases the shared memory blocks.
+        """
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
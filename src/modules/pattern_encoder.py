@@ -1,12 +1,23 @@
 """
 Module Name: pattern_encoder.py
-Description: Need to update!
+Description: Conversions between the representations of candlestick patterns: the string form
+(e.g. `H[0] < C[2] & O[0] > C[0]`), the 5-integer encoding used by the genetic algorithm, the compact
+form of condition table indices and the canonical form equal for equivalent patterns.
 
 Last Updated: 2024-09-01
 """
 
+import itertools
 import re
 
+import numpy as np
+
+from src.modules.pattern_generator import CandlestickPatternGenerator
+
+# Type of the compact representation, one condition table index per condition
+COMPACT_DTYPE = np.uint16
+_CONDITION_STRINGS: dict[int, np.ndarray] = {}  # max_lag -> decoded string of every table row
+
 
 def encode_patterns(decoded_patterns: list[str]) -> list[list[int]]:
     """
@@ -108,3 +119,278 @@ def decode_patterns(encoded_patterns: list[list[int]]) -> list[str]:
         decoded_patterns.append(" & ".join(conditions))
 
     return decoded_patterns
+
+
+def canonicalize_patterns(encoded_patterns: list[list[int]], max_lag: int) -> np.ndarray:
+    """
+    Converts encoded patterns into a canonical form, equal for patterns that are written differently but match the same candles.
+
+    Parameters :
+    -------
+        - `encoded_patterns` : List (or 2-D array) where each sublist containing integers represents a pattern.
+                               A single pattern (1-D) is treated as a list with one pattern
+        - `max_lag` : Maximum number of candlesticks to look back for each parameter in a pattern
+
+    Returns :
+    -------
+        - `canonical_patterns` : Array of shape (number of patterns, number of conditions), one sorted
+                                 row of condition codes per pattern
+
+    Example :
+    -------
+        - Example illustrates two patterns with the same canonical form
+
+    .. code-block:: python
+        canonical_patterns = canonicalize_patterns(
+            encode_patterns(['C[1] > L[3] & O[0] < H[2]', 'H[2] > O[0] & L[3] < C[1]']),
+            max_lag=3,
+        )
+        print((canonical_patterns[0] == canonical_patterns[1]).all())
+        ----------------------OUTPUT----------------------
+        True
+
+    Note :
+    -------
+        - Condition order, reversed comparisons (`C[1] > L[3]` is `L[3] < C[1]`) and duplicated
+          conditions are ignored. Self-comparisons (`C[0] < C[0]`) always hold and are encoded as -1
+    """
+    patterns = np.atleast_2d(np.asarray(encoded_patterns, dtype=np.int64))
+    conditions = patterns.reshape(patterns.shape[0], -1, 5)
+
+    num_lags = max_lag + 1
+    operand1 = conditions[..., 0] * num_lags + conditions[..., 1]
+    operand2 = conditions[..., 3] * num_lags + conditions[..., 4]
+    comparison = conditions[..., 2]
+
+    # Write every condition with the smaller operand first
+    swap = operand1 > operand2
+    first_operand = np.where(swap, operand2, operand1)
+    second_operand = np.where(swap, operand1, operand2)
+    comparison = np.where(swap, 1 - comparison, comparison)
+
+    codes = (first_operand * 2 + comparison) * (4 * num_lags) + second_operand
+    codes[first_operand == second_operand] = -1
+    codes.sort(axis=1)
+
+    # Duplicated conditions do not change the pattern
+    duplicated = codes[:, 1:] == codes[:, :-1]
+    codes[:, 1:][duplicated] = -1
+    codes.sort(axis=1)
+
+    return codes
+
+
+def _condition_strings(max_lag: int) -> np.ndarray:
+    """
+    Returns the decoded string of every row of the valid-condition table (e.g. "H[0] < C[2]").
+    """
+    if max_lag not in _CONDITION_STRINGS:
+        conditions = CandlestickPatternGenerator.condition_table(max_lag)[0]
+        _CONDITION_STRINGS[max_lag] = np.array(
+            [decode_patterns([condition])[0] for condition in conditions.tolist()],
+            dtype=object,
+        )
+    return _CONDITION_STRINGS[max_lag]
+
+
+def encoded_to_compact(encoded_patterns: list[list[int]], max_lag: int) -> np.ndarray:
+    """
+    Converts encoded patterns into the compact representation, one table index per condition.
+
+    Parameters :
+    -------
+        - `encoded_patterns` : List (or 2-D array) where each sublist containing integers represents a pattern
+        - `max_lag` : Maximum number of candlesticks to look back for each parameter in a pattern
+
+    Returns :
+    -------
+        - `compact_patterns` : Array of shape (number of patterns, number of conditions) and type uint16,
+                               holding the row of each condition in `CandlestickPatternGenerator.condition_table(max_lag)`
+
+    Example :
+    -------
+        - Example illustrates the compact form of two patterns with three conditions
+
+    .. code-block:: python
+        compact_patterns = encoded_to_compact(
+            [[2, 0, 0, 1, 2, 0, 0, 1, 1, 0, 2, 1, 1, 0, 3],
+            [0, 3, 0, 0, 0, 1, 3, 1, 0, 3, 2, 1, 0, 0, 3]],
+            max_lag=3,
+        )
+        print(compact_patterns.shape, compact_patterns.dtype)
+        ----------------------OUTPUT----------------------
+        (2, 3) uint16
+
+    Note :
+    -------
+        - Only conditions passing the rules of the pattern generator are representable,
+          a ValueError is raised for any other condition
+    """
+    patterns = np.atleast_2d(np.asarray(encoded_patterns, dtype=np.int64))
+    if len(CandlestickPatternGenerator.condition_table(max_lag)[0]) > np.iinfo(COMPACT_DTYPE).max:
+        raise ValueError(
+            f"Condition table of max_lag={max_lag} does not fit into {COMPACT_DTYPE.__name__}"
+        )
+
+    condition_indices = CandlestickPatternGenerator.lookup_conditions(patterns, max_lag)
+    if (condition_indices < 0).any():
+        pattern_idx = int(np.flatnonzero((condition_indices < 0).any(axis=1))[0])
+        raise ValueError(
+            f"Pattern {patterns[pattern_idx].tolist()} contains conditions not in the condition table"
+        )
+
+    return condition_indices.astype(COMPACT_DTYPE)
+
+
+def compact_to_encoded(compact_patterns: np.ndarray, max_lag: int) -> np.ndarray:
+    """
+    Converts patterns from the compact representation into the 5-integer encoding.
+
+    Parameters :
+    -------
+        - `compact_patterns` : Array of shape (number of patterns, number of conditions) as returned by `encoded_to_compact`
+        - `max_lag` : Maximum number of candlesticks to look back for each parameter in a pattern
+
+    Returns :
+    -------
+        - `encoded_patterns` : Array of shape (number of patterns, 5 * number of conditions)
+    """
+    compact_patterns = np.atleast_2d(compact_patterns)
+    conditions = CandlestickPatternGenerator.condition_table(max_lag)[0]
+    return conditions[compact_patterns].reshape(
+        len(compact_patterns), 5 * compact_patterns.shape[1]
+    )
+
+
+def compact_to_strings(compact_patterns: np.ndarray, max_lag: int) -> list[str]:
+    """
+    Converts patterns from the compact representation into the human-readable string form.
+
+    Parameters :
+    -------
+        - `compact_patterns` : Array of shape (number of patterns, number of conditions) as returned by `encoded_to_compact`
+        - `max_lag` : Maximum number of candlesticks to look back for each parameter in a pattern
+
+    Returns :
+    -------
+        - `decoded_patterns` : List of strings, same as `decode_patterns` of the encoded patterns
+    """
+    condition_strings = _condition_strings(max_lag)
+    # One list of strings per condition position, joined pattern by pattern
+    columns = [
+        condition_strings[column].tolist() for column in np.atleast_2d(compact_patterns).T
+    ]
+    return list(map(" & ".join, zip(*columns)))
+
+
+def strings_to_compact(decoded_patterns: list[str], max_lag: int) -> np.ndarray:
+    """
+    Converts patterns from the human-readable string form into the compact representation.
+
+    Parameters :
+    -------
+        - `decoded_patterns` : List of strings where each string represents a pattern, all with the same number of conditions
+        - `max_lag` : Maximum number of candlesticks to look back for each parameter in a pattern
+
+    Returns :
+    -------
+        - `compact_patterns` : Array of shape (number of patterns, number of conditions) and type uint16
+
+    Note :
+    -------
+        - Conditions written as `decode_patterns` writes them are looked up directly,
+          others are parsed by `encode_patterns`
+    """
+    condition_index = {
+        condition: idx for idx, condition in enumerate(_condition_strings(max_lag).tolist())
+    }
+    num_conds = decoded_patterns[0].count(" & ") + 1 if decoded_patterns else 0
+
+    # All conditions are split and looked up at once if every pattern is written as `decode_patterns` writes it
+    separators = np.fromiter(
+        map(str.count, decoded_patterns, itertools.repeat(" & ")),
+        dtype=np.int64,
+        count=len(decoded_patterns),
+    )
+    if (separators == num_conds - 1).all():
+        conditions = " & ".join(decoded_patterns).split(" & ") if decoded_patterns else []
+        try:
+            return np.fromiter(
+                map(condition_index.__getitem__, conditions),
+                dtype=COMPACT_DTYPE,
+                count=len(conditions),
+            ).reshape(len(decoded_patterns), num_conds)
+        except KeyError:
+            pass
+
+    compact_patterns = []
+    for pattern in decoded_patterns:
+        try:
+            compact_patterns.append([condition_index[c] for c in pattern.split(" & ")])
+        except KeyError:
+            compact_patterns.append(
+                encoded_to_compact(encode_patterns([pattern]), max_lag)[0].tolist()
+            )
+
+    return np.array(compact_patterns, dtype=COMPACT_DTYPE).reshape(len(decoded_patterns), -1)
+
+
+class Pattern:
+    """
+    Single candlestick pattern in the compact representation.
+
+    Attributes :
+    -------
+        - `conditions`: Tuple of condition table indices (see `encoded_to_compact`)
+        - `max_lag`: Maximum number of candlesticks to look back, selects the condition table
+
+    Methods :
+    -------
+        - `from_encoded(encoded_pattern, max_lag)`: Creates a pattern from the 5-integer encoding
+        - `from_string(decoded_pattern, max_lag)`: Creates a pattern from the string form
+        - `encoded()`: Returns the 5-integer encoding of the pattern
+
+    Example :
+    -------
+        - Example illustrates conversions of a single pattern
+
+    .. code-block:: python
+        pattern = Pattern.from_string("H[0] < C[2] & O[0] > C[0]", max_lag=3)
+        print(pattern.encoded(), str(pattern))
+        ----------------------OUTPUT----------------------
+        [2, 0, 0, 1, 2, 0, 0, 1, 1, 0] H[0] < C[2] & O[0] > C[0]
+    """
+
+    __slots__ = ("conditions", "max_lag")
+
+    def __init__(self, conditions: tuple[int, ...], max_lag: int):
+        self.conditions = tuple(int(condition) for condition in conditions)
+        self.max_lag = max_lag
+
+    @classmethod
+    def from_encoded(cls, encoded_pattern: list[int], max_lag: int) -> "Pattern":
+        return cls(encoded_to_compact([encoded_pattern], max_lag)[0], max_lag)
+
+    @classmethod
+    def from_string(cls, decoded_pattern: str, max_lag: int) -> "Pattern":
+        return cls(strings_to_compact([decoded_pattern], max_lag)[0], max_lag)
+
+    def encoded(self) -> list[int]:
+        return compact_to_encoded(np.array([self.conditions]), self.max_lag)[0].tolist()
+
+    def __str__(self) -> str:
+        return " & ".join(_condition_strings(self.max_lag)[list(self.conditions)])
+
+    def __repr__(self) -> str:
+        return f"Pattern('{self}', max_lag={self.max_lag})"
+
+    def __len__(self) -> int:
+        return len(self.conditions)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Pattern):
+            return NotImplemented
+        return (self.conditions, self.max_lag) == (other.conditions, other.max_lag)
+
+    def __hash__(self) -> int:
+        return hash((self.conditions, self.max_lag))
@@ -1,6 +1,8 @@
 """
 Module Name: pattern_evaluation.py
-Description: Need to update!
+Description: Evaluation of candlestick patterns on market data: matching a pattern against
+the candles it looks back on and collecting the log returns of the following candles. The reference
+row-by-row implementation is kept next to vectorized versions working on (4, n) price arrays.
 
 Last Updated: 2024-09-01
 """
@@ -8,8 +10,12 @@ Last Updated: 2024-09-01
 from math import log as ln
 from statistics import mean
 
+import numpy as np
 import pandas as pd
 
+# Row order of the OHLC array follows the parameter encoding used by the patterns
+OHLC_COLUMNS = ["Open", "Close", "High", "Low"]
+
 
 def pattern_is_matched(
     encoded_pattern: list[int],
@@ -118,3 +124,269 @@ def evaluate_candlestick_pattern(
             log_returns.append(0)
 
     return log_returns
+
+
+def ohlc_to_array(df: pd.DataFrame, dtype: type = np.float64) -> np.ndarray:
+    """
+    Converts market data into a contiguous OHLC array used by the vectorized evaluation.
+
+    Parameters :
+    -------
+        - `df` : DataFrame containing time-series market data (price action).
+                 Columns "Open", "Close", "High", "Low" need to be present
+        - `dtype` : Floating point type of the returned array
+
+    Returns :
+    -------
+        - `ohlc` : C-contiguous array of shape (4, len(`df`)). Rows are ordered as in the
+                   pattern encoding (0: Open, 1: Close, 2: High, 3: Low)
+    """
+    return np.ascontiguousarray(df[OHLC_COLUMNS].to_numpy(dtype=dtype).T)
+
+
+def forward_log_returns(
+    ohlc: np.ndarray, bullish_focus: bool = True, horizon: int = 1
+) -> np.ndarray:
+    """
+    Calculates the rounded log return of the next candles for every candle in `ohlc`.
+
+    Parameters :
+    -------
+        - `ohlc` : Array of shape (4, n) as returned by `ohlc_to_array`
+        - `bullish_focus` : Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+        - `horizon` : Number of candles the position is held, entered at the next Open and exited at a Close
+
+    Returns :
+    -------
+        - `returns` : Array of length n where element `t` is round(ln(Close[t + horizon] / Open[t + 1]), 2),
+                      negated for bearish focus. The last element is 0, since there is no subsequent candle
+
+    Note :
+    -------
+        - With the default horizon of 1, values are identical to the ones calculated by
+          `evaluate_candlestick_pattern`. NumPy rounding is only trusted away from rounding ties, the
+          few values close to a tie are recalculated with the Python built-ins.
+        - Positions held past the last candle are exited at its Close
+    """
+    num_candles = ohlc.shape[1]
+    next_open = ohlc[0, 1:].astype(np.float64)
+    exit_candles = np.minimum(
+        np.arange(horizon, horizon + num_candles - 1), num_candles - 1
+    )
+    next_close = ohlc[1, exit_candles].astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw_returns = np.log(next_close / next_open)
+    returns = np.round(raw_returns, 2)
+
+    # Recalculate values close to a rounding tie exactly as the reference implementation does
+    scaled = raw_returns * 100
+    near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    for idx in np.flatnonzero(near_tie):
+        returns[idx] = round(ln(next_close[idx] / next_open[idx]), 2)
+
+    if not bullish_focus:
+        returns = -returns
+
+    return np.append(returns, 0.0)
+
+
+def horizon_log_returns(
+    ohlc: np.ndarray, exit_horizons: list[int], bullish_focus: bool = True
+) -> np.ndarray:
+    """
+    Calculates the forward log returns of several exit horizons at once.
+
+    Parameters :
+    -------
+        - `ohlc` : Array of shape (4, n) as returned by `ohlc_to_array`
+        - `exit_horizons` : Numbers of candles the position is held (e.g. [1, 4, 12, 24])
+        - `bullish_focus` : Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+
+    Returns :
+    -------
+        - `returns` : Array of shape (number of horizons, n), row `i` is `forward_log_returns` of horizon `exit_horizons[i]`
+    """
+    return np.stack(
+        [forward_log_returns(ohlc, bullish_focus, horizon) for horizon in exit_horizons]
+    )
+
+
+def pattern_match_mask(
+    ohlc: np.ndarray,
+    encoded_pattern: list[int],
+    max_lag: int,
+) -> np.ndarray:
+    """
+    Matches an encoded candlestick pattern against every candle of the market data at once.
+
+    Parameters :
+    -------
+        - `ohlc` : Array of shape (4, n) as returned by `ohlc_to_array`
+        - `encoded_pattern` : List of integers representing the pattern to be matched
+        - `max_lag` : The maximum number of rows (candles) to look back from the reference row (candle)
+
+    Returns :
+    -------
+        - `match_mask` : Boolean array of length n, True where the pattern is matched
+
+    Note :
+    -------
+        - Each condition is evaluated as a single comparison of two shifted views of `ohlc`,
+          the first `max_lag` candles are never matched (same as in `pattern_is_matched`)
+    """
+    num_candles = ohlc.shape[1]
+    match_mask = np.zeros(num_candles, dtype=bool)
+    if num_candles <= max_lag:
+        return match_mask
+
+    window = match_mask[max_lag:]
+    window[:] = True
+    for param1, lag1, comparison, param2, lag2 in np.reshape(encoded_pattern, (-1, 5)):
+        price1 = ohlc[param1, max_lag - lag1 : num_candles - lag1]
+        price2 = ohlc[param2, max_lag - lag2 : num_candles - lag2]
+        # Equal prices satisfy both comparisons, as in `pattern_is_matched`
+        if comparison == 0:
+            window &= ~(price1 > price2)
+        else:
+            window &= ~(price1 < price2)
+
+    return match_mask
+
+
+def population_match_matrix(
+    ohlc: np.ndarray,
+    population: np.ndarray,
+    max_lag: int,
+) -> np.ndarray:
+    """
+    Matches a population of encoded candlestick patterns against every candle of the market data at once.
+
+    Parameters :
+    -------
+        - `ohlc` : Array of shape (4, n) as returned by `ohlc_to_array`
+        - `population` : 2-D integer array, each row is an encoded pattern (chromosome)
+        - `max_lag` : The maximum number of rows (candles) to look back from the reference row (candle)
+
+    Returns :
+    -------
+        - `match_matrix` : Boolean array of shape (number of patterns, n), row `i` is `pattern_match_mask` of pattern `i`
+
+    Note :
+    -------
+        - Every distinct condition of the population is compared once, which is cheaper than building a
+          `ConditionIndex` when the candles are only evaluated for a single population (e.g. chunks of
+          market data that does not fit in memory)
+    """
+    population = np.asarray(population, dtype=np.intp)
+    num_candles = ohlc.shape[1]
+    match_matrix = np.zeros((population.shape[0], num_candles), dtype=bool)
+    if num_candles <= max_lag or population.shape[0] == 0:
+        return match_matrix
+
+    conditions, condition_ids = np.unique(
+        population.reshape(-1, 5), axis=0, return_inverse=True
+    )
+    condition_ids = condition_ids.reshape(population.shape[0], -1)
+
+    # One match mask per distinct condition
+    condition_masks = np.empty((len(conditions), num_candles - max_lag), dtype=bool)
+    for condition_mask, (param1, lag1, comparison, param2, lag2) in zip(
+        condition_masks, conditions
+    ):
+        price1 = ohlc[param1, max_lag - lag1 : num_candles - lag1]
+        price2 = ohlc[param2, max_lag - lag2 : num_candles - lag2]
+        # Equal prices satisfy both comparisons, as in `pattern_is_matched`
+        if comparison == 0:
+            np.greater(price1, price2, out=condition_mask)
+        else:
+            np.less(price1, price2, out=condition_mask)
+        np.logical_not(condition_mask, out=condition_mask)
+
+    # Condition masks of every pattern are gathered and combined one condition position at a time
+    window = match_matrix[:, max_lag:]
+    window[:] = condition_masks[condition_ids[:, 0]]
+    for column in condition_ids.T[1:]:
+        window &= condition_masks[column]
+
+    return match_matrix
+
+
+def apply_last_candle_rule(match_mask: np.ndarray, log_returns: np.ndarray) -> None:
+    """
+    Replaces the log return of a pattern matched on the last candle with the average of previous non-zero log returns.
+
+    Parameters :
+    -------
+        - `match_mask` : Boolean array, True where the pattern is matched. A 2-D array holds one pattern per row
+        - `log_returns` : Array of log returns with the same shape as `match_mask`, updated in place
+
+    Note :
+    -------
+        - If there are no previous non-zero log returns, the last log return is set to 0
+    """
+    match_matrix = np.atleast_2d(match_mask)
+    log_return_matrix = np.atleast_2d(log_returns)
+    if match_matrix.shape[1] == 0:
+        return
+
+    for row in np.flatnonzero(match_matrix[:, -1]):
+        previous_returns = log_return_matrix[row, :-1]
+        non_zero_returns = previous_returns[previous_returns != 0].tolist()
+        log_return_matrix[row, -1] = (
+            round(mean(non_zero_returns), 2) if non_zero_returns else 0.0
+        )
+
+
+def masked_log_returns(match_mask: np.ndarray, next_returns: np.ndarray) -> np.ndarray:
+    """
+    Builds the log returns of a pattern from its match mask.
+
+    Parameters :
+    -------
+        - `match_mask` : Boolean array, True where the pattern is matched. A 2-D array
+                         (population x candles) holds one pattern per row
+        - `next_returns` : Output of `forward_log_returns` for the same market data
+
+    Returns :
+    -------
+        - `log_returns` : Array of log returns with the shape of `match_mask`, 0 where the pattern is not matched
+    """
+    log_returns = np.where(match_mask, next_returns, 0.0)
+    apply_last_candle_rule(match_mask, log_returns)
+    return log_returns
+
+
+def evaluate_candlestick_pattern_vectorized(
+    ohlc: np.ndarray,
+    encoded_pattern: list[int],
+    max_lag: int,
+    bullish_focus: bool = True,
+    next_returns: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluates a candlestick pattern against market data stored in contiguous NumPy arrays.
+
+    Parameters :
+    -------
+        - `ohlc` : Array of shape (4, n) as returned by `ohlc_to_array`
+        - `encoded_pattern` : List of integers representing the pattern to be evaluated
+        - `max_lag` : The maximum number of rows (candles) to look back from the reference row (candle)
+        - `bullish_focus` : Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+        - `next_returns` : Optional precalculated output of `forward_log_returns` (with the same `bullish_focus`)
+
+    Returns :
+    -------
+        - `match_mask` : Boolean array of length n, True where the pattern is matched
+        - `log_returns` : Array of log returns, same values as returned by `evaluate_candlestick_pattern`
+
+    Note :
+    -------
+        - If the pattern is matched on the last candle, the average of previous log returns is returned, since there is no subsequent row (candle) to calculate the log return.
+    """
+    if next_returns is None:
+        next_returns = forward_log_returns(ohlc, bullish_focus)
+
+    match_mask = pattern_match_mask(ohlc, encoded_pattern, max_lag)
+
+    return match_mask, masked_log_returns(match_mask, next_returns)
@@ -1,13 +1,17 @@
 """
 Module Name: pattern_generator.py
-Description: Need to update!
+Description: Random generation of valid candlestick patterns. Conditions are drawn from a
+table of all valid, non-trivial comparisons between the prices of the current and lagged candles, and
+patterns are repaired so that no two conditions compare the same pair of prices.
 
 Last Updated: 2024-09-01
 """
 
-import random
+import itertools
 from typing import ClassVar, Set, Tuple
 
+import numpy as np
+
 
 class CandlestickPatternGenerator:
     """
@@ -18,6 +22,9 @@ class CandlestickPatternGenerator:
         - `max_lag`: Maximum number of candlesticks to look back for each parameter in a pattern
         - `num_conds`: Number of conditions of each pattern
 
+        - `conditions`: Table of all valid encoded conditions for `max_lag`, one condition per row
+        - `condition_pairs`: Index of the unordered pair of compared prices of each condition in `conditions`
+
     Class Variables :
     -------
         - `params`: List of candlestick parameters: ["O" (Open), "C" (Close), "H" (High), "L" (Low)].
@@ -26,6 +33,14 @@ class CandlestickPatternGenerator:
     Methods :
     -------
         - `get_patterns(num_patterns)`: Generates and returns a specified number of encoded candlestick patterns
+        - `get_population(num_patterns)`: Generates encoded candlestick patterns as a 2-D NumPy array
+        - `sample_conditions(shape)`: Draws indices of valid conditions with unique price pairs per pattern
+        - `repair_conditions(condition_indices)`: Draws new conditions in place of invalid or repeated ones
+        - `to_condition_indices(population)`: Converts encoded patterns to indices into `conditions`
+        - `lookup_conditions(population, max_lag)`: Looks up the table rows of encoded conditions
+        - `from_condition_indices(condition_indices)`: Converts indices into `conditions` to encoded patterns
+        - `condition_table(max_lag)`: Returns the valid conditions and their price pairs for `max_lag`
+        - `condition_lookup(max_lag)`: Returns the row in the condition table of every possible encoded condition
 
     Example :
     -------
@@ -53,10 +68,88 @@ class CandlestickPatternGenerator:
 
     params: ClassVar = ["O", "C", "H", "L"]
     comparisons: ClassVar = ["<", ">"]
+    _condition_tables: ClassVar[dict[int, tuple[np.ndarray, np.ndarray]]] = {}
+    _condition_lookups: ClassVar[dict[int, np.ndarray]] = {}
 
     def __init__(self, max_lag: int, num_conds: int):
         self.max_candlestick_lookback = max_lag
         self.number_of_conditions = num_conds
+        self.conditions, self.condition_pairs = self.condition_table(max_lag)
+
+        num_pairs = int(self.condition_pairs.max()) + 1 if len(self.condition_pairs) else 0
+        if num_conds > num_pairs:
+            raise ValueError(
+                f"Patterns with max_lag={max_lag} can have at most {num_pairs} conditions"
+            )
+
+    @classmethod
+    def condition_table(cls, max_lag: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Enumerates every valid condition for `max_lag`, the table is built once per `max_lag` and shared.
+
+        Parameters :
+        -------
+            - `max_lag` : Maximum number of candlesticks to look back
+
+        Returns :
+        -------
+            - `conditions` : Array of shape (number of valid conditions, 5) with encoded conditions
+            - `condition_pairs` : Index of the unordered pair of compared prices of each condition.
+                                  Conditions of a pattern must not share a pair, this covers the
+                                  duplication and (reverse) contradiction rules of `_is_condition_valid`
+
+        Note :
+        -------
+            - Conditions are filtered by the redundancy, adjacency and self-comparison rules of `_is_condition_valid`
+        """
+        if max_lag not in cls._condition_tables:
+            valid_conditions = [
+                condition
+                for condition in itertools.product(
+                    cls.params, range(max_lag + 1), cls.comparisons, cls.params, range(max_lag + 1)
+                )
+                if cls._is_condition_valid(*condition, set())
+            ]
+            conditions = np.array(
+                cls._encode_pattern(valid_conditions), dtype=np.int64
+            ).reshape(-1, 5)
+
+            # Compared prices as operands (parameter, lag), the pair does not depend on their order
+            operand1 = conditions[:, 0] * (max_lag + 1) + conditions[:, 1]
+            operand2 = conditions[:, 3] * (max_lag + 1) + conditions[:, 4]
+            pair_codes = np.minimum(operand1, operand2) * 4 * (max_lag + 1) + np.maximum(
+                operand1, operand2
+            )
+            condition_pairs = np.unique(pair_codes, return_inverse=True)[1].ravel()
+            cls._condition_tables[max_lag] = (conditions, condition_pairs)
+
+        return cls._condition_tables[max_lag]
+
+    @classmethod
+    def condition_lookup(cls, max_lag: int) -> np.ndarray:
+        """
+        Returns the row in the condition table of every possible encoded condition, built once per `max_lag`.
+
+        Parameters :
+        -------
+            - `max_lag` : Maximum number of candlesticks to look back
+
+        Returns :
+        -------
+            - `condition_lookup` : Array indexed by the mixed radix code of an encoded condition
+                                   (((param1 * (max_lag + 1) + lag1) * 2 + comparison) * 4 + param2) * (max_lag + 1) + lag2,
+                                   holding its row in `condition_table(max_lag)` or -1 if the condition is invalid
+        """
+        if max_lag not in cls._condition_lookups:
+            conditions = cls.condition_table(max_lag)[0]
+            num_lags = max_lag + 1
+            param1, lag1, comparison, param2, lag2 = conditions.T
+            codes = (((param1 * num_lags + lag1) * 2 + comparison) * 4 + param2) * num_lags + lag2
+            condition_lookup = np.full(4 * num_lags * 2 * 4 * num_lags, -1, dtype=np.int64)
+            condition_lookup[codes] = np.arange(len(conditions))
+            cls._condition_lookups[max_lag] = condition_lookup
+
+        return cls._condition_lookups[max_lag]
 
     def get_patterns(self, num_patterns: int) -> list[list[int]]:
         """
@@ -70,27 +163,140 @@ class CandlestickPatternGenerator:
         -------
             - `encoded_patterns` : List containing candlestick patterns
         """
+        return self.get_population(num_patterns).tolist()
+
+    def get_population(self, num_patterns: int) -> np.ndarray:
+        """
+        Generates the specified number of encoded candlestick patterns at once.
+
+        Parameters :
+        -------
+            - `num_patterns` : Number of patterns to generate
+
+        Returns :
+        -------
+            - `population` : Array of shape (`num_patterns`, 5 * `num_conds`), one encoded pattern per row
+
+        Note :
+        -------
+            - Conditions are drawn uniformly from `conditions`. Conditions sharing the pair of compared prices
+              with an earlier condition of the same pattern are drawn again, which is equivalent to
+              rejecting invalid conditions one by one, but runs on whole populations
+            - Random numbers are drawn from `numpy.random`, so seeding NumPy makes the patterns reproducible
+        """
+        condition_indices = self.sample_conditions((num_patterns, self.number_of_conditions))
+        return self.conditions[condition_indices].reshape(
+            num_patterns, 5 * self.number_of_conditions
+        )
+
+    def sample_conditions(self, shape: tuple[int, int]) -> np.ndarray:
+        """
+        Draws indices of valid conditions (rows of `conditions`) with unique price pairs within each pattern.
 
-        encoded_patterns = []
-        # Iterate over the number of patterns to create list of conditions for each pattern
-        for _ in range(num_patterns):
-            conditions = []
-            conditions_set = set()  # Set to keep track of existing conditions
-            # Continue generating conditions until the required number of conditions is met
-            while len(conditions) < self.number_of_conditions:
-                param1 = random.choice(self.params)
-                lag1 = random.randint(0, self.max_candlestick_lookback)
-                comparison = random.choice(self.comparisons)
-                param2 = random.choice(self.params)
-                lag2 = random.randint(0, self.max_candlestick_lookback)
-                if self._is_condition_valid(
-                    param1, lag1, comparison, param2, lag2, conditions_set
-                ):
-                    condition = (param1, lag1, comparison, param2, lag2)
-                    conditions.append(condition)
-                    conditions_set.add(condition)
-            encoded_patterns.append(self._encode_pattern(conditions))
-        return encoded_patterns
+        Parameters :
+        -------
+            - `shape` : Tuple (number of patterns, number of conditions)
+
+        Returns :
+        -------
+            - `condition_indices` : Array of shape `shape` with indices into `conditions`
+        """
+        return self.repair_conditions(np.full(shape, -1, dtype=np.int64))[0]
+
+    def repair_conditions(self, condition_indices: np.ndarray) -> tuple[np.ndarray, int]:
+        """
+        Draws new conditions in place of invalid conditions and conditions repeating a price pair of the pattern.
+
+        Parameters :
+        -------
+            - `condition_indices` : 2-D array (patterns x conditions) of indices into `conditions`, negative
+                                    entries mark invalid conditions. The array is repaired in place
+
+        Returns :
+        -------
+            - `condition_indices` : Repaired array, every pattern satisfies the rules of `_is_condition_valid`
+            - `num_repaired` : Number of conditions drawn again (the first draw of invalid conditions included)
+
+        Note :
+        -------
+            - Of two conditions sharing a price pair, the later one is drawn again
+        """
+        num_repaired = 0
+        num_conditions = condition_indices.shape[1]
+        while True:
+            pairs = self.condition_pairs[condition_indices]
+            redraw = condition_indices < 0
+            for position in range(1, num_conditions):
+                redraw[:, position] |= (
+                    pairs[:, :position] == pairs[:, position, np.newaxis]
+                ).any(axis=1)
+            if not redraw.any():
+                return condition_indices, num_repaired
+            num_redrawn = int(redraw.sum())
+            condition_indices[redraw] = np.random.randint(
+                0, len(self.conditions), size=num_redrawn
+            )
+            num_repaired += num_redrawn
+
+    def to_condition_indices(self, population: np.ndarray) -> np.ndarray:
+        """
+        Converts encoded patterns to indices of their conditions in `conditions`.
+
+        Parameters :
+        -------
+            - `population` : 2-D array of encoded patterns (5 integers per condition)
+
+        Returns :
+        -------
+            - `condition_indices` : Array (patterns x conditions) of indices into `conditions`,
+                                    -1 for conditions breaking the redundancy, adjacency or self-comparison rules
+        """
+        return self.lookup_conditions(population, self.max_candlestick_lookback)
+
+    @classmethod
+    def lookup_conditions(cls, population: np.ndarray, max_lag: int) -> np.ndarray:
+        """
+        Looks up the row in `condition_table(max_lag)` of every condition of encoded patterns.
+
+        Parameters :
+        -------
+            - `population` : 2-D array of encoded patterns (5 integers per condition)
+            - `max_lag` : Maximum number of candlesticks to look back
+
+        Returns :
+        -------
+            - `condition_indices` : Array (patterns x conditions) of rows in the condition table,
+                                    -1 for invalid conditions or genes out of range
+        """
+        population = np.asarray(population, dtype=np.int64)
+        num_lags = max_lag + 1
+        genes = population.reshape(len(population), population.shape[1] // 5, 5)
+        param1, lag1, comparison, param2, lag2 = np.moveaxis(genes, 2, 0)
+        in_range = (
+            (param1 >= 0) & (param1 < 4) & (param2 >= 0) & (param2 < 4)
+            & (lag1 >= 0) & (lag1 < num_lags) & (lag2 >= 0) & (lag2 < num_lags)
+            & ((comparison == 0) | (comparison == 1))
+        )
+        codes = (((param1 * num_lags + lag1) * 2 + comparison) * 4 + param2) * num_lags + lag2
+        return np.where(
+            in_range, cls.condition_lookup(max_lag)[np.where(in_range, codes, 0)], -1
+        )
+
+    def from_condition_indices(self, condition_indices: np.ndarray) -> np.ndarray:
+        """
+        Converts indices of conditions in `conditions` to encoded patterns.
+
+        Parameters :
+        -------
+            - `condition_indices` : Array (patterns x conditions) of indices into `conditions`
+
+        Returns :
+        -------
+            - `population` : 2-D array of encoded patterns, one pattern per row
+        """
+        return self.conditions[condition_indices].reshape(
+            len(condition_indices), 5 * condition_indices.shape[1]
+        )
 
     @staticmethod
     def _is_condition_valid(
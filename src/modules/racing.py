@@ -0,0 +1,310 @@
+"""
+Module Name: racing.py
+Description: Successive-halving racing of candlestick patterns. Patterns are evaluated on growing
+prefixes of the candles, patterns whose fitness upper bound falls below the fitness of the parents are
+dropped and only the remaining patterns are evaluated on all candles. Upper bounds assume the
+most favourable matching of the candles not evaluated yet (limited by the candles every condition
+of the pattern holds on), so a dropped pattern can never be one of the parents.
+
+Last Updated: 2024-09-01
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from src.modules.condition_index import ConditionIndex
+from src.modules.fitness_functions import (
+    FitnessAccumulator,
+    FitnessStatistics,
+    fitness_from_statistics,
+    population_fitness,
+)
+
+# Elements of a condition match matrix block unpacked at once
+_UNPACK_BLOCK_ELEMENTS = 2**24
+
+
+class RemainingCandles(NamedTuple):
+    """
+    Best case of the candles not evaluated yet, in cents of log return.
+
+    Attributes :
+    -------
+        - `gains`: Sum of the positive log returns of the candles that may still be matched
+        - `drawdowns`: Number of negative log returns of the candles that may still be matched
+        - `matches`: Number of candles that may still be matched
+    """
+
+    gains: np.ndarray
+    drawdowns: np.ndarray
+    matches: np.ndarray
+
+
+class RacingEvaluator:
+    """
+    Evaluates populations of candlestick patterns in racing stages on growing prefixes of the candles.
+
+    Attributes :
+    -------
+        - `condition_index`: Condition index of the market data
+        - `next_returns`: Output of `forward_log_returns` for the same market data
+        - `fitness_type`: Name of the fitness function ("total_return", "profit_factor" or "martin_ratio")
+        - `min_support`: Minimal share of candles a pattern needs to be matched on
+        - `stage_ends`: End candles of the prefixes, every prefix doubles the previous one and the last is the whole series
+        - `num_full`: Number of patterns evaluated on all candles so far
+        - `num_partial`: Number of patterns dropped after a partial evaluation so far
+        - `candles_evaluated`: Number of evaluated pattern-candle pairs so far
+        - `candles_exhaustive`: Number of pattern-candle pairs an exhaustive evaluation would have evaluated
+
+    Methods :
+    -------
+        - `evaluate(population, threshold)`: Fitness of every pattern, exact unless it is dropped
+        - `upper_bounds(statistics, remaining)`: Fitness upper bounds from the statistics of a prefix
+
+    Example :
+    -------
+        - Example illustrates racing against the fitness of the worst parent
+
+    .. code-block:: python
+        racing = RacingEvaluator(condition_index, next_returns, "martin_ratio", num_stages=4)
+        fitness_values, exact = racing.evaluate(population, threshold=parent_fitness)
+        print(f"{racing.num_full} full, {racing.num_partial} partial evaluations")
+
+    Note :
+    -------
+        - Dropped patterns get fitness 0 (a lower bound of every fitness function), patterns with an
+          upper bound of at least `threshold` are evaluated exactly, so the best pattern is always exact
+        - Log returns of the remaining candles are known, an upper bound assumes a pattern matches every
+          remaining gain its conditions hold on, and drawdowns of the smallest possible size (0.01)
+    """
+
+    def __init__(
+        self,
+        condition_index: ConditionIndex,
+        next_returns: np.ndarray,
+        fitness_type: str,
+        min_support: float = 0.025,
+        num_stages: int = 4,
+    ):
+        self.condition_index = condition_index
+        self.next_returns = next_returns
+        self.fitness_type = fitness_type
+        self.min_support = min_support
+        self.num_candles = len(next_returns)
+        self.stage_ends = sorted(
+            {self.num_candles // 2**stage for stage in range(num_stages)} - {0}
+        )
+        self.num_full = 0
+        self.num_partial = 0
+        self.candles_evaluated = 0
+        self.candles_exhaustive = 0
+        self._condition_gains, self._condition_drawdowns, self._largest_gains = (
+            self._remaining_tables(condition_index, next_returns)
+        )
+
+    def _remaining_tables(
+        self, condition_index: ConditionIndex, next_returns: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, list[np.ndarray]]:
+        """
+        Best case of the candles following every stage end: gains and drawdowns of the candles every
+        distinct condition holds on, and cumulative sums of the largest gains.
+        """
+        segment_starts = np.array([0, *self.stage_ends[:-1]])
+        num_conditions = len(condition_index.bitsets)
+        accumulator = FitnessAccumulator(num_conditions, self.num_candles, segment_starts)
+        block_size = max(_UNPACK_BLOCK_ELEMENTS // num_conditions // 8 * 8, 1024)
+        for first_candle in range(0, self.num_candles, block_size):
+            last_candle = min(first_candle + block_size, self.num_candles)
+            accumulator.add(
+                condition_index.condition_match_matrix(first_candle, last_candle),
+                next_returns[first_candle:last_candle],
+                first_candle,
+            )
+        statistics = accumulator.partial_statistics()
+
+        def remaining(segment_sums: np.ndarray) -> np.ndarray:
+            # Column `stage` sums the segments after stage end `stage`
+            suffix_sums = np.cumsum(segment_sums[:, ::-1], axis=1)[:, ::-1]
+            return np.append(suffix_sums[:, 1:], np.zeros((num_conditions, 1)), axis=1)
+
+        # The last candle gets the average log return of the pattern, at most the largest log return
+        cents = np.rint(np.nan_to_num(next_returns[:-1], nan=0.0) * 100)
+        largest_gain = max(cents.max(initial=0.0), 0.0)
+        last_match = condition_index.condition_match_matrix(self.num_candles - 1)
+        condition_gains = (
+            remaining(np.rint(statistics.positive_sum * 100)) + largest_gain * last_match
+        )
+        condition_drawdowns = remaining(statistics.negative_count) + last_match
+
+        # Sums of the m largest gains after every stage end, for patterns matched on m more candles
+        largest_gains = []
+        for stage_end in self.stage_ends:
+            gains = cents[stage_end:][cents[stage_end:] > 0]
+            largest_gains.append(np.cumsum([0.0, largest_gain, *np.sort(gains)[::-1]]))
+        return condition_gains, condition_drawdowns, largest_gains
+
+    def upper_bounds(
+        self, statistics: FitnessStatistics, remaining: RemainingCandles
+    ) -> np.ndarray:
+        """
+        Calculates upper bounds of the fitness of patterns on all candles from their statistics on a prefix.
+
+        Parameters :
+        -------
+            - `statistics` : Statistics of the candles of the prefix (see `FitnessAccumulator.partial_statistics`)
+            - `remaining` : Best case of the candles after the prefix for each pattern, in cents of log return
+
+        Returns :
+        -------
+            - `np.ndarray` : Upper bound of the fitness of each pattern
+
+        Note :
+        -------
+            - Gains (positive log returns) can only grow by the remaining gains and drawdowns can only
+              grow, the Martin ratio bound maximizes over the number of added drawdowns of 0.01, which
+              lower the drawdown deviation the most
+        """
+        positive_cents = np.rint(statistics.positive_sum * 100)
+        negative_cents = np.rint(statistics.negative_sum * 100)
+        max_positive = positive_cents + remaining.gains
+        max_total = np.maximum(max_positive + negative_cents, 0)
+
+        if self.fitness_type == "total_return":
+            return max_total / 100
+
+        # Pattern needs to be matched at least `min_support` of the time
+        max_match_count = statistics.match_count + remaining.matches
+        noise = max_match_count < self.min_support * self.num_candles
+
+        if self.fitness_type == "profit_factor":
+            with np.errstate(divide="ignore"):
+                bounds = np.maximum(
+                    np.log(max_positive / np.maximum(-negative_cents, 1)), 0
+                )
+            return np.where(noise | (max_positive == 0), 0.0, bounds)
+
+        if self.fitness_type != "martin_ratio":
+            raise ValueError("Invalid fitness function type")
+
+        # Martin ratio (A - j) / sqrt((S + j) / (c + j)) after adding j drawdowns of one cent, in cents
+        total = max_total
+        count = statistics.negative_count
+        squared = np.rint(statistics.squared_negative_sum * 10_000)
+        linear = count + 3 * squared
+        constant = total * squared - 2 * count * squared - total * count
+        with np.errstate(invalid="ignore"):
+            optimum = np.where(
+                constant > 0,
+                (-linear + np.sqrt(linear**2 + 8 * np.maximum(constant, 0))) / 4,
+                0.0,
+            )
+        num_added = np.clip(optimum, 0, np.minimum(remaining.drawdowns, total))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bounds = np.where(
+                count + num_added > 0,
+                (total - num_added)
+                / np.sqrt((squared + num_added) / (count + num_added)),
+                total,  # No drawdowns, divided by 0.01 (one cent)
+            )
+        return np.where(noise | (total == 0), 0.0, np.nan_to_num(bounds, nan=0.0))
+
+    def evaluate(
+        self, population: np.ndarray, threshold: float = 0.0, num_parents: int = 0
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluates a population in racing stages.
+
+        Parameters :
+        -------
+            - `population` : 2-D integer array, each row is an encoded pattern (chromosome)
+            - `threshold` : Fitness of the worst parent, patterns whose upper bound is below it are dropped
+            - `num_parents` : Number of patterns with the largest upper bounds after the first stage that are
+                              evaluated on all candles at once, the threshold is raised to the lowest of their
+                              fitness values (0 keeps the threshold)
+
+        Returns :
+        -------
+            - `fitness_values` : Fitness of every pattern, 0 for dropped patterns
+            - `exact` : Boolean array, True where the fitness value is exact (pattern evaluated on all candles)
+
+        Note :
+        -------
+            - Any `num_parents` patterns of the population are at most as fit as its `num_parents` fittest
+              patterns, so patterns below the raised threshold cannot be among them either
+        """
+        population = np.atleast_2d(population)
+        accumulator = FitnessAccumulator(len(population), self.num_candles)
+        bits = self.condition_index.population_bits(population)
+        total_matches = np.bitwise_count(bits).sum(axis=1, dtype=np.int64)
+        condition_ids = self.condition_index.population_condition_ids(population)
+        racing = np.arange(len(population))
+        fitness_values = np.zeros(len(population))
+        exact = np.zeros(len(population), dtype=bool)
+        first_candle = 0
+        for stage, stage_end in enumerate(self.stage_ends):
+            match_matrix = self.condition_index.unpack_bits(
+                bits[racing, first_candle // 8 : (stage_end + 7) // 8], first_candle, stage_end
+            )
+            accumulator.add(
+                match_matrix, self.next_returns[first_candle:stage_end], first_candle
+            )
+            self.candles_evaluated += len(racing) * (stage_end - first_candle)
+            first_candle = stage_end
+            if stage_end == self.num_candles:
+                break
+
+            statistics = FitnessStatistics(
+                *(field[..., 0] for field in accumulator.partial_statistics())
+            )
+            # Matches of the remaining candles are counted from the match bits, and a pattern
+            # is matched only where all of its conditions hold
+            matches = total_matches[racing] - statistics.match_count
+            largest_gains = self._largest_gains[stage]
+            remaining = RemainingCandles(
+                gains=np.minimum(
+                    self._condition_gains[condition_ids[racing], stage].min(axis=1),
+                    largest_gains[np.minimum(matches, len(largest_gains) - 1)],
+                ),
+                drawdowns=np.minimum(
+                    self._condition_drawdowns[condition_ids[racing], stage].min(axis=1),
+                    matches,
+                ),
+                matches=matches,
+            )
+            bounds = self.upper_bounds(statistics, remaining)
+            # Fitness values are rounded to 2 decimals, so are their bounds
+            survivors = np.round(bounds, 2) >= threshold
+            if stage == 0 and 0 < num_parents < len(racing):
+                # Patterns most likely to be parents are evaluated on all candles first
+                leaders = np.argsort(-bounds, kind="stable")[:num_parents]
+                fitness_values[racing[leaders]] = population_fitness(
+                    self.fitness_type,
+                    self.condition_index.population_match_matrix(population[racing[leaders]]),
+                    self.next_returns,
+                    self.min_support,
+                )
+                exact[racing[leaders]] = True
+                self.candles_evaluated += num_parents * (self.num_candles - stage_end)
+                threshold = max(threshold, fitness_values[racing[leaders]].min())
+                survivors = np.round(bounds, 2) >= threshold
+                survivors[leaders] = False
+            accumulator.keep(survivors)
+            racing = racing[survivors]
+            if len(racing) == 0:
+                break
+
+        if len(racing):
+            fitness_values[racing] = fitness_from_statistics(
+                self.fitness_type,
+                FitnessStatistics(
+                    *(np.squeeze(field, axis=-1) for field in accumulator.statistics())
+                ),
+                self.min_support,
+            )
+            exact[racing] = True
+
+        self.num_full += int(exact.sum())
+        self.num_partial += len(population) - int(exact.sum())
+        self.candles_exhaustive += len(population) * self.num_candles
+        return fitness_values, exact
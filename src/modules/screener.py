@@ -0,0 +1,499 @@
+"""
+Module Name: screener.py
+Description: Historical screener of saved candlestick patterns over a universe of symbols. Every
+distinct condition is evaluated once per symbol (condition index), equivalent patterns are matched
+once, the candles each pattern fired on are kept as sparse indices and the fitness of every pattern
+is summarized from the same match masks. Symbols are screened in parallel worker processes.
+
+Last Updated: 2024-09-01
+"""
+
+import logging
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from src.modules.condition_index import ConditionIndex
+from src.modules.fitness_functions import fitness_from_statistics, fitness_statistics
+from src.modules.market_data import PRICE_DTYPES, MarketData
+from src.modules.pattern_encoder import canonicalize_patterns, decode_patterns, encode_patterns
+from src.modules.pattern_evaluation import forward_log_returns
+from src.utils.data_loader import LoadedOHLC, load_ohlc
+from src.utils.logger import logger
+from src.utils.resample_cache import ResampleCache
+
+# Fitness functions summarized for every pattern
+SUMMARY_FITNESS_TYPES = ("total_return", "profit_factor", "martin_ratio")
+
+# Always matched self-comparison (O[0] < O[0]), pads patterns with fewer conditions
+_PADDING_CONDITION = [0, 0, 0, 0, 0]
+
+# Patterns and settings of a worker process, set once by `_init_worker`
+_worker_settings: "ScreenSettings | None" = None
+
+
+def read_pattern_file(path: str | Path) -> list[list[int]]:
+    """
+    Reads candlestick patterns from a text file, one pattern per line.
+
+    Parameters :
+    -------
+        - `path` : Text file with a pattern per line, either in the string form of `decode_patterns`
+                   (e.g. `H[0] < C[2] & O[0] > C[0]`) or as the 5-integer encoding separated by commas
+                   or spaces (e.g. `[2, 0, 0, 1, 2, 0, 0, 1, 1, 0]`). Empty lines and lines starting with # are skipped
+
+    Returns :
+    -------
+        - `encoded_patterns` : List where each sublist containing integers represents a pattern, in the order of the file
+
+    Note :
+    -------
+        - Both forms may be mixed in one file and patterns may have different numbers of conditions
+    """
+    encoded_patterns = []
+    with Path(path).open("r") as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if re.search(r"[OCHL]\[", line):
+                encoded_pattern = encode_patterns([line])[0]
+                num_genes = 5 * (line.count("&") + 1)
+            else:
+                encoded_pattern = [int(gene) for gene in re.findall(r"\d+", line)]
+                num_genes = len(encoded_pattern)
+            if not encoded_pattern or len(encoded_pattern) != num_genes or num_genes % 5:
+                raise ValueError(f"Invalid pattern on line {line_number} of {path}: {line}")
+            encoded_patterns.append(encoded_pattern)
+    return encoded_patterns
+
+
+def dataset_paths(directory: str | Path) -> dict[str, Path]:
+    """
+    Lists the datasets of a directory, one per symbol.
+
+    Parameters :
+    -------
+        - `directory` : Directory holding a parquet file or a directory of (partitioned) parquet files per symbol
+
+    Returns :
+    -------
+        - `dict` : Path of every dataset by symbol (file or directory name without suffix), sorted by symbol
+    """
+    paths = {
+        path.stem: path
+        for path in Path(directory).iterdir()
+        if path.is_dir() or path.suffix == ".parquet"
+    }
+    if not paths:
+        raise ValueError(f"No parquet datasets found in {directory}")
+    return dict(sorted(paths.items()))
+
+
+class SymbolMatches(NamedTuple):
+    """
+    Candles every pattern is matched on for one symbol, in compressed sparse row form.
+
+    Attributes :
+    -------
+        - `symbol`: Name of the symbol
+        - `dates`: Timestamps of the candles of the symbol (datetime64[ns])
+        - `indptr`: Array of length number of patterns + 1, the matches of pattern `i` are
+                    `indices[indptr[i]:indptr[i + 1]]`
+        - `indices`: Increasing candle indices of the matches of every pattern, concatenated
+    """
+
+    symbol: str
+    dates: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+
+    def pattern_matches(self, pattern_idx: int) -> np.ndarray:
+        """
+        Returns the candle indices pattern `pattern_idx` is matched on.
+        """
+        return self.indices[self.indptr[pattern_idx] : self.indptr[pattern_idx + 1]]
+
+    def match_dates(self, pattern_idx: int) -> np.ndarray:
+        """
+        Returns the timestamps of the candles pattern `pattern_idx` is matched on.
+        """
+        return self.dates[self.pattern_matches(pattern_idx)]
+
+    def save(self, path: str | Path) -> None:
+        """
+        Writes the matches to a binary (.npz) file.
+        """
+        np.savez(
+            path,
+            symbol=np.array(self.symbol),
+            dates=self.dates,
+            indptr=self.indptr,
+            indices=self.indices,
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "SymbolMatches":
+        """
+        Reads matches written by `save`.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls(str(data["symbol"]), data["dates"], data["indptr"], data["indices"])
+
+
+class ScreenSettings(NamedTuple):
+    """
+    Distinct patterns and settings a symbol is screened with, all a worker process receives.
+
+    Attributes :
+    -------
+        - `population`: Distinct encoded patterns (2-D array of the smallest integer type holding `max_lag`)
+        - `pattern_distinct`: Row of `population` every screened pattern is matched as
+        - `max_lag`: Maximum number of candlesticks to look back
+        - `bullish_focus`: Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+        - `min_support`: Minimal share of candles a pattern needs to be matched on
+        - `batch_size`: Number of distinct patterns matched at once
+        - `price_dtype`: Floating point type of the prices ("float64" or "float32")
+    """
+
+    population: np.ndarray
+    pattern_distinct: np.ndarray
+    max_lag: int
+    bullish_focus: bool
+    min_support: float
+    batch_size: int
+    price_dtype: str
+
+
+class PatternScreener:
+    """
+    Screens saved candlestick patterns over the market data of many symbols.
+
+    Attributes :
+    -------
+        - `patterns`: Encoded patterns (5 integers per condition), numbers of conditions may differ
+        - `max_lag`: Maximum number of candlesticks to look back, the first `max_lag` candles are never matched
+        - `bullish_focus`: Boolean indicating whether to focus on bullish (True) or bearish (False) patterns
+        - `min_support`: Minimal share of candles a pattern needs to be matched on, used by the fitness summaries
+        - `batch_size`: Number of distinct patterns matched at once, memory of a batch is roughly
+                        batch size * number of candles * 9 bytes
+        - `price_dtype`: Floating point type of the prices ("float64" or "float32")
+        - `num_distinct`: Number of distinct patterns (equivalent patterns are matched once)
+        - `settings`: Distinct patterns and settings sent to the worker processes (see `ScreenSettings`)
+
+    Methods :
+    -------
+        - `screen(symbol, loaded)`: Matches and summarizes all patterns on the market data of one symbol
+        - `run(datasets, ...)`: Loads and screens every dataset on a worker pool
+
+    Example :
+    -------
+        - Example illustrates screening of a pattern file over a directory of hourly datasets
+
+    .. code-block:: python
+        screener = PatternScreener(read_pattern_file("results/patterns.txt"), max_lag=3)
+        summary, matches = screener.run(dataset_paths("data/universe"), freq="h", num_workers=8)
+        best = summary.sort_values("martin_ratio", ascending=False).head(10)
+        print(matches["BTC"].match_dates(int(best["pattern_idx"].iloc[0])))
+
+    Note :
+    -------
+        - Results equal `population_fitness` and `ConditionIndex.match_mask` of every pattern, same as
+          `evaluate_candlestick_pattern` with the same `max_lag`
+        - Patterns with fewer conditions are padded with the always matched condition `O[0] < O[0]`
+    """
+
+    def __init__(
+        self,
+        patterns: list[list[int]],
+        max_lag: int,
+        bullish_focus: bool = True,
+        min_support: float = 0.025,
+        batch_size: int = 1024,
+        price_dtype: str = "float64",
+    ):
+        if not patterns:
+            raise ValueError("No patterns to screen")
+        if price_dtype not in PRICE_DTYPES:
+            raise ValueError(
+                f"Invalid price type {price_dtype}, expected one of {list(PRICE_DTYPES)}"
+            )
+        self.patterns = [list(pattern) for pattern in patterns]
+        self.max_lag = max_lag
+        self.bullish_focus = bullish_focus
+        self.min_support = min_support
+        self.batch_size = batch_size
+        self.price_dtype = price_dtype
+
+        num_conds = max(len(pattern) // 5 for pattern in self.patterns)
+        population = np.array(
+            [
+                pattern + _PADDING_CONDITION * (num_conds - len(pattern) // 5)
+                for pattern in self.patterns
+            ]
+        )
+        lags = population.reshape(len(population), -1, 5)[..., [1, 4]]
+        if lags.max() > max_lag:
+            raise ValueError(
+                f"Patterns look back {lags.max()} candles, more than max_lag={max_lag}"
+            )
+
+        # Equivalent patterns (reordered, reversed or duplicated conditions) are matched once
+        _, distinct_idx, pattern_distinct = np.unique(
+            canonicalize_patterns(population, max_lag),
+            axis=0,
+            return_index=True,
+            return_inverse=True,
+        )
+        # Distinct patterns in the order of their first occurrence, so without equivalent patterns
+        # the matches need no reordering
+        order = np.argsort(distinct_idx)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        self.num_distinct = len(distinct_idx)
+        self.settings = ScreenSettings(
+            population[distinct_idx[order]].astype(np.min_scalar_type(max(max_lag, 3))),
+            rank[pattern_distinct.reshape(-1)],
+            max_lag,
+            bullish_focus,
+            min_support,
+            batch_size,
+            price_dtype,
+        )
+        self._pattern_strings = decode_patterns(self.patterns)
+
+    def screen(self, symbol: str, loaded: LoadedOHLC) -> tuple[pd.DataFrame, SymbolMatches]:
+        """
+        Matches and summarizes all patterns on the market data of one symbol.
+
+        Parameters :
+        -------
+            - `symbol` : Name of the symbol
+            - `loaded` : Market data of the symbol (see `load_ohlc`)
+
+        Returns :
+        -------
+            - `summary` : One row per pattern (in the order of `patterns`) with the symbol, pattern index and
+                          string, match count, support, fitness of every `SUMMARY_FITNESS_TYPES`, date of
+                          the last match and whether the pattern is matched on the last candle
+            - `matches` : Candles every pattern is matched on
+        """
+        summary, matches = screen_symbol(self.settings, symbol, loaded)
+        summary.insert(2, "pattern", self._pattern_strings)
+        return summary, matches
+
+    def run(
+        self,
+        datasets: dict[str, str | Path],
+        freq: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        cache: ResampleCache | None = None,
+        num_workers: int = 1,
+        output_dir: str | Path | None = None,
+    ) -> tuple[pd.DataFrame, dict[str, SymbolMatches]]:
+        """
+        Loads and screens every dataset, symbols are screened in parallel worker processes.
+
+        Parameters :
+        -------
+            - `datasets` : Parquet file or directory of every symbol (see `dataset_paths`)
+            - `freq` : Fixed frequency to resample to (e.g. "h"), None keeps the original candles
+            - `start` : First date to load (inclusive), None loads from the beginning
+            - `end` : Last date to load (exclusive), None loads to the end
+            - `cache` : Resample cache shared by the workers (used if `freq` is set), None resamples every dataset
+            - `num_workers` : Number of worker processes screening symbols, at most one per symbol
+            - `output_dir` : Directory the workers write the matches of every symbol to (`{symbol}_matches.npz`),
+                             None returns the matches instead
+
+        Returns :
+        -------
+            - `summary` : Summaries of all symbols (see `screen`), ordered by symbol and pattern
+            - `matches` : Matches by symbol, empty if they are written to `output_dir`
+
+        Note :
+        -------
+            - Symbols with no more than `max_lag + 1` candles are skipped with a warning
+        """
+        run_start = time.perf_counter()
+        num_workers = max(1, min(num_workers, len(datasets)))
+        if output_dir is not None:
+            Path(output_dir).mkdir(parents=True, exist_ok=True)
+        summaries, matches = {}, {}
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_worker,
+            initargs=(self.settings, logging.WARNING),
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _screen_dataset,
+                    symbol,
+                    path,
+                    freq,
+                    start,
+                    end,
+                    cache,
+                    output_dir,
+                ): symbol
+                for symbol, path in datasets.items()
+            }
+            for future in as_completed(futures):
+                symbol = futures[future]
+                summary, symbol_matches, num_candles, elapsed = future.result()
+                if summary is None:
+                    logger.warning(
+                        f"Skipped {symbol}: {num_candles} candles are not enough for max_lag={self.max_lag}"
+                    )
+                    continue
+                summary.insert(2, "pattern", self._pattern_strings)
+                summaries[symbol] = summary
+                if symbol_matches is not None:
+                    matches[symbol] = symbol_matches
+                logger.info(
+                    f"Screened {symbol} ({len(summaries)}/{len(datasets)}) : {num_candles} candles, "
+                    f"{int((summary['match_count'] > 0).sum())}/{len(summary)} patterns matched "
+                    f"in {elapsed:.2f} s"
+                )
+
+        logger.info(
+            f"Screened {len(self.patterns)} patterns ({self.num_distinct} distinct) on "
+            f"{len(summaries)} symbols in {time.perf_counter() - run_start:.2f} s "
+            f"with {num_workers} workers"
+        )
+        summary = (
+            pd.concat([summaries[symbol] for symbol in sorted(summaries)], ignore_index=True)
+            if summaries
+            else pd.DataFrame()
+        )
+        return summary, dict(sorted(matches.items()))
+
+
+def screen_symbol(
+    settings: ScreenSettings, symbol: str, loaded: LoadedOHLC
+) -> tuple[pd.DataFrame, SymbolMatches]:
+    """
+    Matches and summarizes the distinct patterns of `settings` on the market data of one symbol.
+
+    Parameters :
+    -------
+        - `settings` : Distinct patterns and settings of a screener (see `PatternScreener.settings`)
+        - `symbol` : Name of the symbol
+        - `loaded` : Market data of the symbol (see `load_ohlc`)
+
+    Returns :
+    -------
+        - `summary` : Summary of `PatternScreener.screen` without the pattern strings
+        - `matches` : Candles every screened pattern is matched on
+    """
+    market_data = MarketData(
+        loaded.ohlc.astype(PRICE_DTYPES[settings.price_dtype], copy=False),
+        forward_log_returns(loaded.ohlc, settings.bullish_focus),
+        settings.bullish_focus,
+    )
+    num_candles = market_data.num_candles
+    num_patterns = len(settings.pattern_distinct)
+    condition_index = ConditionIndex(market_data.ohlc, settings.max_lag)
+    index_dtype = np.int32 if num_candles < 2**31 else np.int64
+
+    counts, indices, fitness = [], [], {name: [] for name in SUMMARY_FITNESS_TYPES}
+    for start in range(0, len(settings.population), settings.batch_size):
+        match_matrix = condition_index.population_match_matrix(
+            settings.population[start : start + settings.batch_size]
+        )
+        statistics = fitness_statistics(match_matrix, market_data.next_returns)
+        for name in SUMMARY_FITNESS_TYPES:
+            fitness[name].append(
+                fitness_from_statistics(name, statistics, settings.min_support)
+            )
+        counts.append(np.count_nonzero(match_matrix, axis=1))
+        # Row-major order lists the candles of every pattern in increasing order, flat
+        # positions are cheaper to find than (row, column) pairs
+        indices.append(
+            (np.flatnonzero(match_matrix) % num_candles).astype(index_dtype)
+        )
+
+    pattern_counts = np.concatenate(counts)
+    indices = np.concatenate(indices)
+    indptr = np.concatenate([[0], np.cumsum(pattern_counts)])
+    if len(settings.population) < num_patterns:
+        # Matches of every pattern are copied from its distinct pattern
+        distinct_indptr = indptr
+        pattern_counts = pattern_counts[settings.pattern_distinct]
+        indptr = np.concatenate([[0], np.cumsum(pattern_counts)])
+        offsets = np.repeat(
+            distinct_indptr[settings.pattern_distinct] - indptr[:-1], pattern_counts
+        )
+        indices = indices[np.arange(indptr[-1]) + offsets]
+    matches = SymbolMatches(symbol, loaded.dates, indptr, indices)
+
+    matched = pattern_counts > 0
+    last_candles = np.full(num_patterns, -1)
+    last_candles[matched] = indices[indptr[1:][matched] - 1]
+    last_match = np.full(num_patterns, np.datetime64("NaT"), dtype="datetime64[ns]")
+    last_match[matched] = loaded.dates[last_candles[matched]]
+    summary = pd.DataFrame(
+        {
+            "symbol": symbol,
+            "pattern_idx": np.arange(num_patterns),
+            "match_count": pattern_counts,
+            "support": pattern_counts / max(num_candles, 1),
+            **{
+                name: np.concatenate(values)[settings.pattern_distinct]
+                for name, values in fitness.items()
+            },
+            "last_match": last_match,
+            "matched_last_candle": last_candles == num_candles - 1,
+        }
+    )
+    return summary, matches
+
+
+def _init_worker(settings: ScreenSettings, log_level: int) -> None:
+    """
+    Initializes a worker process with the patterns, the logs of loading every dataset are left out.
+    """
+    global _worker_settings
+    _worker_settings = settings
+    logger.setLevel(log_level)
+
+
+def _screen_dataset(
+    symbol: str,
+    path: str | Path,
+    freq: str | None,
+    start: str | None,
+    end: str | None,
+    cache: ResampleCache | None,
+    output_dir: str | Path | None,
+) -> tuple[pd.DataFrame | None, SymbolMatches | None, int, float]:
+    """
+    Loads and screens the dataset of one symbol in a worker process.
+
+    Returns :
+    -------
+        - `summary` : Summary of the symbol, None if it has too few candles
+        - `matches` : Matches of the symbol, None if they are written to `output_dir`
+        - `num_candles` : Number of candles of the symbol
+        - `elapsed` : Time spent loading and screening in seconds
+    """
+    screen_start = time.perf_counter()
+    if cache is not None and freq is not None:
+        loaded = cache.load(path, freq, start, end)
+    else:
+        loaded = load_ohlc(path, start=start, end=end, freq=freq)
+
+    num_candles = loaded.ohlc.shape[1]
+    if num_candles <= _worker_settings.max_lag + 1:
+        return None, None, num_candles, time.perf_counter() - screen_start
+
+    summary, matches = screen_symbol(_worker_settings, symbol, loaded)
+    if output_dir is not None:
+        matches.save(Path(output_dir) / f"{symbol}_matches.npz")
+        matches = None
+    return summary, matches, num_candles, time.perf_counter() - screen_start
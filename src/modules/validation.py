@@ -0,0 +1,324 @@
+"""
+Module Name: validation.py
+Description: Walk-forward and k-fold validation of candlestick patterns. Match masks are
+calculated once over the whole series, fitness of every fold is combined from statistics of
+the segments between fold boundaries instead of evaluating the patterns again for each fold.
+Training ranges leave out the candles whose positions are exited after the range.
+
+Last Updated: 2024-09-01
+"""
+
+import hashlib
+from typing import NamedTuple
+
+import numpy as np
+
+from src.modules.fitness_functions import (
+    FitnessStatistics,
+    fitness_from_statistics,
+    segment_fitness_statistics,
+)
+
+
+class Fold(NamedTuple):
+    """
+    In-sample (train) and out-of-sample (test) candle ranges of a validation fold.
+
+    Attributes :
+    -------
+        - `train`: List of (first candle, end candle) ranges used for optimization, end is exclusive
+        - `test`: List of (first candle, end candle) ranges used for validation, end is exclusive
+    """
+
+    train: list[tuple[int, int]]
+    test: list[tuple[int, int]]
+
+
+def walk_forward_folds(
+    num_candles: int, num_folds: int, train_size: int | None = None
+) -> list[Fold]:
+    """
+    Splits the candles into walk-forward folds, each fold is tested on the block following its training window.
+
+    Parameters :
+    -------
+        - `num_candles` : Number of candles (rows) of the market data
+        - `num_folds` : Number of folds, the candles are split into `num_folds` + 1 blocks of equal size
+        - `train_size` : Number of candles of the (rolling) training window, None anchors every
+                         training window at the first candle (expanding window)
+
+    Returns :
+    -------
+        - `folds` : List of folds in chronological order
+
+    Example :
+    -------
+        - Example illustrates an anchored walk-forward split of 100 candles
+
+    .. code-block:: python
+        print(walk_forward_folds(100, num_folds=3))
+        ----------------------OUTPUT----------------------
+        [Fold(train=[(0, 25)], test=[(25, 50)]),
+        Fold(train=[(0, 50)], test=[(50, 75)]),
+        Fold(train=[(0, 75)], test=[(75, 100)])]
+    """
+    bounds = np.linspace(0, num_candles, num_folds + 2).astype(int).tolist()
+    folds = []
+    for fold in range(num_folds):
+        train_end = bounds[fold + 1]
+        train_start = 0 if train_size is None else max(train_end - train_size, 0)
+        folds.append(Fold([(train_start, train_end)], [(train_end, bounds[fold + 2])]))
+    return folds
+
+
+def k_fold_folds(num_candles: int, num_folds: int) -> list[Fold]:
+    """
+    Splits the candles into k contiguous blocks, each fold is tested on one block and trained on all others.
+
+    Parameters :
+    -------
+        - `num_candles` : Number of candles (rows) of the market data
+        - `num_folds` : Number of folds (k)
+
+    Returns :
+    -------
+        - `folds` : List of folds, the i-th fold is tested on the i-th block
+
+    Example :
+    -------
+        - Example illustrates a 3-fold split of 90 candles
+
+    .. code-block:: python
+        print(k_fold_folds(90, num_folds=3))
+        ----------------------OUTPUT----------------------
+        [Fold(train=[(30, 90)], test=[(0, 30)]),
+        Fold(train=[(0, 30), (60, 90)], test=[(30, 60)]),
+        Fold(train=[(0, 60)], test=[(60, 90)])]
+    """
+    bounds = np.linspace(0, num_candles, num_folds + 1).astype(int).tolist()
+    folds = []
+    for fold in range(num_folds):
+        train = [
+            (start, end)
+            for start, end in ((0, bounds[fold]), (bounds[fold + 1], num_candles))
+            if end > start
+        ]
+        folds.append(Fold(train, [(bounds[fold], bounds[fold + 1])]))
+    return folds
+
+
+def validation_folds(
+    method: str, num_candles: int, num_folds: int, train_size: int | None = None
+) -> list[Fold]:
+    """
+    Creates validation folds by the name of the validation method.
+
+    Parameters :
+    -------
+        - `method` : Name of the validation method ("walk_forward" or "k_fold")
+        - `num_candles` : Number of candles (rows) of the market data
+        - `num_folds` : Number of folds
+        - `train_size` : Number of candles of the rolling training window (walk-forward only)
+
+    Returns :
+    -------
+        - `folds` : List of validation folds
+    """
+    if method == "walk_forward":
+        return walk_forward_folds(num_candles, num_folds, train_size)
+    elif method == "k_fold":
+        return k_fold_folds(num_candles, num_folds)
+    else:
+        raise ValueError("Invalid validation method")
+
+
+class FoldEvaluator:
+    """
+    Calculates in-sample and out-of-sample fitness of patterns for every fold from a single pass over the candles.
+
+    Attributes :
+    -------
+        - `folds`: List of validation folds
+        - `num_candles`: Number of candles (rows) of the market data
+        - `exit_horizons`: Numbers of candles a position is held, in the order of the rows of the log returns
+        - `segment_starts`: First candles of the segments between all fold boundaries
+        - `groups`: Membership of the segments in the training ranges and then the test ranges of every fold,
+                    of shape (number of segments, 2 * number of folds), with a leading horizon axis for several exit horizons
+        - `fingerprint`: Short name identifying the folds (e.g. in fitness cache files)
+
+    Methods :
+    -------
+        - `fold_statistics(match_matrix, next_returns)`: In-sample and out-of-sample statistics per fold
+        - `fold_fitness(fitness_type, match_matrix, next_returns, min_support)`: Fitness per fold
+        - `split_groups(statistics)`: In-sample and out-of-sample statistics from statistics of the `groups`
+        - `group_fold_fitness(fitness_type, statistics, min_support)`: Fitness per fold from statistics of the `groups`
+
+    Example :
+    -------
+        - Example illustrates walk-forward validation of a population
+
+    .. code-block:: python
+        evaluator = FoldEvaluator(walk_forward_folds(len(df), num_folds=4), len(df))
+        match_matrix = condition_index.population_match_matrix(population)
+        in_sample, out_of_sample = evaluator.fold_fitness("martin_ratio", match_matrix, next_returns)
+        print(in_sample.shape)  # (number of patterns, number of folds)
+
+    Note :
+    -------
+        - The last `horizon` candles of a training range are left out, unless the range ends with the
+          series, since their positions are exited on candles that follow the range
+        - The log return of a pattern matched on the last candle is the average over the training
+          (or test) ranges of the fold holding it, so no fold uses log returns of candles outside its ranges
+        - The minimal support applies to the number of candles of each fold
+    """
+
+    def __init__(
+        self, folds: list[Fold], num_candles: int, exit_horizons: tuple[int, ...] = (1,)
+    ):
+        self.folds = folds
+        self.num_candles = num_candles
+        self.exit_horizons = tuple(exit_horizons)
+
+        bounds = {0}
+        for fold in folds:
+            for start, end in fold.train + fold.test:
+                bounds.update((start, end))
+            for start, end in fold.train:
+                bounds.update(self._purged_end(start, end, horizon) for horizon in self.exit_horizons)
+        self.segment_starts = np.array(sorted(b for b in bounds if b < num_candles))
+
+        # Membership of segments in the training and test ranges of each fold, for every exit horizon
+        self.groups = np.stack(
+            [
+                np.concatenate(
+                    [
+                        self._membership([fold.train for fold in folds], horizon),
+                        self._membership([fold.test for fold in folds]),
+                    ],
+                    axis=1,
+                )
+                for horizon in self.exit_horizons
+            ]
+        )
+        if len(self.exit_horizons) == 1:
+            self.groups = self.groups[0]
+
+    @property
+    def fingerprint(self) -> str:
+        digest = hashlib.sha256(repr(self.folds).encode()).hexdigest()
+        return f"folds{len(self.folds)}-{digest[:8]}"
+
+    def _purged_end(self, start: int, end: int, horizon: int) -> int:
+        """
+        Returns the end of a training range without the candles whose positions are exited after it.
+        """
+        return end if end >= self.num_candles else max(end - horizon, start)
+
+    def _membership(
+        self, fold_ranges: list[list[tuple[int, int]]], horizon: int | None = None
+    ) -> np.ndarray:
+        membership = np.zeros((len(self.segment_starts), len(fold_ranges)))
+        for fold, ranges in enumerate(fold_ranges):
+            for start, end in ranges:
+                if horizon is not None:
+                    end = self._purged_end(start, end, horizon)
+                membership[(self.segment_starts >= start) & (self.segment_starts < end), fold] = 1
+        return membership
+
+    def fold_statistics(
+        self, match_matrix: np.ndarray, next_returns: np.ndarray
+    ) -> tuple[FitnessStatistics, FitnessStatistics]:
+        """
+        Calculates sufficient statistics of patterns for the training and test ranges of every fold.
+
+        Parameters :
+        -------
+            - `match_matrix` : 2-D boolean array (population x candles), True where the pattern is matched
+            - `next_returns` : Output of `forward_log_returns` (or `horizon_log_returns`) of the `exit_horizons`
+                               for the same market data
+
+        Returns :
+        -------
+            - `in_sample` : Statistics of shape (number of patterns, number of folds) of the training ranges
+            - `out_of_sample` : Statistics of shape (number of patterns, number of folds) of the test ranges
+        """
+        return self.split_groups(
+            segment_fitness_statistics(
+                match_matrix, next_returns, self.segment_starts, self.groups
+            )
+        )
+
+    def split_groups(
+        self, statistics: FitnessStatistics
+    ) -> tuple[FitnessStatistics, FitnessStatistics]:
+        """
+        Splits statistics of the `groups` into statistics of the training and test ranges of every fold.
+
+        Parameters :
+        -------
+            - `statistics` : Statistics of the `groups` of segments starting at `segment_starts` (see `segment_fitness_statistics`)
+
+        Returns :
+        -------
+            - `in_sample` : Statistics of shape (number of patterns, number of folds) of the training ranges
+            - `out_of_sample` : Statistics of shape (number of patterns, number of folds) of the test ranges
+        """
+        num_folds = len(self.folds)
+        return (
+            FitnessStatistics(*(field[..., :num_folds] for field in statistics)),
+            FitnessStatistics(*(field[..., num_folds:] for field in statistics)),
+        )
+
+    def fold_fitness(
+        self,
+        fitness_type: str,
+        match_matrix: np.ndarray,
+        next_returns: np.ndarray,
+        min_support: float = 0.025,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculates in-sample and out-of-sample fitness of patterns for every fold.
+
+        Parameters :
+        -------
+            - `fitness_type` : Name of the fitness function ("total_return", "profit_factor" or "martin_ratio")
+            - `match_matrix` : 2-D boolean array (population x candles), True where the pattern is matched
+            - `next_returns` : Output of `forward_log_returns` (or `horizon_log_returns`) of the `exit_horizons`
+                               for the same market data
+            - `min_support` : Minimal share of candles of a fold the pattern needs to be matched on
+
+        Returns :
+        -------
+            - `in_sample` : Fitness of shape (number of patterns, number of folds) on the training ranges
+            - `out_of_sample` : Fitness of shape (number of patterns, number of folds) on the test ranges
+        """
+        return tuple(
+            fitness_from_statistics(fitness_type, statistics, min_support)
+            for statistics in self.fold_statistics(match_matrix, next_returns)
+        )
+
+    def group_fold_fitness(
+        self,
+        fitness_type: str,
+        statistics: FitnessStatistics,
+        min_support: float = 0.025,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculates in-sample and out-of-sample fitness of patterns for every fold from statistics of the `groups`.
+
+        Parameters :
+        -------
+            - `fitness_type` : Name of the fitness function ("total_return", "profit_factor" or "martin_ratio")
+            - `statistics` : Statistics of the `groups` of segments starting at `segment_starts`
+                             (e.g. accumulated by `ChunkedEvaluator`)
+            - `min_support` : Minimal share of candles of a fold the pattern needs to be matched on
+
+        Returns :
+        -------
+            - `in_sample` : Fitness of shape (number of patterns, number of folds) on the training ranges
+            - `out_of_sample` : Fitness of shape (number of patterns, number of folds) on the test ranges
+        """
+        return tuple(
+            fitness_from_statistics(fitness_type, fold_statistics, min_support)
+            for fold_statistics in self.split_groups(statistics)
+        )
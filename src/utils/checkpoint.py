@@ -0,0 +1,234 @@
+"""
+Module Name: checkpoint.py
+Description: Checkpoints of genetic algorithm runs. A checkpoint holds everything a run needs to
+continue identically (population, fitness values, generation counter, random number generator
+states and fitness cache) and is written atomically to a compact binary (.npz) file by a
+background thread, so the generation loop does not wait for the disk.
+
+Last Updated: 2024-09-01
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from src.utils.logger import logger
+
+
+class Checkpoint(NamedTuple):
+    """
+    State of a genetic algorithm run after a completed generation.
+
+    Attributes :
+    -------
+        - `setup`: Settings the run depends on (see `GeneticAlgorithm.checkpoint_setup`), a checkpoint
+                   is only resumed with the same settings
+        - `generations_completed`: Number of completed generations
+        - `population`: 2-D array of chromosomes (candlestick patterns) of the last generation
+        - `fitness`: Fitness values of the population
+        - `best_solutions_fitness`: Best fitness value of every generation so far
+        - `python_random_state`: State of the `random` module (`random.getstate()`)
+        - `numpy_random_state`: State of the NumPy legacy random generator (`np.random.get_state()`)
+        - `cache_keys`: 2-D uint8 array, one fitness cache key per row in least recently used order
+        - `cache_values`: Fitness values of the cache keys
+        - `cache_counters`: Hits and misses of the fitness cache
+    """
+
+    setup: dict
+    generations_completed: int
+    population: np.ndarray
+    fitness: np.ndarray
+    best_solutions_fitness: np.ndarray
+    python_random_state: tuple
+    numpy_random_state: tuple
+    cache_keys: np.ndarray
+    cache_values: np.ndarray
+    cache_counters: tuple[int, int]
+
+    @property
+    def elite(self) -> tuple[np.ndarray, float]:
+        """
+        Best chromosome of the population and its fitness value.
+        """
+        best = int(np.argmax(self.fitness))
+        return self.population[best], float(self.fitness[best])
+
+    def restore_random_states(self) -> None:
+        """
+        Restores the states of the `random` module and of the NumPy legacy random generator.
+        """
+        random.setstate(self.python_random_state)
+        np.random.set_state(self.numpy_random_state)
+
+
+def save_checkpoint(path: str | Path, checkpoint: Checkpoint) -> None:
+    """
+    Writes a checkpoint atomically, a crash while writing leaves the previous checkpoint intact.
+
+    Parameters :
+    -------
+        - `path` : Checkpoint file (.npz)
+        - `checkpoint` : Checkpoint to write
+
+    Note :
+    -------
+        - The checkpoint is written to a temporary file next to `path`, flushed to disk and renamed
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    python_version, python_keys, python_gauss = checkpoint.python_random_state
+    numpy_name, numpy_keys, numpy_pos, numpy_has_gauss, numpy_gauss = (
+        checkpoint.numpy_random_state
+    )
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with temporary_path.open("wb") as file:
+        np.savez_compressed(
+            file,
+            setup=np.array(json.dumps(checkpoint.setup, sort_keys=True)),
+            generations_completed=np.array(checkpoint.generations_completed),
+            population=checkpoint.population,
+            fitness=np.asarray(checkpoint.fitness, dtype=np.float64),
+            best_solutions_fitness=np.asarray(
+                checkpoint.best_solutions_fitness, dtype=np.float64
+            ),
+            python_random_version=np.array(python_version),
+            python_random_keys=np.array(python_keys, dtype=np.uint32),
+            python_random_gauss=np.array(np.nan if python_gauss is None else python_gauss),
+            numpy_random_name=np.array(numpy_name),
+            numpy_random_keys=numpy_keys,
+            numpy_random_pos=np.array([numpy_pos, numpy_has_gauss]),
+            numpy_random_gauss=np.array(numpy_gauss),
+            cache_keys=checkpoint.cache_keys,
+            cache_values=checkpoint.cache_values,
+            cache_counters=np.array(checkpoint.cache_counters, dtype=np.int64),
+        )
+        file.flush()
+        os.fsync(file.fileno())
+    temporary_path.replace(path)
+
+
+def load_checkpoint(path: str | Path) -> Checkpoint:
+    """
+    Reads a checkpoint written by `save_checkpoint`.
+
+    Parameters :
+    -------
+        - `path` : Checkpoint file (.npz)
+
+    Returns :
+    -------
+        - `Checkpoint` : Checkpoint of the file
+    """
+    with np.load(path, allow_pickle=False) as data:
+        python_gauss = float(data["python_random_gauss"])
+        return Checkpoint(
+            setup=json.loads(str(data["setup"])),
+            generations_completed=int(data["generations_completed"]),
+            population=data["population"],
+            fitness=data["fitness"],
+            best_solutions_fitness=data["best_solutions_fitness"],
+            python_random_state=(
+                int(data["python_random_version"]),
+                tuple(int(key) for key in data["python_random_keys"]),
+                None if np.isnan(python_gauss) else python_gauss,
+            ),
+            numpy_random_state=(
+                str(data["numpy_random_name"]),
+                data["numpy_random_keys"],
+                int(data["numpy_random_pos"][0]),
+                int(data["numpy_random_pos"][1]),
+                float(data["numpy_random_gauss"]),
+            ),
+            cache_keys=data["cache_keys"],
+            cache_values=data["cache_values"],
+            cache_counters=tuple(int(count) for count in data["cache_counters"]),
+        )
+
+
+class CheckpointWriter:
+    """
+    Writes checkpoints in a background thread, so the generation loop never waits for the disk.
+
+    Attributes :
+    -------
+        - `path`: Checkpoint file (.npz), overwritten by every checkpoint
+        - `num_written`: Number of checkpoints written so far
+        - `num_superseded`: Number of checkpoints skipped because a newer one was submitted before they were written
+        - `write_time`: Seconds spent writing checkpoints (in the background thread)
+
+    Methods :
+    -------
+        - `submit(checkpoint)`: Queues a checkpoint and returns immediately
+        - `close()`: Writes the last queued checkpoint and stops the background thread
+
+    Example :
+    -------
+        - Example illustrates checkpoints of a run every 10 generations
+
+    .. code-block:: python
+        writer = CheckpointWriter("checkpoints/run.npz")
+        writer.submit(checkpoint)  # Returns immediately
+        writer.close()  # Waits until the last checkpoint is on disk
+
+    Note :
+    -------
+        - Only the latest checkpoint is kept in the queue, if the disk is slower than the generations
+          a checkpoint replaces the one still waiting instead of blocking the generation loop
+        - Write errors are logged and do not stop the run, the previous checkpoint stays intact
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.num_written = 0
+        self.num_superseded = 0
+        self.write_time = 0.0
+        self._pending = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="checkpoint-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, checkpoint: Checkpoint) -> None:
+        """
+        Queues a checkpoint for writing, the arrays of `checkpoint` must not be modified afterwards.
+        """
+        with self._condition:
+            if self._pending is not None:
+                self.num_superseded += 1
+            self._pending = checkpoint
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                checkpoint, self._pending = self._pending, None
+
+            start = time.perf_counter()
+            try:
+                save_checkpoint(self.path, checkpoint)
+            except OSError as error:
+                logger.error(f"Writing checkpoint to {self.path} failed: {error}")
+                continue
+            self.write_time += time.perf_counter() - start
+            self.num_written += 1
+
+    def close(self) -> None:
+        """
+        Writes the last queued checkpoint and stops the background thread.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
@@ -0,0 +1,528 @@
+"""
+Module Name: data_loader.py
+Description: Loads OHLC market data from parquet files or directories of partitioned parquet
+files. Only the date and price columns are read, row groups outside the requested date range
+are skipped using their statistics and the result is returned as contiguous NumPy arrays.
+Market data larger than memory is streamed in fixed-size chunks by `ChunkedOHLC`.
+
+Last Updated: 2024-09-01
+"""
+
+import hashlib
+import time
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from src.utils.logger import logger
+
+# Source column names of the date and the prices in the pattern encoding order (Open, Close, High, Low)
+DEFAULT_COLUMNS = {
+    "date": "date",
+    "open": "open",
+    "close": "close",
+    "high": "high",
+    "low": "low",
+}
+
+
+class LoadedOHLC(NamedTuple):
+    """
+    Market data loaded by `load_ohlc`.
+
+    Attributes :
+    -------
+        - `dates`: Array of candle timestamps (datetime64[ns])
+        - `ohlc`: C-contiguous array of shape (4, n), rows ordered as in the pattern encoding
+                  (0: Open, 1: Close, 2: High, 3: Low), same layout as `ohlc_to_array`
+        - `rows_read`: Number of rows read from the parquet files
+        - `bytes_read`: Compressed size of the column chunks read from the parquet files
+        - `load_time`: Time spent loading (and resampling) in seconds
+    """
+
+    dates: np.ndarray
+    ohlc: np.ndarray
+    rows_read: int
+    bytes_read: int
+    load_time: float
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the market data as a DataFrame with "Date", "Open", "High", "Low", "Close" columns.
+        """
+        return pd.DataFrame(
+            {
+                "Date": self.dates,
+                "Open": self.ohlc[0],
+                "High": self.ohlc[2],
+                "Low": self.ohlc[3],
+                "Close": self.ohlc[1],
+            }
+        )
+
+
+def _date_bound(value: str | pd.Timestamp, field_type: pa.DataType) -> pa.Scalar:
+    """
+    Converts a date range bound into a scalar comparable with the date column of the dataset.
+    """
+    timestamp = pd.Timestamp(value)
+    if pa.types.is_timestamp(field_type):
+        if field_type.tz is not None and timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize(field_type.tz)
+        return pa.scalar(timestamp, type=field_type)
+    if pa.types.is_date(field_type):
+        return pa.scalar(timestamp.date(), type=field_type)
+    # ISO formatted strings are compared lexicographically
+    return pa.scalar(timestamp.isoformat(sep=" "), type=field_type)
+
+
+def _open_dataset(
+    path: str | Path,
+    start: str | pd.Timestamp | None,
+    end: str | pd.Timestamp | None,
+    columns: dict[str, str] | None,
+) -> tuple[ds.Dataset, ds.Expression | None, list[str]]:
+    """
+    Opens a parquet dataset and builds the filter of the date range.
+
+    Returns :
+    -------
+        - `dataset` : Parquet dataset (hive partitioning is supported)
+        - `date_filter` : Filter of the date range, None if the range is unbounded
+        - `projected` : Source column names of the date and the prices (Open, Close, High, Low)
+    """
+    columns = DEFAULT_COLUMNS if columns is None else columns
+    date_column = columns["date"]
+    projected = [columns[name] for name in ("date", "open", "close", "high", "low")]
+
+    dataset = ds.dataset(str(path), format="parquet", partitioning="hive")
+    date_type = dataset.schema.field(date_column).type
+    date_filter = None
+    if start is not None:
+        date_filter = ds.field(date_column) >= _date_bound(start, date_type)
+    if end is not None:
+        end_filter = ds.field(date_column) < _date_bound(end, date_type)
+        date_filter = end_filter if date_filter is None else date_filter & end_filter
+    return dataset, date_filter, projected
+
+
+def _table_to_arrays(
+    table: pa.Table | pa.RecordBatch, projected: list[str], date_type: pa.DataType
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Converts the projected columns of a table into an array of timestamps and an OHLC array of shape (4, n).
+    """
+    date_values = table.column(projected[0])
+    if pa.types.is_timestamp(date_type) or pa.types.is_date(date_type):
+        dates = date_values.to_numpy().astype("datetime64[ns]")
+    else:
+        dates = pd.to_datetime(pc.cast(date_values, pa.string()).to_numpy()).to_numpy()
+
+    ohlc = np.empty((4, table.num_rows))
+    for row, name in enumerate(projected[1:]):
+        ohlc[row] = table.column(name).to_numpy()
+    return dates, ohlc
+
+
+def resample_ohlc(
+    dates: np.ndarray, ohlc: np.ndarray, freq: str
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Resamples OHLC arrays to a lower fixed frequency, same as resampling with pandas.
+
+    Parameters :
+    -------
+        - `dates` : Array of candle timestamps in chronological order
+        - `ohlc` : Array of shape (4, n) in the pattern encoding order (Open, Close, High, Low)
+        - `freq` : Fixed frequency of the resampled candles (e.g. "h", "15min")
+
+    Returns :
+    -------
+        - `dates` : Timestamps of the resampled candles (datetime64[ns])
+        - `ohlc` : Resampled array of shape (4, number of resampled candles). Open is the first,
+                   Close the last, High the maximum and Low the minimum price of each period
+
+    Note :
+    -------
+        - Periods start at midnight of the first day (pandas `origin="start_day"`), periods
+          without candles are NaN, as with `DataFrame.resample(freq).agg(...)`
+        - Missing (NaN) prices are skipped like pandas `first`, `last`, `max` and `min` do, a price
+          is NaN only if it is missing in every candle of the period
+    """
+    timestamps = np.asarray(dates, dtype="datetime64[ns]").view(np.int64)
+    if len(timestamps) == 0:
+        return np.asarray(dates, dtype="datetime64[ns]"), np.empty((4, 0))
+
+    try:
+        step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq)).value
+    except ValueError as exc:
+        raise ValueError(f"Only fixed frequencies can be resampled, got '{freq}'") from exc
+
+    origin = pd.Timestamp(timestamps[0]).normalize().value
+    periods = (timestamps - origin) // step
+    periods -= periods[0]
+
+    starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+
+    resampled = np.full((4, periods[-1] + 1), np.nan)
+    slots = periods[starts]
+    # First and last candle of each period with a price, index -1 (a NaN price) if there is none
+    candles = np.arange(len(periods))
+    padded = np.append(ohlc[:2], np.full((2, 1), np.nan), axis=1)
+    first = np.minimum.reduceat(
+        np.where(np.isnan(ohlc[0]), len(periods), candles), starts
+    )
+    last = np.maximum.reduceat(np.where(np.isnan(ohlc[1]), -1, candles), starts)
+    resampled[0, slots] = padded[0, np.where(first == len(periods), -1, first)]
+    resampled[1, slots] = padded[1, last]
+    resampled[2, slots] = np.fmax.reduceat(ohlc[2], starts)
+    resampled[3, slots] = np.fmin.reduceat(ohlc[3], starts)
+
+    first_period = pd.Timestamp(origin) + pd.Timedelta(
+        (timestamps[0] - origin) // step * step
+    )
+    resampled_dates = (
+        first_period.to_datetime64().astype("datetime64[ns]")
+        + np.arange(resampled.shape[1]) * np.timedelta64(step, "ns")
+    )
+    return resampled_dates, resampled
+
+
+def load_ohlc(
+    path: str | Path,
+    start: str | pd.Timestamp | None = None,
+    end: str | pd.Timestamp | None = None,
+    freq: str | None = None,
+    columns: dict[str, str] | None = None,
+) -> LoadedOHLC:
+    """
+    Loads OHLC market data from a parquet file or a directory of (partitioned) parquet files.
+
+    Parameters :
+    -------
+        - `path` : Parquet file or directory of parquet files (hive partitioning is supported)
+        - `start` : First date to load (inclusive), None loads from the beginning
+        - `end` : Last date to load (exclusive), None loads to the end
+        - `freq` : Fixed frequency to resample to (e.g. "h"), None keeps the original candles
+        - `columns` : Source column names of "date", "open", "close", "high" and "low",
+                      defaults to the lowercase names
+
+    Returns :
+    -------
+        - `LoadedOHLC` : Dates, OHLC array and load statistics
+
+    Example :
+    -------
+        - Example illustrates loading of hourly candles of the first quarter from minute data
+
+    .. code-block:: python
+        data = load_ohlc("data/BTC", start="2018-01-01", end="2018-04-01", freq="h")
+        print(data.ohlc.shape, data.rows_read, data.bytes_read)
+        ----------------------OUTPUT----------------------
+        (4, 2160) 129600 3145728
+
+    Note :
+    -------
+        - Row groups whose statistics lie outside the date range are not read at all,
+          `bytes_read` counts compressed column chunks of the projected columns only
+    """
+    start_time = time.perf_counter()
+    dataset, date_filter, projected = _open_dataset(path, start, end, columns)
+    date_column = projected[0]
+    date_type = dataset.schema.field(date_column).type
+
+    tables = []
+    bytes_read = 0
+    for fragment in dataset.get_fragments(filter=date_filter):
+        for row_group in fragment.split_by_row_group(date_filter):
+            metadata = row_group.metadata
+            for group in row_group.row_groups:
+                group_metadata = metadata.row_group(group.id)
+                for column_idx in range(group_metadata.num_columns):
+                    column = group_metadata.column(column_idx)
+                    if column.path_in_schema in projected:
+                        bytes_read += column.total_compressed_size
+            tables.append(row_group.to_table(columns=projected, filter=date_filter))
+
+    if tables:
+        table = pa.concat_tables(tables)
+    else:
+        table = dataset.schema.empty_table().select(projected)
+
+    dates, ohlc = _table_to_arrays(table, projected, date_type)
+
+    # Fragments of partitioned datasets are not necessarily read in chronological order
+    if np.any(dates[1:] < dates[:-1]):
+        order = np.argsort(dates, kind="stable")
+        dates = dates[order]
+        ohlc = ohlc[:, order]
+
+    rows_read = table.num_rows
+    if freq is not None:
+        dates, ohlc = resample_ohlc(dates, ohlc, freq)
+
+    loaded = LoadedOHLC(
+        dates=dates,
+        ohlc=np.ascontiguousarray(ohlc),
+        rows_read=rows_read,
+        bytes_read=bytes_read,
+        load_time=time.perf_counter() - start_time,
+    )
+    logger.info(
+        f"Loaded {loaded.rows_read} rows ({loaded.bytes_read / 2**20:.2f} MB) "
+        f"from {path} in {loaded.load_time:.2f} s"
+    )
+    return loaded
+
+
+class OHLCChunk(NamedTuple):
+    """
+    Chunk of market data yielded by `ChunkedOHLC.chunks`.
+
+    Attributes :
+    -------
+        - `ohlc`: Array of shape (4, `lookback` + `num_candles` (+ 1)), the chunk candles preceded by
+                  `lookback` candles and followed by the next candle (unless the chunk ends the series)
+        - `first_candle`: Index of the first chunk candle in the whole series
+        - `lookback`: Number of candles preceding the chunk candles, `max_lag` except for the first chunks
+        - `num_candles`: Number of chunk candles
+    """
+
+    ohlc: np.ndarray
+    first_candle: int
+    lookback: int
+    num_candles: int
+
+
+class ChunkedOHLC:
+    """
+    OHLC market data read in fixed-size chunks, so memory is bounded by the chunk size instead of the data size.
+
+    Attributes :
+    -------
+        - `source`: Parquet file or directory of parquet files, a .npy file holding an array of
+                    shape (4, n) (e.g. an entry of the resample cache) or an array of shape (4, n)
+        - `chunk_size`: Number of candles per chunk
+        - `start`: First date to read (inclusive), parquet sources only
+        - `end`: Last date to read (exclusive), parquet sources only
+        - `columns`: Source column names, see `load_ohlc`
+
+    Methods :
+    -------
+        - `num_candles`: Number of candles of the whole series
+        - `chunks(max_lag)`: Chunks of consecutive candles overlapping by `max_lag` candles
+        - `fingerprint()`: Content hash of the market data, calculated chunk by chunk
+
+    Example :
+    -------
+        - Example illustrates streaming of minute candles in chunks of one million candles
+
+    .. code-block:: python
+        data = ChunkedOHLC("data/BTC", chunk_size=1_000_000, start="2018-01-01")
+        for chunk in data.chunks(max_lag=3):
+            print(chunk.first_candle, chunk.num_candles, chunk.ohlc.shape)
+
+    Note :
+    -------
+        - Parquet fragments are read in the order of their first date and have to be in chronological
+          order without overlaps, unlike `load_ohlc` the candles are not sorted
+        - Resampling is not supported while streaming, resampled data can be streamed from a .npy file
+    """
+
+    def __init__(
+        self,
+        source: str | Path | np.ndarray,
+        chunk_size: int = 1_000_000,
+        start: str | pd.Timestamp | None = None,
+        end: str | pd.Timestamp | None = None,
+        columns: dict[str, str] | None = None,
+    ):
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be positive")
+        self.source = source
+        self.chunk_size = chunk_size
+        self.start = start
+        self.end = end
+        self.columns = columns
+        self._num_candles = None
+
+        if not self._is_parquet and (start is not None or end is not None):
+            raise ValueError("Date ranges are only supported for parquet sources")
+
+    @property
+    def _is_parquet(self) -> bool:
+        return not isinstance(self.source, np.ndarray) and Path(self.source).suffix != ".npy"
+
+    def _npy_header(self) -> tuple[tuple[int, ...], bool, np.dtype, int]:
+        """
+        Reads the header of a .npy source, returns its shape, memory order, dtype and data offset.
+        """
+        with open(self.source, "rb") as file:
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+            offset = file.tell()
+        if len(shape) != 2 or shape[0] != 4:
+            raise ValueError(f"Expected an array of shape (4, n) in {self.source}, got {shape}")
+        return shape, fortran_order, dtype, offset
+
+    @property
+    def num_candles(self) -> int:
+        """
+        Number of candles of the whole series, parquet sources are counted from their metadata.
+        """
+        if self._num_candles is None:
+            if isinstance(self.source, np.ndarray):
+                self._num_candles = self.source.shape[1]
+            elif self._is_parquet:
+                dataset, date_filter, _ = _open_dataset(
+                    self.source, self.start, self.end, self.columns
+                )
+                self._num_candles = dataset.count_rows(filter=date_filter)
+            else:
+                self._num_candles = self._npy_header()[0][1]
+        return self._num_candles
+
+    def _blocks(self) -> Iterator[np.ndarray]:
+        """
+        Yields consecutive blocks of at most `chunk_size` candles as arrays of shape (4, m).
+        """
+        if isinstance(self.source, np.ndarray):
+            for first in range(0, self.source.shape[1], self.chunk_size):
+                yield np.asarray(
+                    self.source[:, first : first + self.chunk_size], dtype=np.float64
+                )
+            return
+
+        if not self._is_parquet:
+            # Blocks are read with plain file reads, unlike a memory map the pages read are not kept mapped
+            (_, num_candles), fortran_order, dtype, offset = self._npy_header()
+            with open(self.source, "rb") as file:
+                for first in range(0, num_candles, self.chunk_size):
+                    count = min(self.chunk_size, num_candles - first)
+                    if fortran_order:
+                        file.seek(offset + first * 4 * dtype.itemsize)
+                        block = np.fromfile(file, dtype, count=4 * count).reshape(count, 4).T
+                    else:
+                        block = np.empty((4, count), dtype)
+                        for row in range(4):
+                            file.seek(offset + (row * num_candles + first) * dtype.itemsize)
+                            block[row] = np.fromfile(file, dtype, count=count)
+                    yield block.astype(np.float64, copy=False)
+            return
+
+        dataset, date_filter, projected = _open_dataset(
+            self.source, self.start, self.end, self.columns
+        )
+        date_type = dataset.schema.field(projected[0]).type
+        last_date = None
+        for fragment in self._ordered_fragments(dataset, date_filter, projected[0]):
+            for batch in fragment.to_batches(
+                columns=projected, filter=date_filter, batch_size=self.chunk_size
+            ):
+                if batch.num_rows == 0:
+                    continue
+                dates, ohlc = _table_to_arrays(batch, projected, date_type)
+                if np.any(dates[1:] < dates[:-1]) or (
+                    last_date is not None and dates[0] < last_date
+                ):
+                    raise ValueError(
+                        f"Market data of {self.source} is not in chronological order, "
+                        "it cannot be read in chunks"
+                    )
+                last_date = dates[-1]
+                yield ohlc
+
+    @staticmethod
+    def _ordered_fragments(
+        dataset: ds.Dataset, date_filter: ds.Expression | None, date_column: str
+    ) -> list[ds.Fragment]:
+        """
+        Returns the fragments of a dataset ordered by the first date of their row group statistics.
+        """
+        fragments = list(dataset.get_fragments(filter=date_filter))
+
+        def first_date(fragment: ds.Fragment):
+            minimums = [
+                row_group.statistics.get(date_column, {}).get("min")
+                for row_group in fragment.row_groups
+            ]
+            minimums = [value for value in minimums if value is not None]
+            return (0, min(minimums), fragment.path) if minimums else (1, None, fragment.path)
+
+        try:
+            return sorted(fragments, key=first_date)
+        except TypeError:
+            return sorted(fragments, key=lambda fragment: fragment.path)
+
+    def chunks(self, max_lag: int) -> Iterator[OHLCChunk]:
+        """
+        Yields chunks of `chunk_size` consecutive candles (the last one may be shorter).
+
+        Parameters :
+        -------
+            - `max_lag` : Number of candles preceding every chunk (except the first ones), so
+                          patterns are matched on the chunk candles as on the whole series
+
+        Returns :
+        -------
+            - `Iterator[OHLCChunk]` : Chunks in chronological order, together they cover every candle exactly once
+
+        Note :
+        -------
+            - At most the preceding `max_lag` candles, one chunk and one block read from the source are held in memory
+        """
+        buffer = np.empty((4, 0))
+        buffer_start = 0  # Index of the first buffered candle in the whole series
+        first_candle = 0  # Index of the first candle not yielded yet
+
+        def chunk(end: int) -> OHLCChunk:
+            lookback = min(max_lag, first_candle)
+            window = buffer[
+                :, first_candle - lookback - buffer_start : end + 1 - buffer_start
+            ]
+            return OHLCChunk(window, first_candle, lookback, end - first_candle)
+
+        blocks = [buffer]
+        buffer_end = 0
+        for block in self._blocks():
+            blocks.append(block)
+            buffer_end += block.shape[1]
+            # A chunk is complete once the candle following it is read
+            if buffer_end <= first_candle + self.chunk_size:
+                continue
+
+            buffer = np.concatenate(blocks, axis=1)
+            while buffer_end > first_candle + self.chunk_size:
+                yield chunk(first_candle + self.chunk_size)
+                first_candle += self.chunk_size
+                dropped = max(first_candle - max_lag - buffer_start, 0)
+                buffer = buffer[:, dropped:]
+                buffer_start += dropped
+            blocks = [buffer]
+
+        buffer = np.concatenate(blocks, axis=1)
+        if buffer_end > first_candle:
+            yield chunk(buffer_end)
+
+    def fingerprint(self) -> str:
+        """
+        Returns the SHA-256 hash of the market data, calculated chunk by chunk.
+
+        Note :
+        -------
+            - The hash is calculated over the candles in chronological order, it differs from the
+              hash of the same data held in memory (see `FitnessCache.file_path`)
+        """
+        digest = hashlib.sha256()
+        for chunk in self.chunks(max_lag=0):
+            candles = chunk.ohlc[:, : chunk.num_candles]
+            digest.update(np.ascontiguousarray(candles.T).tobytes())
+        return digest.hexdigest()
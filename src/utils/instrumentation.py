@@ -0,0 +1,345 @@
+"""
+Module Name: instrumentation.py
+Description: Records wall time, call counts and peak memory of the Genetic Algorithm stages
+(fitness evaluation, selection, crossover, mutation, logging) per generation. Metrics are exported
+as JSON lines and as a Prometheus text format file, which can be read by a local scraper
+(e.g. the textfile collector of the node exporter).
+
+Last Updated: 2024-09-01
+"""
+
+import inspect
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable, Iterator
+
+_DISABLED_STAGE = nullcontext()
+
+
+class Instrumentation:
+    """
+    Collects per-generation metrics of the Genetic Algorithm stages.
+
+    Attributes :
+    -------
+        - `enabled`: Boolean indicating whether metrics are recorded, a disabled instance returns
+                     wrapped functions unchanged and adds no overhead
+        - `track_memory`: Boolean indicating whether peak memory of the stages is traced with `tracemalloc`
+        - `jsonl_path`: JSON lines file receiving one record per generation
+        - `prometheus_path`: Prometheus text format file rewritten after every generation
+        - `labels`: Labels added to every Prometheus sample (e.g. {"island": "0"})
+        - `totals`: Metrics of every stage summed over all generations
+
+    Methods :
+    -------
+        - `timed(stage, func)`: Wraps a callback (fitness, selection, crossover, mutation) to record its metrics
+        - `stage(name)`: Context manager recording metrics of a code block
+        - `on_generation(func)`: Wraps the `on_generation` callback, recorded as "logging" stage, and closes the generation
+        - `summary_table()`: Table of the metrics summed over all generations
+        - `close()`: Stops memory tracing
+
+    Example :
+    -------
+        - Example illustrates instrumentation of the callbacks passed to pygad
+
+    .. code-block:: python
+        instrumentation = Instrumentation(directory="metrics", name="genetic_algorithm")
+        ga_instance = pygad.GA(
+            fitness_func=instrumentation.timed("fitness", fitness_func),
+            crossover_type=instrumentation.timed("crossover", crossover_func),
+            on_generation=instrumentation.on_generation(on_generation),
+            ...
+        )
+
+    Note :
+    -------
+        - Nested stages are recorded exclusively, time of an inner stage is not added to the outer stage
+        - Time of a generation not spent in any stage is recorded as "other" (pygad internals)
+    """
+
+    def __init__(
+        self,
+        directory: str | Path | None = None,
+        name: str = "genetic_algorithm",
+        track_memory: bool = False,
+        labels: dict[str, str] | None = None,
+    ):
+        self.enabled = directory is not None
+        self.track_memory = track_memory and self.enabled
+        self.jsonl_path = Path(directory) / f"{name}.jsonl" if self.enabled else None
+        self.prometheus_path = Path(directory) / f"{name}.prom" if self.enabled else None
+        self.labels = {"run": name, **(labels or {})}
+        self.totals = {}
+        self.generations_completed = 0
+        self._generation = {}
+        self._stack = []  # [stage, start time] of the running stages
+        self._generation_start = None
+        self._last_generation_seconds = 0.0
+        self._total_seconds = 0.0
+
+        if self.enabled:
+            self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+            self.jsonl_path.write_text("")
+            if self.track_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def timed(self, stage: str, func: Callable) -> Callable:
+        """
+        Wraps a callback to record its wall time, calls and peak memory as `stage`.
+
+        Parameters :
+        -------
+            - `stage` : Name of the stage
+            - `func` : Function or method passed to pygad
+
+        Returns :
+        -------
+            - `wrapper` : Callback with the same number of parameters as `func`, `func` itself if disabled
+
+        Note :
+        -------
+            - pygad validates callbacks by their number of parameters, so the wrapper keeps it
+        """
+        if not self.enabled:
+            return func
+
+        def call(*args):
+            with self.stage(stage):
+                return func(*args)
+
+        num_params = func.__code__.co_argcount - inspect.ismethod(func)
+        wrappers = {
+            1: lambda a: call(a),
+            2: lambda a, b: call(a, b),
+            3: lambda a, b, c: call(a, b, c),
+        }
+        return wrappers[num_params]
+
+    def on_generation(self, func: Callable) -> Callable:
+        """
+        Wraps the `on_generation` callback, which is recorded as "logging" stage and completes the generation metrics.
+
+        Parameters :
+        -------
+            - `func` : Callback receiving the pygad instance
+
+        Returns :
+        -------
+            - `wrapper` : Callback exporting the metrics after `func`, `func` itself if disabled
+        """
+        if not self.enabled:
+            return func
+
+        def wrapper(ga_instance):
+            with self.stage("logging"):
+                func(ga_instance)
+            self.end_generation(ga_instance.generations_completed)
+
+        return wrapper
+
+    def stage(self, name: str):
+        """
+        Returns a context manager recording wall time, calls and peak memory of a code block as stage `name`.
+        """
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        now = time.perf_counter()
+        if self._generation_start is None:
+            self._generation_start = now
+        if self._stack:
+            # Pause the outer stage
+            outer_stage, outer_start = self._stack[-1]
+            self._record(outer_stage, now - outer_start, calls=0)
+        self._reset_peak()
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            stage, start = self._stack.pop()
+            now = time.perf_counter()
+            self._record(stage, now - start, calls=1)
+            self._reset_peak()
+            if self._stack:
+                # Resume the outer stage
+                self._stack[-1][1] = now
+
+    def _record(self, stage: str, seconds: float, calls: int) -> None:
+        metrics = self._generation.setdefault(
+            stage, {"seconds": 0.0, "calls": 0, "peak_memory_bytes": 0}
+        )
+        metrics["seconds"] += seconds
+        metrics["calls"] += calls
+        if self.track_memory:
+            metrics["peak_memory_bytes"] = max(
+                metrics["peak_memory_bytes"], tracemalloc.get_traced_memory()[1]
+            )
+
+    def _reset_peak(self) -> None:
+        if self.track_memory:
+            tracemalloc.reset_peak()
+
+    def end_generation(self, generation: int) -> None:
+        """
+        Completes the metrics of a generation, appends them to the JSON lines file and rewrites the Prometheus file.
+
+        Parameters :
+        -------
+            - `generation` : Number of the completed generation
+        """
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        seconds = now - (self._generation_start or now)
+        staged_seconds = sum(metrics["seconds"] for metrics in self._generation.values())
+        self._generation["other"] = {
+            "seconds": max(seconds - staged_seconds, 0.0),
+            "calls": 0,
+            "peak_memory_bytes": 0,
+        }
+
+        record = {
+            "generation": generation,
+            "timestamp": time.time(),
+            "seconds": seconds,
+            "stages": self._generation,
+        }
+        with self.jsonl_path.open("a") as file:
+            file.write(json.dumps(record) + "\n")
+
+        for stage, metrics in self._generation.items():
+            totals = self.totals.setdefault(
+                stage, {"seconds": 0.0, "calls": 0, "peak_memory_bytes": 0}
+            )
+            totals["seconds"] += metrics["seconds"]
+            totals["calls"] += metrics["calls"]
+            totals["peak_memory_bytes"] = max(
+                totals["peak_memory_bytes"], metrics["peak_memory_bytes"]
+            )
+        self.generations_completed = generation
+        self._last_generation_seconds = seconds
+        self._total_seconds += seconds
+        self._write_prometheus()
+
+        self._generation = {}
+        self._generation_start = time.perf_counter()
+
+    def _write_prometheus(self) -> None:
+        """
+        Rewrites the Prometheus text format file, the file is replaced atomically so a scraper never reads a partial file.
+        """
+        base_labels = ",".join(f'{key}="{value}"' for key, value in self.labels.items())
+        lines = []
+
+        def add_metric(name: str, metric_type: str, help_text: str, samples: list) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for stage, value in samples:
+                labels = base_labels + (f',stage="{stage}"' if stage is not None else "")
+                lines.append(f"{name}{{{labels}}} {value}")
+
+        add_metric(
+            "ga_generations_completed",
+            "gauge",
+            "Number of completed generations.",
+            [(None, self.generations_completed)],
+        )
+        add_metric(
+            "ga_generation_seconds_total",
+            "counter",
+            "Wall time of all completed generations.",
+            [(None, self._total_seconds)],
+        )
+        add_metric(
+            "ga_last_generation_seconds",
+            "gauge",
+            "Wall time of the last generation.",
+            [(None, self._last_generation_seconds)],
+        )
+        add_metric(
+            "ga_stage_seconds_total",
+            "counter",
+            "Wall time spent in a stage of the genetic algorithm.",
+            [(stage, metrics["seconds"]) for stage, metrics in self.totals.items()],
+        )
+        add_metric(
+            "ga_stage_calls_total",
+            "counter",
+            "Number of calls of a stage of the genetic algorithm.",
+            [(stage, metrics["calls"]) for stage, metrics in self.totals.items()],
+        )
+        add_metric(
+            "ga_stage_last_generation_seconds",
+            "gauge",
+            "Wall time spent in a stage during the last generation.",
+            [(stage, metrics["seconds"]) for stage, metrics in self._generation.items()],
+        )
+        if self.track_memory:
+            add_metric(
+                "ga_stage_peak_memory_bytes",
+                "gauge",
+                "Peak traced memory while running a stage of the genetic algorithm.",
+                [
+                    (stage, metrics["peak_memory_bytes"])
+                    for stage, metrics in self.totals.items()
+                ],
+            )
+
+        temporary_path = self.prometheus_path.with_name(
+            f"{self.prometheus_path.name}.{os.getpid()}.tmp"
+        )
+        temporary_path.write_text("\n".join(lines) + "\n")
+        os.replace(temporary_path, self.prometheus_path)
+
+    def summary_table(self) -> str:
+        """
+        Returns a table of the stage metrics summed over all generations.
+
+        Example :
+        -------
+            .. code-block:: txt
+                +-----------------+------------+----------+--------+------------+
+                |STAGE            |TIME [s]    |CALLS     |SHARE   |PEAK [MB]   |
+                |-----------------|------------|----------|--------|------------|
+                |fitness          |     1.20415|       450|  81.3% |       12.40|
+                ...
+        """
+        widths = (17, 12, 10, 8, 12)
+        border = "+" + "+".join("-" * width for width in widths) + "+\n"
+        separator = "|" + "|".join("-" * width for width in widths) + "|\n"
+
+        table = border
+        table += "|{:17}|{:12}|{:10}|{:8}|{:12}|\n".format(
+            "STAGE", "TIME [s]", "CALLS", "SHARE", "PEAK [MB]"
+        )
+        table += separator
+        total_seconds = sum(metrics["seconds"] for metrics in self.totals.values())
+        for stage, metrics in sorted(
+            self.totals.items(), key=lambda item: item[1]["seconds"], reverse=True
+        ):
+            share = metrics["seconds"] / total_seconds if total_seconds else 0.0
+            peak = (
+                f"{metrics['peak_memory_bytes'] / 2**20:>12.2f}"
+                if self.track_memory
+                else f"{'-':>12}"
+            )
+            table += "|{:17}|{:>12.5f}|{:>10}|{:>7.1%} |{}|\n".format(
+                stage, metrics["seconds"], metrics["calls"], share, peak
+            )
+        table += border
+        return table
+
+    def close(self) -> None:
+        """
+        Stops memory tracing started by the instrumentation.
+        """
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
@@ -1,21 +1,130 @@
 """
 Module Name: logger.py
 Description: Configures logging for monitoring application runtime. Logs messages at the INFO level and above, with a timestamped format. Logs are saved to a rotating file `app_monitor.log` with a 5 MB size limit and up to 5 backup files, and also output to the console.
+Records are put on a queue and written by a background thread (`QueueHandler`/`QueueListener`), so logging never waits for the disk or the console.
+Generation statistics are written as compact JSON lines by `JsonLinesLogger`.
 
 Last Updated: 2024-09-01
 """
 
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[
-        RotatingFileHandler("app_monitor.log", maxBytes=5 * 1024 * 1024, backupCount=5),
-        logging.StreamHandler(),
-    ],
+import multiprocessing.util
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+_formatter = logging.Formatter(
+    fmt="%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
 )
+_handlers = [
+    RotatingFileHandler("app_monitor.log", maxBytes=5 * 1024 * 1024, backupCount=5),
+    logging.StreamHandler(),
+]
+for _handler in _handlers:
+    _handler.setFormatter(_formatter)
+
+# Messages are formatted with their time and level by the background thread
+_queue_handler = QueueHandler(queue.SimpleQueue())
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+_listener = QueueListener(_queue_handler.queue, *_handlers, respect_handler_level=True)
+_listener.start()
+
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
 
 logger = logging.getLogger(__name__)
+
+
+def _stop_listener() -> None:
+    """
+    Writes the queued records and stops the background thread.
+    """
+    _listener.stop()
+
+
+atexit.register(_stop_listener)
+
+
+def _restart_listener() -> None:
+    """
+    Starts a new background thread in a forked process, threads are not copied by fork.
+    """
+    global _listener
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_queue_handler.queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener_at_process_exit(_) -> None:
+    """
+    Stops the background thread when a `multiprocessing` process exits, which skips `atexit`.
+    """
+    multiprocessing.util.Finalize(None, _stop_listener, exitpriority=0)
+
+
+os.register_at_fork(after_in_child=_restart_listener)
+multiprocessing.util.register_after_fork(_queue_handler, _stop_listener_at_process_exit)
+
+
+class JsonLinesLogger:
+    """
+    Writes records (dictionaries) to a JSON lines file in a background thread.
+
+    Attributes :
+    -------
+        - `path`: JSON lines file, overwritten when the logger is created
+        - `num_records`: Number of records written so far
+
+    Methods :
+    -------
+        - `write(record)`: Queues a record and returns immediately
+        - `close()`: Writes the queued records and closes the file
+
+    Example :
+    -------
+        - Example illustrates statistics of two generations
+
+    .. code-block:: python
+        stats = JsonLinesLogger("logs/genetic_algorithm_generations.jsonl")
+        stats.write({"generation": 1, "best": 40.06})
+        stats.write({"generation": 2, "best": 41.5})
+        stats.close()
+        ----------------------OUTPUT----------------------
+        {"generation":1,"best":40.06}
+        {"generation":2,"best":41.5}
+
+    Note :
+    -------
+        - Records are serialized without spaces, values must be JSON serializable (Python numbers, strings, lists)
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.num_records = 0
+        self._handler = logging.FileHandler(self.path, mode="w")
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue_handler = QueueHandler(queue.SimpleQueue())
+        self._listener = QueueListener(self._queue_handler.queue, self._handler)
+        self._listener.start()
+        self._logger = logging.getLogger(f"{__name__}.{self.path}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(self._queue_handler)
+
+    def write(self, record: dict) -> None:
+        """
+        Queues a record for writing as one JSON line.
+        """
+        self._logger.info(json.dumps(record, separators=(",", ":")))
+        self.num_records += 1
+
+    def close(self) -> None:
+        """
+        Writes the queued records and closes the file.
+        """
+        self._logger.removeHandler(self._queue_handler)
+        self._listener.stop()
+        self._handler.close()
@@ -0,0 +1,232 @@
+"""
+Module Name: resample_cache.py
+Description: On-disk cache of resampled OHLC arrays. Entries are keyed by the content hash of
+the source parquet data, the frequency, the date range and the aggregation rules, stored as
+binary .npy arrays and reopened by memory-mapping, so cache hits are almost instant and
+processes using the same entry share memory pages.
+
+Last Updated: 2024-09-01
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.utils.data_loader import LoadedOHLC, load_ohlc
+from src.utils.logger import logger
+
+# Aggregation rules of `resample_ohlc`, part of the cache key
+AGGREGATION_RULES = {"Open": "first", "High": "max", "Low": "min", "Close": "last"}
+
+
+class ResampleCache:
+    """
+    Size-bounded cache of resampled OHLC arrays, shared between runs and processes.
+
+    Attributes :
+    -------
+        - `directory`: Directory holding cache entries (one subdirectory per entry)
+        - `max_bytes`: Maximum size of all entries, least recently used are evicted first
+
+    Methods :
+    -------
+        - `load(path, freq, start, end)`: Resampled market data, loaded from the cache if possible
+        - `invalidate(path)`: Removes all entries created from a source
+        - `source_hash(path)`: Content hash of a parquet file or directory
+
+    Example :
+    -------
+        - Example illustrates repeated loading of hourly candles
+
+    .. code-block:: python
+        cache = ResampleCache("cache/resampled", max_bytes=2 * 2**30)
+        data = cache.load("data/BTC/BTC_2018_min.parquet", freq="h")  # Resampled and stored
+        data = cache.load("data/BTC/BTC_2018_min.parquet", freq="h")  # Memory-mapped from the cache
+
+    Note :
+    -------
+        - Source content hashes are remembered together with the size and modification time of the
+          source files and only recalculated when these change. Entries of a changed source are
+          never reused, since its content hash (and therefore the key) is different
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int = 2 * 2**30):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sources_path = self.directory / "sources.json"
+
+    @staticmethod
+    def _source_files(path: Path) -> list[Path]:
+        return sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+
+    def source_hash(self, path: str | Path) -> str:
+        """
+        Returns the content hash of a parquet file or of all files in a directory.
+
+        Parameters :
+        -------
+            - `path` : Parquet file or directory of parquet files
+
+        Returns :
+        -------
+            - `str` : Hexadecimal SHA-256 digest
+        """
+        path = Path(path).resolve()
+        files = self._source_files(path)
+        signature = []
+        for file in files:
+            stat = file.stat()
+            name = str(file.relative_to(path)) if path.is_dir() else file.name
+            signature.append([name, stat.st_size, stat.st_mtime_ns])
+
+        sources = self._read_sources()
+        known = sources.get(str(path))
+        if known is not None and known["signature"] == signature:
+            return known["hash"]
+
+        digest = hashlib.sha256()
+        for file, (name, _, _) in zip(files, signature):
+            digest.update(name.encode())
+            with file.open("rb") as source:
+                for block in iter(lambda: source.read(2**20), b""):
+                    digest.update(block)
+
+        sources[str(path)] = {"signature": signature, "hash": digest.hexdigest()}
+        self._write_json(self._sources_path, sources)
+        return digest.hexdigest()
+
+    def _read_sources(self) -> dict:
+        if not self._sources_path.exists():
+            return {}
+        with self._sources_path.open("r") as file:
+            return json.load(file)
+
+    @staticmethod
+    def _write_json(path: Path, content: dict) -> None:
+        temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with temporary_path.open("w") as file:
+            json.dump(content, file)
+        temporary_path.replace(path)
+
+    def _entry_key(
+        self, source_hash: str, freq: str, start: str | None, end: str | None
+    ) -> str:
+        key = json.dumps(
+            [source_hash, freq, str(start), str(end), AGGREGATION_RULES], sort_keys=True
+        )
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    def load(
+        self,
+        path: str | Path,
+        freq: str,
+        start: str | None = None,
+        end: str | None = None,
+    ) -> LoadedOHLC:
+        """
+        Loads resampled market data, from the cache if an entry exists, otherwise with `load_ohlc`.
+
+        Parameters :
+        -------
+            - `path` : Parquet file or directory of parquet files
+            - `freq` : Fixed frequency to resample to (e.g. "h")
+            - `start` : First date to load (inclusive), None loads from the beginning
+            - `end` : Last date to load (exclusive), None loads to the end
+
+        Returns :
+        -------
+            - `LoadedOHLC` : Dates and OHLC array. On a cache hit both are read-only memory-mapped
+                             arrays and no parquet rows or bytes are read
+        """
+        start_time = time.perf_counter()
+        entry = self.directory / self._entry_key(self.source_hash(path), freq, start, end)
+
+        if entry.exists():
+            os.utime(entry / "meta.json")  # Most recently used
+            loaded = LoadedOHLC(
+                dates=np.load(entry / "dates.npy", mmap_mode="r"),
+                ohlc=np.load(entry / "ohlc.npy", mmap_mode="r"),
+                rows_read=0,
+                bytes_read=0,
+                load_time=time.perf_counter() - start_time,
+            )
+            logger.info(f"Resample cache hit for {path} ({freq}) in {loaded.load_time:.3f} s")
+            return loaded
+
+        loaded = load_ohlc(path, start=start, end=end, freq=freq)
+
+        # Entries are written to a temporary directory and renamed, readers never see partial entries
+        temporary_entry = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        temporary_entry.mkdir(parents=True, exist_ok=True)
+        np.save(temporary_entry / "dates.npy", loaded.dates.astype("datetime64[ns]"))
+        np.save(temporary_entry / "ohlc.npy", loaded.ohlc)
+        self._write_json(
+            temporary_entry / "meta.json",
+            {"source": str(Path(path).resolve()), "freq": freq, "start": start, "end": end},
+        )
+        try:
+            temporary_entry.rename(entry)
+        except OSError:
+            # Another process stored the same entry in the meantime
+            shutil.rmtree(temporary_entry, ignore_errors=True)
+
+        self._evict()
+        return loaded
+
+    def _entries(self) -> list[Path]:
+        return [
+            entry
+            for entry in self.directory.iterdir()
+            if entry.is_dir() and (entry / "meta.json").exists()
+        ]
+
+    @staticmethod
+    def _entry_size(entry: Path) -> int:
+        return sum(file.stat().st_size for file in entry.iterdir())
+
+    def _evict(self) -> None:
+        """
+        Removes least recently used entries until all entries fit into `max_bytes`.
+        """
+        entries = sorted(
+            self._entries(), key=lambda entry: (entry / "meta.json").stat().st_mtime
+        )
+        sizes = [self._entry_size(entry) for entry in entries]
+        total_size = sum(sizes)
+        for entry, size in zip(entries, sizes):
+            if total_size <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+            logger.info(f"Evicted resample cache entry {entry.name} ({size / 2**20:.2f} MB)")
+
+    def invalidate(self, path: str | Path) -> int:
+        """
+        Removes all entries created from a source, e.g. after it was rewritten in place.
+
+        Parameters :
+        -------
+            - `path` : Parquet file or directory of parquet files
+
+        Returns :
+        -------
+            - `int` : Number of removed entries
+        """
+        source = str(Path(path).resolve())
+        removed = 0
+        for entry in self._entries():
+            with (entry / "meta.json").open("r") as file:
+                if json.load(file)["source"] == source:
+                    shutil.rmtree(entry, ignore_errors=True)
+                    removed += 1
+
+        sources = self._read_sources()
+        if sources.pop(source, None) is not None:
+            self._write_json(self._sources_path, sources)
+        return removed
@@ -0,0 +1,65 @@
+import argparse
+from pathlib import Path
+
+from main import genetic_algorithm_kwargs, load_config, prepare_data
+from src.modules.parameter_sweep import GRID_SETTINGS, ParameterSweep
+from src.utils.logger import logger
+from src.utils.resample_cache import ResampleCache
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run the Genetic Algorithm over a grid of settings and several datasets."
+    )
+    parser.add_argument("--sweep", type=Path, default=Path("config/sweep.yml"))
+    parser.add_argument("--config", type=Path, default=Path("config/config.yml"))
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    config = load_config(args.config)
+    sweep_settings = load_config(args.sweep)
+    logger.setLevel(config["logging"]["level"])
+    data_settings = config["data"]
+    resample_cache = (
+        ResampleCache(data_settings["cache_dir"], data_settings["cache_max_bytes"])
+        if data_settings["cache_dir"] is not None
+        else None
+    )
+
+    datasets = {
+        dataset.get("name", Path(dataset["path"]).stem): prepare_data(
+            dataset["path"],
+            dataset["freq"],
+            dataset["start"],
+            dataset["end"],
+            resample_cache,
+        )
+        for dataset in sweep_settings["datasets"]
+    }
+
+    # Swept settings are set per configuration
+    ga_kwargs = genetic_algorithm_kwargs(config)
+    for setting in ("num_conds", "max_lag", "fitness_type", "bullish_focus"):
+        del ga_kwargs[setting]
+    grid = sweep_settings["grid"]
+
+    sweep = ParameterSweep(
+        datasets,
+        {setting: grid[setting] for setting in GRID_SETTINGS},
+        ga_kwargs,
+        config["validation"],
+        sweep_settings["num_workers"],
+        sweep_settings["seed"],
+    )
+    results = sweep.run()
+
+    output = Path(sweep_settings["output"])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(output, index=False)
+    logger.info(f"Results of {len(results)} configurations saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
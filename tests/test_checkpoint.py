@@ -0,0 +1,114 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.modules.genetic_algorithm import GeneticAlgorithm
+from tests.test_equivalence import random_market_data
+
+
+class Interrupted(Exception):
+    pass
+
+
+def run_genetic_algorithm(
+    checkpoint_path=None, num_gens=8, stop_after=None, resume=False, **kwargs
+):
+    """
+    Runs a seeded GA, optionally stopped after `stop_after` generations or resumed from `checkpoint_path`.
+    """
+    random.seed(7)
+    np.random.seed(7)
+    genetic_algorithm = GeneticAlgorithm(
+        random_market_data(0, num_candles=300),
+        pop_size=30,
+        num_gens=num_gens,
+        num_conds=2,
+        max_lag=2,
+        fitness_type="martin_ratio",
+        bullish_focus=True,
+        checkpoint_path=checkpoint_path,
+        checkpoint_interval=3,
+        table_interval=None,
+        **kwargs,
+    )
+    ga_instance = (
+        genetic_algorithm.resume_instance() if resume else genetic_algorithm.create_instance()
+    )
+    if stop_after is not None:
+        on_generation = ga_instance.on_generation
+
+        def stop(instance):
+            on_generation(instance)
+            if instance.generations_completed == stop_after:
+                genetic_algorithm.checkpoint_writer.close()
+                raise Interrupted
+
+        ga_instance.on_generation = stop
+    try:
+        ga_instance.run()
+    except Interrupted:
+        return None
+    return (
+        ga_instance.population.copy(),
+        ga_instance.last_generation_fitness.copy(),
+        list(ga_instance.best_solutions_fitness),
+    )
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"fitness_batch_size": 30},
+        {"racing_stages": 3, "parent_selection": "truncation", "num_parents_mating": 6},
+    ],
+)
+def test_resumed_run_is_identical(tmp_path, kwargs):
+    checkpoint_path = tmp_path / "run.npz"
+    population, fitness, best_fitness = run_genetic_algorithm(**kwargs)
+
+    run_genetic_algorithm(checkpoint_path, stop_after=4, **kwargs)
+    resumed = run_genetic_algorithm(checkpoint_path, resume=True, **kwargs)
+
+    np.testing.assert_array_equal(resumed[0], population)
+    np.testing.assert_array_equal(resumed[1], fitness)
+    assert resumed[2] == best_fitness
+
+
+def test_finished_run_is_extended(tmp_path):
+    checkpoint_path = tmp_path / "run.npz"
+    population, fitness, _ = run_genetic_algorithm()
+
+    run_genetic_algorithm(checkpoint_path, num_gens=5)
+    extended = run_genetic_algorithm(checkpoint_path, resume=True)
+
+    np.testing.assert_array_equal(extended[0], population)
+    np.testing.assert_array_equal(extended[1], fitness)
+
+
+def test_restored_fitness_is_used_until_the_population_changes():
+    genetic_algorithm = GeneticAlgorithm(
+        random_market_data(0, num_candles=300),
+        pop_size=30,
+        num_gens=1,
+        num_conds=2,
+        max_lag=2,
+        fitness_type="martin_ratio",
+        bullish_focus=True,
+        table_interval=None,
+    )
+    ga_instance = genetic_algorithm.create_instance()
+    population = ga_instance.population.copy()
+    restored_fitness = np.arange(len(population), dtype=np.float64)
+    ga_instance.restore(population, restored_fitness)
+
+    # Repeated calls on the restored population do not evaluate it
+    for _ in range(2):
+        np.testing.assert_array_equal(ga_instance.cal_pop_fitness(), restored_fitness)
+    assert genetic_algorithm.fitness_cache.misses == 0
+
+    ga_instance.population[0] = ga_instance.population[1]
+    fitness = ga_instance.cal_pop_fitness()
+    assert genetic_algorithm.fitness_cache.misses > 0
+    assert fitness[0] == fitness[1]
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.utils.data_loader import load_ohlc, resample_ohlc
+
+
+def minute_candles(seed: int, num_candles: int = 3000) -> pd.DataFrame:
+    """
+    Random minute candles with gaps (missing minutes and hours) and missing (NaN) prices.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2018-01-01 00:07", periods=num_candles, freq="min")
+    keep = rng.random(num_candles) > 0.3
+    keep[600:720] = False  # Two hours without candles
+    close = 100 + np.cumsum(rng.normal(0, 0.5, num_candles))
+    df = pd.DataFrame(
+        {
+            "date": dates,
+            "open": close + rng.normal(0, 0.2, num_candles),
+            "close": close,
+            "high": close + 1,
+            "low": close - 1,
+        }
+    )[keep].reset_index(drop=True)
+    for column in ("open", "close", "high", "low"):
+        df.loc[rng.random(len(df)) < 0.2, column] = np.nan
+    # An hour with candles but without any Open price
+    df.loc[df["date"].between("2018-01-01 20:00", "2018-01-01 20:59"), "open"] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("freq", ["h", "15min", "4h"])
+@pytest.mark.parametrize("seed", range(3))
+def test_resample_like_pandas(seed, freq):
+    df = minute_candles(seed)
+    ohlc = df[["open", "close", "high", "low"]].to_numpy().T
+
+    dates, resampled = resample_ohlc(df["date"].to_numpy(), ohlc, freq)
+
+    expected = (
+        df.set_index("date")
+        .resample(freq)
+        .agg({"open": "first", "close": "last", "high": "max", "low": "min"})
+    )
+    np.testing.assert_array_equal(dates, expected.index.to_numpy())
+    np.testing.assert_array_equal(resampled, expected.to_numpy().T)
+
+
+@pytest.fixture
+def parquet_file(tmp_path):
+    df = minute_candles(0).dropna().reset_index(drop=True)
+    path = tmp_path / "candles.parquet"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=200)
+    return path, df
+
+
+def test_load_reads_only_row_groups_of_the_date_range(parquet_file):
+    path, df = parquet_file
+    start, end = "2018-01-01 10:00", "2018-01-01 12:00"
+
+    everything = load_ohlc(path)
+    loaded = load_ohlc(path, start=start, end=end)
+
+    expected = df[(df["date"] >= start) & (df["date"] < end)]
+    np.testing.assert_array_equal(loaded.dates, expected["date"].to_numpy())
+    np.testing.assert_array_equal(
+        loaded.ohlc, expected[["open", "close", "high", "low"]].to_numpy().T
+    )
+    assert everything.rows_read == len(df)
+    assert loaded.rows_read == len(expected)
+    # Only the row groups (of 200 rows) overlapping the 2 hours are read
+    assert loaded.bytes_read < everything.bytes_read / 3
+
+
+def test_load_and_resample(parquet_file):
+    path, df = parquet_file
+    loaded = load_ohlc(path, start="2018-01-01 03:00", freq="h")
+
+    expected = (
+        df[df["date"] >= "2018-01-01 03:00"]
+        .set_index("date")
+        .resample("h")
+        .agg({"open": "first", "close": "last", "high": "max", "low": "min"})
+    )
+    np.testing.assert_array_equal(loaded.ohlc, expected.to_numpy().T)
+    assert loaded.ohlc.flags.c_contiguous
@@ -0,0 +1,290 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.modules.chunked_evaluation import ChunkedEvaluator
+from src.modules.condition_index import ConditionIndex
+from src.modules.fitness_functions import (
+    martin_ratio,
+    population_fitness,
+    profit_factor,
+    total_return,
+)
+from src.modules.genetic_algorithm import GeneticAlgorithm
+from src.modules.pattern_evaluation import (
+    evaluate_candlestick_pattern,
+    evaluate_candlestick_pattern_vectorized,
+    forward_log_returns,
+    horizon_log_returns,
+    ohlc_to_array,
+    population_match_matrix,
+)
+from src.modules.pattern_generator import CandlestickPatternGenerator
+from src.modules.racing import RacingEvaluator
+from src.utils.data_loader import ChunkedOHLC
+
+FITNESS_TYPES = ["total_return", "profit_factor", "martin_ratio"]
+MAX_LAG = 2
+MIN_SUPPORT = 0.025
+
+
+def random_market_data(seed: int, num_candles: int = 40) -> pd.DataFrame:
+    """
+    Random candles with integer prices, so equal prices, repeated log returns and rounding ties occur.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.integers(-3, 4, num_candles))
+    open_ = close + rng.integers(-2, 3, num_candles)
+    return pd.DataFrame(
+        {
+            "Open": open_.astype(float),
+            "High": (np.maximum(open_, close) + rng.integers(0, 2, num_candles)).astype(float),
+            "Low": (np.minimum(open_, close) - rng.integers(0, 2, num_candles)).astype(float),
+            "Close": close.astype(float),
+        }
+    )
+
+
+def random_population(seed: int, size: int = 40) -> np.ndarray:
+    random.seed(seed)
+    np.random.seed(seed)
+    return CandlestickPatternGenerator(MAX_LAG, 2).get_population(size)
+
+
+def baseline_fitness(log_returns: list, fitness_type: str) -> float:
+    """
+    Fitness of the reference implementation.
+    """
+    if fitness_type == "total_return":
+        return total_return(log_returns)
+    fitness_function = profit_factor if fitness_type == "profit_factor" else martin_ratio
+    return fitness_function(log_returns, MIN_SUPPORT)
+
+
+def baseline_candidates(
+    df: pd.DataFrame, pattern: list[int], bullish_focus: bool, fitness_type: str
+) -> set[float]:
+    """
+    Fitness values of the reference implementation within the tolerance of the statistics: the log
+    return of a pattern matched on the last candle may differ by 0.01 at rounding ties.
+    """
+    log_returns = evaluate_candlestick_pattern(df, pattern, MAX_LAG, bullish_focus)
+    candidates = {baseline_fitness(log_returns, fitness_type)}
+    if isinstance(log_returns[-1], float):
+        for delta in (-0.01, 0.01):
+            last_return = round(log_returns[-1] + delta, 2)
+            candidates.add(baseline_fitness(log_returns[:-1] + [last_return], fitness_type))
+    return candidates
+
+
+@pytest.fixture(
+    scope="module", params=[(seed, bullish) for seed in range(6) for bullish in (True, False)]
+)
+def market(request):
+    seed, bullish_focus = request.param
+    df = random_market_data(seed)
+    population = random_population(seed)
+    ohlc = ohlc_to_array(df)
+    match_matrix = ConditionIndex(ohlc, MAX_LAG).population_match_matrix(population)
+    expected = {
+        fitness_type: population_fitness(
+            fitness_type, match_matrix, forward_log_returns(ohlc, bullish_focus), MIN_SUPPORT
+        )
+        for fitness_type in FITNESS_TYPES
+    }
+    return df, population, bullish_focus, expected
+
+
+def test_market_data_matches_on_the_last_candle(market):
+    df, population, _, _ = market
+    index = ConditionIndex(ohlc_to_array(df), MAX_LAG)
+    assert index.population_match_matrix(population)[:, -1].any()
+
+
+def test_vectorized_evaluation(market):
+    df, population, bullish_focus, _ = market
+    ohlc = ohlc_to_array(df)
+    for pattern in population.tolist():
+        expected = evaluate_candlestick_pattern(df, pattern, MAX_LAG, bullish_focus)
+        match_mask, log_returns = evaluate_candlestick_pattern_vectorized(
+            ohlc, pattern, MAX_LAG, bullish_focus
+        )
+        assert log_returns.tolist() == expected
+        np.testing.assert_array_equal(
+            match_mask, [isinstance(log_return, float) for log_return in expected]
+        )
+
+
+def test_population_match_matrix(market):
+    df, population, _, _ = market
+    ohlc = ohlc_to_array(df)
+    np.testing.assert_array_equal(
+        population_match_matrix(ohlc, population, MAX_LAG),
+        ConditionIndex(ohlc, MAX_LAG).population_match_matrix(population),
+    )
+    for pattern, match_mask in zip(
+        population.tolist(), population_match_matrix(ohlc, population, MAX_LAG)
+    ):
+        expected = evaluate_candlestick_pattern(df, pattern, MAX_LAG)
+        np.testing.assert_array_equal(
+            match_mask, [isinstance(log_return, float) for log_return in expected]
+        )
+
+
+@pytest.mark.parametrize("fitness_type", FITNESS_TYPES)
+def test_population_fitness(market, fitness_type):
+    df, population, bullish_focus, expected = market
+    for pattern, fitness in zip(population.tolist(), expected[fitness_type]):
+        assert fitness in baseline_candidates(df, pattern, bullish_focus, fitness_type)
+
+
+@pytest.mark.parametrize("fitness_type", FITNESS_TYPES)
+@pytest.mark.parametrize("fitness_batch_size", [None, 16])
+def test_genetic_algorithm_fitness(market, fitness_type, fitness_batch_size):
+    df, population, bullish_focus, expected = market
+    genetic_algorithm = GeneticAlgorithm(
+        df,
+        pop_size=len(population),
+        num_gens=1,
+        num_conds=2,
+        max_lag=MAX_LAG,
+        fitness_type=fitness_type,
+        bullish_focus=bullish_focus,
+        min_support=MIN_SUPPORT,
+        fitness_batch_size=fitness_batch_size,
+        table_interval=None,
+    )
+    ga_instance = genetic_algorithm.create_instance()
+    if fitness_batch_size is None:
+        fitness = [
+            genetic_algorithm._fitness_func(ga_instance, solution, idx)
+            for idx, solution in enumerate(population)
+        ]
+    else:
+        fitness = genetic_algorithm._fitness_batch_func(
+            ga_instance, population, list(range(len(population)))
+        )
+    np.testing.assert_array_equal(fitness, expected[fitness_type])
+
+
+@pytest.mark.parametrize("fitness_type", FITNESS_TYPES)
+@pytest.mark.parametrize("chunk_size", [7, 50])
+def test_chunked_evaluation(market, fitness_type, chunk_size):
+    df, population, bullish_focus, expected = market
+    evaluator = ChunkedEvaluator(
+        ChunkedOHLC(ohlc_to_array(df), chunk_size=chunk_size), MAX_LAG, bullish_focus
+    )
+    # Every pass reads the chunks again and gives the same values
+    for _ in range(2):
+        fitness = evaluator.fitness(fitness_type, population, MIN_SUPPORT)
+        np.testing.assert_array_equal(fitness, expected[fitness_type])
+
+
+@pytest.mark.parametrize("fitness_type", FITNESS_TYPES)
+def test_racing_evaluation(market, fitness_type):
+    df, population, bullish_focus, expected = market
+    ohlc = ohlc_to_array(df)
+    racing = RacingEvaluator(
+        ConditionIndex(ohlc, MAX_LAG),
+        forward_log_returns(ohlc, bullish_focus),
+        fitness_type,
+        MIN_SUPPORT,
+        num_stages=4,
+    )
+    threshold = np.median(expected[fitness_type])
+    fitness, exact = racing.evaluate(population, threshold)
+
+    np.testing.assert_array_equal(fitness[exact], expected[fitness_type][exact])
+    # Only patterns below the threshold are dropped, with fitness 0
+    assert (expected[fitness_type][~exact] < threshold).all()
+    assert (fitness[~exact] == 0).all()
+    assert exact[expected[fitness_type].argmax()]
+
+
+@pytest.mark.parametrize("fitness_type", FITNESS_TYPES)
+def test_racing_raises_the_threshold_to_the_parents(market, fitness_type):
+    df, population, bullish_focus, expected = market
+    ohlc = ohlc_to_array(df)
+    racing = RacingEvaluator(
+        ConditionIndex(ohlc, MAX_LAG),
+        forward_log_returns(ohlc, bullish_focus),
+        fitness_type,
+        MIN_SUPPORT,
+        num_stages=3,
+    )
+    num_parents = 5
+    fitness, exact = racing.evaluate(population, num_parents=num_parents)
+
+    np.testing.assert_array_equal(fitness[exact], expected[fitness_type][exact])
+    # The fittest patterns (the parents of truncation selection) are never dropped
+    parents = np.argsort(-expected[fitness_type], kind="stable")[:num_parents]
+    assert exact[parents].all()
+    assert (expected[fitness_type][~exact] < np.sort(expected[fitness_type])[-num_parents]).all()
+
+
+def seeded_run(racing_stages: int, fitness_type: str) -> GeneticAlgorithm:
+    random.seed(3)
+    np.random.seed(3)
+    genetic_algorithm = GeneticAlgorithm(
+        random_market_data(1, num_candles=400),
+        pop_size=60,
+        num_gens=6,
+        num_conds=2,
+        max_lag=MAX_LAG,
+        fitness_type=fitness_type,
+        bullish_focus=True,
+        table_interval=None,
+        parent_selection="truncation",
+        num_parents_mating=6,
+        racing_stages=racing_stages,
+    )
+    genetic_algorithm.ga_instance = genetic_algorithm.create_instance()
+    genetic_algorithm.ga_instance.run()
+    return genetic_algorithm
+
+
+@pytest.mark.parametrize("fitness_type", FITNESS_TYPES)
+def test_raced_run_is_identical(fitness_type):
+    exhaustive = seeded_run(0, fitness_type)
+    raced = seeded_run(3, fitness_type)
+
+    assert raced.racing_evaluator.num_partial > 0
+    # Dropped chromosomes are never parents, so the runs evolve the same populations and elite
+    np.testing.assert_array_equal(raced.ga_instance.population, exhaustive.ga_instance.population)
+    assert raced.ga_instance.best_solutions_fitness == exhaustive.ga_instance.best_solutions_fitness
+    raced_best, raced_fitness, _ = raced.ga_instance.best_solution(
+        raced.ga_instance.last_generation_fitness
+    )
+    exhaustive_best, exhaustive_fitness, _ = exhaustive.ga_instance.best_solution(
+        exhaustive.ga_instance.last_generation_fitness
+    )
+    np.testing.assert_array_equal(raced_best, exhaustive_best)
+    assert raced_fitness == exhaustive_fitness
+
+
+@pytest.mark.parametrize("fitness_type", FITNESS_TYPES)
+def test_exit_horizons_in_one_pass(market, fitness_type):
+    df, population, bullish_focus, expected = market
+    ohlc = ohlc_to_array(df)
+    exit_horizons = [1, 3, 8]
+    match_matrix = ConditionIndex(ohlc, MAX_LAG).population_match_matrix(population)
+    fitness = population_fitness(
+        fitness_type,
+        match_matrix,
+        horizon_log_returns(ohlc, exit_horizons, bullish_focus),
+        MIN_SUPPORT,
+    )
+
+    np.testing.assert_array_equal(fitness[0], expected[fitness_type])
+    for row, horizon in enumerate(exit_horizons):
+        np.testing.assert_array_equal(
+            fitness[row],
+            population_fitness(
+                fitness_type,
+                match_matrix,
+                forward_log_returns(ohlc, bullish_focus, horizon),
+                MIN_SUPPORT,
+            ),
+        )
@@ -0,0 +1,58 @@
+import numpy as np
+
+from src.modules.fitness_cache import FitnessCache
+
+# Conditions C[1] > L[3] and O[0] < H[2] (price, lag, comparison, price, lag)
+PATTERN = [1, 1, 1, 3, 3, 0, 0, 0, 2, 2]
+
+
+def test_equivalent_patterns_have_the_same_key():
+    cache = FitnessCache(max_lag=3)
+    swapped_operands = [3, 3, 0, 1, 1, 2, 2, 1, 0, 0]  # L[3] < C[1] and H[2] > O[0]
+    reordered_conditions = PATTERN[5:] + PATTERN[:5]
+
+    assert cache.key(swapped_operands) == cache.key(PATTERN)
+    assert cache.key(reordered_conditions) == cache.key(PATTERN)
+    assert cache.keys(np.array([PATTERN, swapped_operands, reordered_conditions])) == [
+        cache.key(PATTERN)
+    ] * 3
+    # Reversing only the comparison is a different pattern
+    assert cache.key([1, 1, 0, 3, 3] + PATTERN[5:]) != cache.key(PATTERN)
+
+
+def test_cache_is_persisted_as_arrays(tmp_path):
+    path = tmp_path / "cache.npz"
+    cache = FitnessCache(max_lag=3, max_size=2, path=path)
+    cache.put(cache.key(PATTERN), 1.5)
+    cache.put(cache.key(PATTERN[5:] + [0, 0, 1, 3, 1]), 2.5)
+    cache.put(cache.key([1, 1, 1, 3, 3, 0, 0, 1, 3, 1]), 3.5)  # Evicts the first pattern
+    cache.save()
+
+    # The file holds no pickled objects
+    with np.load(path, allow_pickle=False) as data:
+        np.testing.assert_array_equal(data["values"], [2.5, 3.5])
+
+    loaded = FitnessCache(max_lag=3, max_size=2, path=path)
+    assert loaded.get(cache.key(PATTERN)) is None
+    assert loaded.get(cache.key([1, 1, 1, 3, 3, 0, 0, 1, 3, 1])) == 3.5
+    keys, values = loaded.to_arrays()
+    np.testing.assert_array_equal(keys, cache.to_arrays()[0])
+    np.testing.assert_array_equal(values, [2.5, 3.5])
+
+
+def test_empty_cache_is_persisted(tmp_path):
+    path = tmp_path / "cache.npz"
+    FitnessCache(max_lag=3, path=path).save()
+
+    assert len(FitnessCache(max_lag=3, path=path)) == 0
+
+
+def test_cache_files_of_different_setups():
+    ohlc = np.arange(12.0).reshape(4, 3)
+    path = FitnessCache.file_path("cache", ohlc, 2, 3, "martin_ratio", True)
+
+    assert path.suffix == ".npz"
+    # Patterns of another number of conditions have keys of another length
+    assert FitnessCache.file_path("cache", ohlc, 3, 3, "martin_ratio", True) != path
+    assert FitnessCache.file_path("cache", ohlc, 2, 3, "martin_ratio", False) != path
+    assert FitnessCache.file_path("cache", ohlc[:, :2], 2, 3, "martin_ratio", True) != path
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from src.modules.fitness_functions import (
+    fitness_from_statistics,
+    fitness_statistics,
+    martin_ratio,
+    profit_factor,
+    total_return,
+    total_return_from_statistics,
+)
+from src.modules.pattern_evaluation import masked_log_returns
+
+
+@pytest.mark.parametrize(
+    "cents, expected_last",
+    [
+        ([1, 2], [0.01, 0.02]),  # Mean 0.015, a rounding tie
+        ([1, 2, 3, 4], [0.02, 0.03]),  # Mean 0.025, a rounding tie
+        ([-1, -2], [-0.01, -0.02]),
+        ([5, -2, 3], [0.02]),
+        ([1, 3], [0.02]),
+    ],
+)
+def test_last_candle_average_within_rounding_tolerance(cents, expected_last):
+    # Pattern matched on every candle, including the last one
+    next_returns = np.append(np.array(cents) / 100, 0.0)
+    match_mask = np.ones(len(next_returns), dtype=bool)
+
+    log_returns = masked_log_returns(match_mask, next_returns)
+    statistics = fitness_statistics(match_mask, next_returns)
+    last_return = statistics.positive_sum[0] + statistics.negative_sum[0] - sum(cents) / 100
+
+    assert log_returns[-1] in expected_last
+    assert round(float(last_return), 2) in expected_last
+    assert total_return_from_statistics(statistics)[0] == pytest.approx(
+        total_return(log_returns.tolist()), abs=0.01 + 1e-9
+    )
+
+
+def test_last_candle_average_over_several_horizons():
+    # Every horizon applies the rule to its own returns
+    next_returns = np.array([[0.01, 0.03, 0.0], [0.01, 0.03, 0.0]])
+    next_returns[1, :2] *= -1
+    match_mask = np.ones(3, dtype=bool)
+
+    statistics = fitness_statistics(match_mask, next_returns)
+
+    np.testing.assert_allclose(statistics.positive_sum[:, 0], [0.06, 0.0])
+    np.testing.assert_allclose(statistics.negative_sum[:, 0], [0.0, -0.06])
+
+
+@pytest.mark.parametrize(
+    "fitness_function, fitness_type",
+    [(profit_factor, "profit_factor"), (martin_ratio, "martin_ratio")],
+)
+def test_support_of_the_statistics_counts_the_match_mask(fitness_function, fitness_type):
+    # Matched on 2 of 100 candles, the reference list holds 0 for the candles without a match
+    next_returns = np.full(100, 0.01)
+    match_mask = np.zeros(100, dtype=bool)
+    match_mask[[10, 20]] = True
+    log_returns = [0.01 if matched else 0 for matched in match_mask]
+    statistics = fitness_statistics(match_mask, next_returns)
+
+    assert fitness_from_statistics(fitness_type, statistics) == fitness_function(log_returns) == 0
+    assert (
+        fitness_from_statistics(fitness_type, statistics, min_support=0.01)
+        == fitness_function(log_returns, min_support=0.01)
+        > 0
+    )
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from src.modules.genetic_algorithm import GeneticAlgorithm
+from tests.test_equivalence import random_market_data
+
+# C[1] > L[2] & O[0] < H[1], written three ways, and another pattern
+PATTERN = [1, 1, 1, 3, 2, 0, 0, 0, 2, 1]
+SWAPPED_OPERANDS = [3, 2, 0, 1, 1, 2, 1, 1, 0, 0]
+REORDERED_CONDITIONS = PATTERN[5:] + PATTERN[:5]
+OTHER = [1, 1, 0, 3, 2, 0, 0, 0, 2, 1]
+
+
+@pytest.fixture
+def genetic_algorithm():
+    np.random.seed(0)
+    genetic_algorithm = GeneticAlgorithm(
+        random_market_data(0, num_candles=200),
+        pop_size=10,
+        num_gens=1,
+        num_conds=2,
+        max_lag=2,
+        fitness_type="total_return",
+        bullish_focus=True,
+        fitness_batch_size=10,
+        table_interval=None,
+    )
+    genetic_algorithm.ga_instance = genetic_algorithm.create_instance()
+    return genetic_algorithm
+
+
+def test_equivalent_chromosomes_are_evaluated_once(genetic_algorithm, monkeypatch):
+    evaluated = []
+    evaluate_fitness_batch = genetic_algorithm._evaluate_fitness_batch
+
+    def spy(solutions, cache_keys):
+        evaluated.append(solutions.copy())
+        return evaluate_fitness_batch(solutions, cache_keys)
+
+    monkeypatch.setattr(genetic_algorithm, "_evaluate_fitness_batch", spy)
+    solutions = np.array([PATTERN, SWAPPED_OPERANDS, OTHER, REORDERED_CONDITIONS, PATTERN])
+    fitness = genetic_algorithm._fitness_batch_func(
+        genetic_algorithm.ga_instance, solutions, list(range(len(solutions)))
+    )
+
+    assert len(evaluated) == 1
+    cache = genetic_algorithm.fitness_cache
+    assert cache.keys(evaluated[0]) == [cache.key(PATTERN), cache.key(OTHER)]
+    assert fitness[0] == fitness[1] == fitness[3] == fitness[4]
+    # A second batch is served by the cache
+    genetic_algorithm._fitness_batch_func(genetic_algorithm.ga_instance, solutions[:3], [0, 1, 2])
+    assert len(evaluated) == 1
+
+
+def test_duplicated_offspring_are_replaced(genetic_algorithm):
+    ga_instance = genetic_algorithm.ga_instance
+    ga_instance.last_generation_fitness = ga_instance.cal_pop_fitness()
+    elite = ga_instance.population[np.argmax(ga_instance.last_generation_fitness)]
+    offsprings = np.array([PATTERN, SWAPPED_OPERANDS, OTHER, elite, REORDERED_CONDITIONS])
+
+    genetic_algorithm._replace_duplicates(offsprings, ga_instance)
+
+    keys = genetic_algorithm.fitness_cache.keys(offsprings)
+    assert len(set(keys)) == len(keys)
+    assert genetic_algorithm.fitness_cache.key(elite) not in keys
+    # The first copy of a pattern is kept
+    np.testing.assert_array_equal(offsprings[[0, 2]], [PATTERN, OTHER])
+    assert genetic_algorithm.operator_counts["replaced_duplicates"] >= 3
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from src.modules.island_model import IslandGeneticAlgorithm, IslandModel, island_neighbours
+from tests.test_equivalence import random_market_data
+
+
+def island_model(**kwargs) -> IslandModel:
+    return IslandModel(
+        random_market_data(0, num_candles=200),
+        num_islands=2,
+        migration_interval=2,
+        migration_size=3,
+        seed=11,
+        pop_size=20,
+        num_gens=4,
+        num_conds=2,
+        max_lag=2,
+        fitness_type="martin_ratio",
+        bullish_focus=True,
+        table_interval=None,
+        **kwargs,
+    )
+
+
+def test_neighbours():
+    assert island_neighbours(3, "ring") == [[1], [2], [0]]
+    assert island_neighbours(3, "fully_connected") == [[1, 2], [0, 2], [0, 1]]
+
+
+def test_immigrants_arrive():
+    model = island_model()
+    best_solution, best_fitness = model.run()
+
+    # Generations 2 and 4 migrate the 3 best chromosomes of the other island
+    assert model.num_immigrants == {0: 6, 1: 6}
+    assert len(best_solution) == 10
+    assert best_fitness >= 0
+
+
+def test_failed_island_stops_the_run(monkeypatch):
+    migrate = IslandGeneticAlgorithm._migrate
+
+    def failing_migrate(self, ga_instance):
+        if self.island_idx == 1:
+            raise ValueError("Island failure")
+        migrate(self, ga_instance)
+
+    # Island processes are forked, so they run the patched migration
+    monkeypatch.setattr(IslandGeneticAlgorithm, "_migrate", failing_migrate)
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match="Island 1 failed"):
+        island_model().run()
+    # Island 0 waits for the emigrants of island 1 up to `migration_timeout` (600 s) unless stopped
+    assert time.perf_counter() - start < 60
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from src.modules.condition_index import ConditionIndex
+from src.modules.live_matcher import LivePatternMatcher
+from src.modules.pattern_evaluation import ohlc_to_array
+from tests.test_equivalence import random_market_data, random_population
+
+
+def test_live_matches_equal_condition_index():
+    df = random_market_data(0, num_candles=80)
+    ohlc = ohlc_to_array(df)
+    population = random_population(0)
+    matcher = LivePatternMatcher(population, max_lag=3)
+    expected = ConditionIndex(ohlc, 3).population_match_matrix(population)
+
+    for candle in range(ohlc.shape[1]):
+        open_price, close_price, high_price, low_price = ohlc[:, candle]
+        fired = matcher.update(0, open_price, high_price, low_price, close_price)
+        np.testing.assert_array_equal(fired, expected[:, candle])
+
+
+def test_max_lag_below_pattern_lags_is_rejected():
+    with pytest.raises(ValueError, match="more than max_lag=1"):
+        LivePatternMatcher([[1, 0, 0, 0, 2]], max_lag=1)
+
+
+def test_empty_pattern_list_is_rejected():
+    with pytest.raises(ValueError, match="No patterns"):
+        LivePatternMatcher([])
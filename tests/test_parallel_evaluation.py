@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from src.modules.condition_index import ConditionIndex
+from src.modules.fitness_functions import population_fitness
+from src.modules.parallel_evaluation import ParallelFitnessEvaluator
+from src.modules.pattern_evaluation import horizon_log_returns, ohlc_to_array
+from tests.test_equivalence import (
+    FITNESS_TYPES,
+    MAX_LAG,
+    MIN_SUPPORT,
+    random_market_data,
+    random_population,
+)
+
+
+@pytest.fixture(scope="module")
+def market():
+    ohlc = ohlc_to_array(random_market_data(0, num_candles=300))
+    return ConditionIndex(ohlc, MAX_LAG), ohlc, random_population(0, size=50)
+
+
+@pytest.mark.parametrize("fitness_type", FITNESS_TYPES)
+@pytest.mark.parametrize("exit_horizons", [[1], [1, 3, 8]])
+def test_pool_fitness_equals_population_fitness(market, fitness_type, exit_horizons):
+    condition_index, ohlc, population = market
+    next_returns = horizon_log_returns(ohlc, exit_horizons)
+    if len(exit_horizons) == 1:
+        next_returns = next_returns[0]
+    expected = population_fitness(
+        fitness_type,
+        condition_index.population_match_matrix(population),
+        next_returns,
+        MIN_SUPPORT,
+    )
+
+    with ParallelFitnessEvaluator(
+        condition_index, next_returns, fitness_type, MIN_SUPPORT, num_workers=2, chunk_size=7
+    ) as evaluator:
+        np.testing.assert_array_equal(evaluator.evaluate(population), expected)
+        assert evaluator.num_evaluated == len(population)
+        assert evaluator.measure_speedup(population, repeat=1) > 0
+        # Measurements are not counted as evaluations
+        assert evaluator.num_evaluated == len(population)
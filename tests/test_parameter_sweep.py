@@ -0,0 +1,56 @@
+import pytest
+
+from src.modules.parameter_sweep import ParameterSweep, SweepConfig, sweep_configs
+from tests.test_equivalence import random_market_data
+
+
+def test_configs_are_ordered_by_dataset_and_max_lag():
+    configs = sweep_configs(
+        ["eth", "btc"],
+        {
+            "num_conds": [2, 3],
+            "max_lag": [3, 1],
+            "fitness_type": "martin_ratio",
+            "focus_on_bullish_patterns": True,
+        },
+    )
+
+    assert [(config.dataset, config.max_lag, config.num_conds) for config in configs] == [
+        ("eth", 1, 2),
+        ("eth", 1, 3),
+        ("eth", 3, 2),
+        ("eth", 3, 3),
+        ("btc", 1, 2),
+        ("btc", 1, 3),
+        ("btc", 3, 2),
+        ("btc", 3, 3),
+    ]
+    assert {config.fitness_type for config in configs} == {"martin_ratio"}
+
+
+def test_invalid_grid_setting():
+    with pytest.raises(ValueError, match="mutation_rate"):
+        sweep_configs(["btc"], {"mutation_rate": [0.1]})
+
+
+def test_sweep_of_two_configurations(tmp_path):
+    sweep = ParameterSweep(
+        datasets={"random": random_market_data(0, num_candles=200)},
+        grid={
+            "num_conds": 2,
+            "max_lag": 2,
+            "fitness_type": ["martin_ratio", "total_return"],
+            "focus_on_bullish_patterns": True,
+        },
+        ga_kwargs=dict(pop_size=20, num_gens=3, table_interval=None, cache_dir=str(tmp_path)),
+        num_workers=2,
+        seed=5,
+    )
+    results = sweep.run()
+
+    assert list(results["fitness_type"]) == ["martin_ratio", "total_return"]
+    assert results.columns[: len(SweepConfig._fields)].tolist() == list(SweepConfig._fields)
+    assert (results["evaluations"] > 0).all()
+    assert (results["best_fitness"] >= 0).all()
+    # Concurrent configurations save their own fitness cache file
+    assert len(list(tmp_path.glob("*sweep_random_2_2_*.npz"))) == 2
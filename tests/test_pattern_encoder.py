@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from src.modules.pattern_encoder import (
+    Pattern,
+    canonicalize_patterns,
+    compact_to_encoded,
+    compact_to_strings,
+    decode_patterns,
+    encode_patterns,
+    encoded_to_compact,
+    strings_to_compact,
+)
+from src.modules.pattern_generator import CandlestickPatternGenerator
+
+
+@pytest.mark.parametrize("max_lag, num_conds", [(1, 2), (3, 3), (5, 4)])
+def test_compact_round_trip(max_lag, num_conds):
+    np.random.seed(num_conds)
+    population = CandlestickPatternGenerator(max_lag, num_conds).get_population(300)
+
+    compact = encoded_to_compact(population, max_lag)
+    assert compact.dtype == np.uint16 and compact.shape == (300, num_conds)
+    np.testing.assert_array_equal(compact_to_encoded(compact, max_lag), population)
+
+    strings = compact_to_strings(compact, max_lag)
+    assert strings == decode_patterns(population.tolist())
+    np.testing.assert_array_equal(strings_to_compact(strings, max_lag), compact)
+    assert encode_patterns(strings) == population.tolist()
+
+
+def test_strings_written_differently():
+    # Reversed conditions have their own table entries, canonicalization maps them together
+    patterns = ["L[3] < C[1] & H[2] > O[0]", "C[1] > L[3] & O[0] < H[2]"]
+    compact = strings_to_compact(patterns, 3)
+
+    assert compact_to_strings(compact, 3) == patterns
+    canonical = canonicalize_patterns(encode_patterns(patterns), 3)
+    np.testing.assert_array_equal(canonical[0], canonical[1])
+
+
+def test_invalid_condition_is_not_representable():
+    # H[0] > L[0] always holds
+    with pytest.raises(ValueError, match="not in the condition table"):
+        encoded_to_compact([[2, 0, 1, 3, 0, 1, 1, 1, 3, 3]], max_lag=3)
+
+
+def test_pattern_round_trip():
+    pattern = Pattern.from_string("C[1] > L[3] & O[0] < H[2]", max_lag=3)
+
+    assert str(pattern) == "C[1] > L[3] & O[0] < H[2]"
+    assert Pattern.from_encoded(pattern.encoded(), max_lag=3) == pattern
+    assert len(pattern) == 2
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from src.modules.genetic_algorithm import GeneticAlgorithm
+from src.modules.pattern_generator import CandlestickPatternGenerator
+from tests.test_equivalence import random_market_data
+
+PARAMS = CandlestickPatternGenerator.params
+COMPARISONS = CandlestickPatternGenerator.comparisons
+
+
+def is_valid_pattern(encoded_pattern: list[int]) -> bool:
+    """
+    Checks the conditions of a pattern one by one with the rules of the generator.
+    """
+    conditions = set()
+    for param1, lag1, comparison, param2, lag2 in np.reshape(encoded_pattern, (-1, 5)).tolist():
+        condition = (PARAMS[param1], lag1, COMPARISONS[comparison], PARAMS[param2], lag2)
+        if not CandlestickPatternGenerator._is_condition_valid(*condition, conditions):
+            return False
+        conditions.add(condition)
+    return True
+
+
+@pytest.mark.parametrize("max_lag, num_conds", [(0, 1), (1, 2), (3, 3), (5, 5)])
+def test_generated_patterns_are_valid(max_lag, num_conds):
+    np.random.seed(max_lag)
+    generator = CandlestickPatternGenerator(max_lag, num_conds)
+    population = generator.get_population(500)
+
+    assert population.shape == (500, 5 * num_conds)
+    assert all(map(is_valid_pattern, population.tolist()))
+    assert population[:, 1::5].max() <= max_lag and population[:, 4::5].max() <= max_lag
+
+
+@pytest.mark.parametrize("max_lag", [0, 1, 3])
+def test_condition_table_holds_every_valid_condition(max_lag):
+    conditions = CandlestickPatternGenerator.condition_table(max_lag)[0]
+    num_lags = max_lag + 1
+    every_condition = np.array(
+        np.meshgrid(range(4), range(num_lags), range(2), range(4), range(num_lags), indexing="ij")
+    ).reshape(5, -1).T
+
+    valid = [condition for condition in every_condition.tolist() if is_valid_pattern(condition)]
+    assert sorted(conditions.tolist()) == sorted(valid)
+
+
+def test_too_many_conditions():
+    with pytest.raises(ValueError, match="at most"):
+        CandlestickPatternGenerator(max_lag=0, num_conds=5)
+
+
+@pytest.fixture
+def genetic_algorithm():
+    np.random.seed(0)
+    genetic_algorithm = GeneticAlgorithm(
+        random_market_data(0, num_candles=100),
+        pop_size=200,
+        num_gens=1,
+        num_conds=4,
+        max_lag=2,
+        fitness_type="martin_ratio",
+        bullish_focus=True,
+        table_interval=None,
+        # Mutates most genes, so most mutated conditions break the rules before their repair
+        pattern_mutation_rate=0.2,
+        gene_mutation_rate=0.5,
+    )
+    genetic_algorithm.ga_instance = genetic_algorithm.create_instance()
+    return genetic_algorithm
+
+
+def test_offspring_are_valid(genetic_algorithm):
+    parents = genetic_algorithm.ga_instance.population
+    offsprings = genetic_algorithm._crossover_func(
+        parents, parents.shape, genetic_algorithm.ga_instance
+    )
+    assert offsprings.shape == parents.shape
+    assert all(map(is_valid_pattern, offsprings.tolist()))
+
+    mutated = genetic_algorithm._mutation_func(offsprings.copy(), genetic_algorithm.ga_instance)
+    assert all(map(is_valid_pattern, mutated.tolist()))
+    assert (mutated != offsprings).any(axis=1).mean() > 0.5
+    assert genetic_algorithm.operator_counts["repaired_conditions"] > 0
+
+
+def test_repair_keeps_valid_conditions(genetic_algorithm):
+    generator = genetic_algorithm.pattern_generator
+    population = generator.get_population(100)
+    condition_indices = generator.to_condition_indices(population)
+    broken = condition_indices.copy()
+    broken[:, 1] = broken[:, 0]  # Repeats the price pair of the first condition
+    broken[::2, 2] = -1  # Invalid condition
+
+    repaired, num_repaired = generator.repair_conditions(broken)
+
+    assert num_repaired >= 150
+    # Of two conditions sharing a price pair the later one is drawn again
+    np.testing.assert_array_equal(repaired[:, 0], condition_indices[:, 0])
+    assert (repaired[:, 1] != condition_indices[:, 0]).all()
+    assert all(map(is_valid_pattern, generator.from_condition_indices(repaired).tolist()))
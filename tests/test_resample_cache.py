@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.utils.data_loader import load_ohlc
+from src.utils.resample_cache import ResampleCache
+from tests.test_data_loader import minute_candles
+
+
+@pytest.fixture
+def parquet_file(tmp_path):
+    df = minute_candles(1).dropna().reset_index(drop=True)
+    path = tmp_path / "candles.parquet"
+    df.to_parquet(path, index=False)
+    return path, df
+
+
+def test_cache_hit(tmp_path, parquet_file):
+    path, _ = parquet_file
+    cache = ResampleCache(tmp_path / "cache")
+
+    stored = cache.load(path, "h", start="2018-01-01 03:00")
+    hit = cache.load(path, "h", start="2018-01-01 03:00")
+
+    expected = load_ohlc(path, start="2018-01-01 03:00", freq="h")
+    assert stored.rows_read > 0
+    # Hits are memory-mapped, no parquet rows are read
+    assert hit.rows_read == 0 and isinstance(hit.ohlc, np.memmap)
+    np.testing.assert_array_equal(hit.ohlc, expected.ohlc)
+    np.testing.assert_array_equal(hit.dates, expected.dates)
+    # Another frequency or date range is another entry
+    assert cache.load(path, "15min", start="2018-01-01 03:00").rows_read > 0
+    assert cache.load(path, "h").rows_read > 0
+
+
+def test_invalidate(tmp_path, parquet_file):
+    path, _ = parquet_file
+    cache = ResampleCache(tmp_path / "cache")
+    cache.load(path, "h")
+    cache.load(path, "15min")
+
+    assert cache.invalidate(path) == 2
+    assert cache.load(path, "h").rows_read > 0
+    assert cache.invalidate(tmp_path / "other.parquet") == 0
+
+
+def test_changed_source_is_not_reused(tmp_path, parquet_file):
+    path, df = parquet_file
+    cache = ResampleCache(tmp_path / "cache")
+    cache.load(path, "h")
+
+    df.iloc[::2].to_parquet(path, index=False)
+    reloaded = cache.load(path, "h")
+
+    assert reloaded.rows_read == len(df.iloc[::2])
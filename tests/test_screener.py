@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.modules.pattern_encoder import decode_patterns
+from src.modules.pattern_evaluation import evaluate_candlestick_pattern
+from src.modules.screener import PatternScreener, dataset_paths
+from src.utils.data_loader import load_ohlc
+from tests.test_equivalence import (
+    MAX_LAG,
+    MIN_SUPPORT,
+    baseline_candidates,
+    random_market_data,
+    random_population,
+)
+
+SYMBOLS = {"AAA": 0, "BBB": 1, "CCC": 2}
+
+
+def screened_patterns() -> list[list[int]]:
+    """
+    Random patterns with an equivalent (reversed) copy of the first one and a single condition pattern.
+    """
+    patterns = random_population(0, size=20).tolist()
+    param1, lag1, comparison, param2, lag2 = patterns[0][:5]
+    patterns.append([param2, lag2, 1 - comparison, param1, lag1] + patterns[0][5:])
+    patterns.append(patterns[1][:5])
+    return patterns
+
+
+@pytest.fixture(scope="module")
+def datasets(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("universe")
+    frames = {}
+    for symbol, seed in SYMBOLS.items():
+        df = random_market_data(seed, num_candles=60)
+        frames[symbol] = df
+        df.rename(columns=str.lower).assign(
+            date=pd.date_range("2024-01-01", periods=len(df), freq="h")
+        ).to_parquet(directory / f"{symbol}.parquet", index=False)
+    return dataset_paths(directory), frames
+
+
+def test_match_counts_equal_the_reference_evaluation(datasets):
+    paths, frames = datasets
+    patterns = screened_patterns()
+    screener = PatternScreener(patterns, MAX_LAG, min_support=MIN_SUPPORT)
+    assert screener.num_distinct < len(patterns)
+
+    summary, matches = screener.run(paths, num_workers=2)
+
+    assert summary["symbol"].unique().tolist() == list(SYMBOLS)
+    for symbol, df in frames.items():
+        rows = summary[summary["symbol"] == symbol]
+        assert rows["pattern"].tolist() == decode_patterns(patterns)
+        for pattern_idx, pattern in enumerate(patterns):
+            log_returns = evaluate_candlestick_pattern(df, pattern, MAX_LAG)
+            matched = np.flatnonzero([isinstance(value, float) for value in log_returns])
+            row = rows.iloc[pattern_idx]
+            assert row["match_count"] == len(matched)
+            np.testing.assert_array_equal(matches[symbol].pattern_matches(pattern_idx), matched)
+            assert row["total_return"] in baseline_candidates(df, pattern, True, "total_return")
+
+
+def test_workers_screen_like_a_single_process(datasets):
+    paths, _ = datasets
+    screener = PatternScreener(screened_patterns(), MAX_LAG, min_support=MIN_SUPPORT)
+    summary, _ = screener.run(paths, num_workers=8)
+
+    for symbol, path in paths.items():
+        expected, _ = screener.screen(symbol, load_ohlc(path))
+        pd.testing.assert_frame_equal(
+            summary[summary["symbol"] == symbol].reset_index(drop=True), expected
+        )
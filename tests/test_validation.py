@@ -0,0 +1,166 @@
+from statistics import mean
+
+import numpy as np
+import pytest
+
+from src.modules.chunked_evaluation import ChunkedEvaluator
+from src.modules.condition_index import ConditionIndex
+from src.modules.fitness_functions import martin_ratio, profit_factor, total_return
+from src.modules.pattern_evaluation import (
+    forward_log_returns,
+    horizon_log_returns,
+    ohlc_to_array,
+)
+from src.modules.validation import FoldEvaluator, k_fold_folds, walk_forward_folds
+from src.utils.data_loader import ChunkedOHLC
+from tests.test_equivalence import (
+    FITNESS_TYPES,
+    MAX_LAG,
+    MIN_SUPPORT,
+    random_market_data,
+    random_population,
+)
+
+NUM_CANDLES = 60
+FOLDS = {
+    "walk_forward": walk_forward_folds(NUM_CANDLES, num_folds=3),
+    "rolling_walk_forward": walk_forward_folds(NUM_CANDLES, num_folds=3, train_size=20),
+    "k_fold": k_fold_folds(NUM_CANDLES, num_folds=3),
+}
+
+
+def reference_fitness(log_returns: list, fitness_type: str) -> float:
+    if fitness_type == "total_return":
+        return total_return(log_returns)
+    fitness_function = profit_factor if fitness_type == "profit_factor" else martin_ratio
+    return fitness_function(log_returns, MIN_SUPPORT)
+
+
+def reference_candidates(
+    match_mask: np.ndarray,
+    next_returns: np.ndarray,
+    candles: list[int],
+    fitness_type: str,
+) -> set[float]:
+    """
+    Fitness of a pattern on the selected candles only, the last candle of the series gets the
+    average log return of the selected candles as in `evaluate_candlestick_pattern`, within the
+    rounding tolerance of the statistics (0.01 at rounding ties).
+    """
+    log_returns = []
+    for candle in candles:
+        if not match_mask[candle]:
+            log_returns.append(0)
+        elif candle < len(match_mask) - 1:
+            log_returns.append(float(next_returns[candle]))
+        else:
+            non_zero_returns = [r for r in log_returns if r != 0]
+            log_returns.append(round(mean(non_zero_returns), 2) if non_zero_returns else 0.0)
+    candidates = {reference_fitness(log_returns, fitness_type)}
+    if candles and candles[-1] == len(match_mask) - 1 and match_mask[-1]:
+        for delta in (-0.01, 0.01):
+            last_return = round(log_returns[-1] + delta, 2)
+            candidates.add(reference_fitness(log_returns[:-1] + [last_return], fitness_type))
+    return candidates
+
+
+def fold_candles(ranges: list[tuple[int, int]], horizon: int | None = None) -> list[int]:
+    """
+    Candles of fold ranges, without the last `horizon` candles of ranges ending before the series.
+    """
+    candles = []
+    for start, end in ranges:
+        if horizon is not None and end < NUM_CANDLES:
+            end = max(end - horizon, start)
+        candles.extend(range(start, end))
+    return candles
+
+
+@pytest.fixture(scope="module", params=range(4))
+def market(request):
+    df = random_market_data(request.param, NUM_CANDLES)
+    ohlc = ohlc_to_array(df)
+    population = random_population(request.param)
+    match_matrix = ConditionIndex(ohlc, MAX_LAG).population_match_matrix(population)
+    return ohlc, population, match_matrix
+
+
+@pytest.mark.parametrize("fitness_type", FITNESS_TYPES)
+@pytest.mark.parametrize("horizon", [1, 3])
+@pytest.mark.parametrize("folds", FOLDS.values(), ids=FOLDS.keys())
+def test_fold_fitness(market, folds, horizon, fitness_type):
+    ohlc, _, match_matrix = market
+    next_returns = forward_log_returns(ohlc, horizon=horizon)
+    evaluator = FoldEvaluator(folds, NUM_CANDLES, (horizon,))
+    in_sample, out_of_sample = evaluator.fold_fitness(
+        fitness_type, match_matrix, next_returns, MIN_SUPPORT
+    )
+
+    for idx, fold in enumerate(folds):
+        train, test = fold_candles(fold.train, horizon), fold_candles(fold.test)
+        for match_mask, train_fitness, test_fitness in zip(
+            match_matrix, in_sample[:, idx], out_of_sample[:, idx]
+        ):
+            assert train_fitness in reference_candidates(
+                match_mask, next_returns, train, fitness_type
+            )
+            assert test_fitness in reference_candidates(
+                match_mask, next_returns, test, fitness_type
+            )
+
+
+@pytest.mark.parametrize("folds", FOLDS.values(), ids=FOLDS.keys())
+def test_exit_horizons_are_purged_separately(market, folds):
+    ohlc, _, match_matrix = market
+    exit_horizons = (1, 3, 8)
+    in_sample, out_of_sample = FoldEvaluator(folds, NUM_CANDLES, exit_horizons).fold_fitness(
+        "martin_ratio", match_matrix, horizon_log_returns(ohlc, exit_horizons), MIN_SUPPORT
+    )
+
+    for row, horizon in enumerate(exit_horizons):
+        expected = FoldEvaluator(folds, NUM_CANDLES, (horizon,)).fold_fitness(
+            "martin_ratio", match_matrix, forward_log_returns(ohlc, horizon=horizon), MIN_SUPPORT
+        )
+        np.testing.assert_array_equal(in_sample[row], expected[0])
+        np.testing.assert_array_equal(out_of_sample[row], expected[1])
+
+
+@pytest.mark.parametrize("folds", FOLDS.values(), ids=FOLDS.keys())
+def test_chunked_fold_fitness(market, folds):
+    ohlc, population, match_matrix = market
+    evaluator = FoldEvaluator(folds, NUM_CANDLES)
+    statistics = ChunkedEvaluator(ChunkedOHLC(ohlc, chunk_size=7), MAX_LAG).segment_statistics(
+        population, evaluator.segment_starts, evaluator.groups
+    )
+
+    expected = evaluator.fold_fitness(
+        "martin_ratio", match_matrix, forward_log_returns(ohlc), MIN_SUPPORT
+    )
+    for fitness, expected_fitness in zip(
+        evaluator.group_fold_fitness("martin_ratio", statistics, MIN_SUPPORT), expected
+    ):
+        np.testing.assert_array_equal(fitness, expected_fitness)
+
+
+@pytest.mark.parametrize("fitness_type", FITNESS_TYPES)
+def test_folds_do_not_use_prices_outside_their_ranges(market, fitness_type):
+    ohlc, population, _ = market
+    folds = FOLDS["walk_forward"]
+    train_end, test_start = folds[0].train[0][1], folds[-1].test[0][0]
+    evaluator = FoldEvaluator(folds, NUM_CANDLES)
+
+    def fold_fitness(changed_ohlc):
+        match_matrix = ConditionIndex(changed_ohlc, MAX_LAG).population_match_matrix(population)
+        return evaluator.fold_fitness(
+            fitness_type, match_matrix, forward_log_returns(changed_ohlc), MIN_SUPPORT
+        )
+
+    in_sample, out_of_sample = fold_fitness(ohlc)
+    # Prices following the first training range, positions exited there are left out
+    future = ohlc.copy()
+    future[:, train_end:] = future[:, train_end:][:, ::-1]
+    np.testing.assert_array_equal(fold_fitness(future)[0][:, 0], in_sample[:, 0])
+    # Prices preceding the last test range (and its lookback), used for the last candle before
+    past = ohlc.copy()
+    past[:, : test_start - MAX_LAG] = past[:, : test_start - MAX_LAG][:, ::-1]
+    np.testing.assert_array_equal(fold_fitness(past)[1][:, -1], out_of_sample[:, -1])